@@ -2,6 +2,7 @@ import json
 import os
 import logging
 from typing import Dict, Optional, Tuple, List
+from services.persistence import with_file_lock, write_json
 
 logger = logging.getLogger(__name__)
 
@@ -66,11 +67,12 @@ class AuthService:
         logger.info(f"Client authentication successful for {client_id}/{job_id}")
         return True, client, 'client'
     
+    @with_file_lock('clients_file')
     def add_client(self, client_data: Dict) -> bool:
         """Add new client to the system"""
         try:
-            if not self.clients_cache:
-                self.load_clients()
+            # Re-read under the lock: another worker may have written since our cache was loaded
+            self.load_clients()
             
             # Check if client already exists
             client_id = client_data.get('clientId')
@@ -85,8 +87,7 @@ class AuthService:
             self.clients_cache.append(client_data)
             
             # Save to file
-            with open(self.clients_file, 'w') as f:
-                json.dump(self.clients_cache, f, indent=2)
+            write_json(self.clients_file, self.clients_cache)
             
             logger.info(f"Added new client: {client_id}/{job_id}")
             return True
@@ -106,11 +107,12 @@ class AuthService:
         client = self.find_client(client_id, job_id)
         return bool(client and client.get('isStaff', False))
     
+    @with_file_lock('clients_file')
     def update_client(self, client_id: str, job_id: str, updates: Dict) -> bool:
         """Update client information in the database"""
         try:
-            if not self.clients_cache:
-                self.load_clients()
+            # Re-read under the lock: another worker may have written since our cache was loaded
+            self.load_clients()
             
             # Find and update the client
             for client in self.clients_cache:
@@ -121,8 +123,7 @@ class AuthService:
                             client[key] = value
                     
                     # Save to file
-                    with open(self.clients_file, 'w') as f:
-                        json.dump(self.clients_cache, f, indent=2)
+                    write_json(self.clients_file, self.clients_cache)
                     
                     logger.info(f"Updated client {client_id}/{job_id}")
                     return True
@@ -333,14 +333,15 @@ class EnhancedAuthService:
                 'user_agent': request.headers.get('User-Agent') if request else None
             }
             
-            logs = self.storage_service.load_data('auth_log.json')
-            logs.append(log_entry)
+            with self.storage_service.lock('auth_log.json'):
+                logs = self.storage_service.load_data('auth_log.json')
+                logs.append(log_entry)
             
-            # Keep only last 1000 entries
-            if len(logs) > 1000:
-                logs = logs[-1000:]
+                # Keep only last 1000 entries
+                if len(logs) > 1000:
+                    logs = logs[-1000:]
             
-            self.storage_service.save_data('auth_log.json', logs)
+                self.storage_service.save_data('auth_log.json', logs)
             
         except Exception as e:
             logging.error(f"Error logging login attempt: {e}")
@@ -356,9 +357,10 @@ class EnhancedAuthService:
                 'ip_address': request.remote_addr if request else None
             }
             
-            logs = self.storage_service.load_data('logout_log.json')
-            logs.append(log_entry)
-            self.storage_service.save_data('logout_log.json', logs)
+            with self.storage_service.lock('logout_log.json'):
+                logs = self.storage_service.load_data('logout_log.json')
+                logs.append(log_entry)
+                self.storage_service.save_data('logout_log.json', logs)
             
         except Exception as e:
             logging.error(f"Error logging logout: {e}")
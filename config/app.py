@@ -25,12 +25,23 @@ app.config["SQLALCHEMY_DATABASE_URI"] = os.environ.get("DATABASE_URL")
 app.config["SQLALCHEMY_ENGINE_OPTIONS"] = {
     "pool_recycle": 300,
     "pool_pre_ping": True,
+    # Shared by SQLAlchemy and the psycopg2 services (services/db_pool.py); per worker process
+    "pool_size": int(os.environ.get("DB_POOL_SIZE", "5")),
+    "max_overflow": int(os.environ.get("DB_MAX_OVERFLOW", "10")),
+    "pool_timeout": int(os.environ.get("DB_POOL_TIMEOUT", "30")),
 }
+# Optional read replica for reporting queries (services/db_pool.reporting_connection)
+if os.environ.get("DATABASE_REPLICA_URL"):
+    app.config["SQLALCHEMY_BINDS"] = {"replica": os.environ["DATABASE_REPLICA_URL"]}
 
 # Initialize SQLAlchemy
 db = SQLAlchemy(model_class=Base)
 db.init_app(app)
 
+# Cache db.text() statements and time every query (see /api/admin/system/query-metrics)
+from services.query_registry import query_registry
+query_registry.install(db)
+
 # Print startup message only for admin routes
 import os
 if os.environ.get('FLASK_ENV') == 'development' or '/admin' in os.environ.get('REQUEST_URI', ''):
@@ -54,5 +65,15 @@ with app.app_context():
     import models.models_db  # noqa: F401
     db.create_all()
 
+    # Versioned migrations (indexes etc.) for the raw-SQL tables create_all() doesn't cover.
+    # Run once per deploy with `python -m services.schema_migrations migrate`;
+    # SCHEMA_AUTO_MIGRATE=1 also applies them at startup (e.g. single-worker dev).
+    if db.engine.dialect.name == 'postgresql' and os.environ.get('SCHEMA_AUTO_MIGRATE', '0') == '1':
+        try:
+            from services.schema_migrations import schema_migration_service
+            schema_migration_service.migrate(db.engine)
+        except Exception as e:
+            logging.error(f"Schema migration failed: {e}")
+
 # Routes will be imported in main.py to avoid circular imports
 logging.info("App initialized successfully")
\ No newline at end of file
@@ -1,4 +1,5 @@
 # Gunicorn configuration for SPANKKS Construction
+import multiprocessing
 import os
 import signal
 
@@ -7,7 +8,10 @@ bind = "0.0.0.0:5000"
 backlog = 2048
 
 # Worker processes
-workers = 1
+# data/*.json read-modify-writes hold cross-process file locks
+# (services/persistence.py) and record IDs come from shared sequences
+# (services/id_allocator.py), so workers can share the data directory.
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
 worker_class = "sync"
 worker_connections = 1000
 timeout = 30
@@ -42,6 +46,16 @@ def when_ready(server):
     signal.signal(signal.SIGWINCH, signal.SIG_IGN)
     server.log.info("SPANKKS Construction server started - SIGWINCH ignored")
 
+def post_fork(server, worker):
+    """Called in the worker just after it is forked from the master."""
+    # preload_app imports the app in the master; its pooled DB connections
+    # must not be shared with the workers
+    try:
+        from services.db_pool import dispose_after_fork
+        dispose_after_fork()
+    except Exception as e:
+        server.log.warning(f"Could not reset database connections after fork: {e}")
+
 def worker_init(worker):
     """Called just after a worker has been forked."""
     # Also ignore SIGWINCH in worker processes
@@ -1,14 +1,107 @@
+import atexit
+import os
+import threading
 import uuid
 from datetime import datetime, timedelta
 import pytz
 import logging
+from services.id_allocator import id_allocator
+from services.persistence import collection_exists, file_lock, read_json, read_records, upsert_records
+
+# HandymanStorage instances holding unflushed edits (kept alive until flushed)
+_pending_storages = set()
+_pending_storages_lock = threading.Lock()
+
+
+class StorageFlushError(IOError):
+    """Raised when queued HandymanStorage edits could not be written (they stay queued)"""
+
+
+def flush_pending_writes():
+    """Persist every HandymanStorage edit made since the last flush (before each response / exit).
+
+    Raises StorageFlushError if any collection failed to write.
+    """
+    with _pending_storages_lock:
+        storages = list(_pending_storages)
+    written = 0
+    failed = []
+    for storage in storages:
+        try:
+            written += storage.flush()
+        except StorageFlushError as e:
+            failed.append(str(e))
+    if failed:
+        raise StorageFlushError('; '.join(failed))
+    return written
+
+
+def _flush_at_exit():
+    try:
+        flush_pending_writes()
+    except StorageFlushError as e:
+        logging.error(f"Unsaved storage edits at exit: {e}")
+
+
+atexit.register(_flush_at_exit)
 
 def get_hawaii_time():
     """Get current time in Hawaii timezone"""
     hawaii_tz = pytz.timezone('Pacific/Honolulu')
     return datetime.now(hawaii_tz)
 
-class ContactMessage:
+class SlottedRecord:
+    """Base for the in-memory record classes: __slots__ storage plus dict codecs.
+
+    Subclasses list their attributes in __slots__ (no per-instance __dict__),
+    optional ``_defaults`` for keys missing in from_dict() (callables are
+    invoked per record) and ``_nested`` for list attributes holding records.
+    """
+
+    __slots__ = ()
+    _fields = ()
+    _defaults = {}
+    _nested = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        fields = []
+        for klass in reversed(cls.__mro__):
+            for name in klass.__dict__.get('__slots__', ()):
+                if name not in fields:
+                    fields.append(name)
+        cls._fields = tuple(fields)
+
+    def to_dict(self):
+        """Serialize every slot (nested records included) to a plain dict"""
+        data = {}
+        for name in self._fields:
+            value = getattr(self, name, None)
+            if name in self._nested and isinstance(value, list):
+                value = [item.to_dict() if isinstance(item, SlottedRecord) else item for item in value]
+            data[name] = value
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        """Rebuild a record from to_dict() output without re-running __init__"""
+        record = cls.__new__(cls)
+        for name in cls._fields:
+            if name in data:
+                value = data[name]
+            else:
+                default = cls._defaults.get(name)
+                value = default() if callable(default) else default
+            item_cls = cls._nested.get(name)
+            if item_cls is not None and isinstance(value, list):
+                value = [item_cls.from_dict(item) if isinstance(item, dict) else item for item in value]
+            setattr(record, name, value)
+        return record
+
+class ContactMessage(SlottedRecord):
+    __slots__ = ('id', 'name', 'email', 'phone', 'subject', 'message', 'status', 'created_at', 'ai_analysis', 'priority_score')
+    _defaults = {'status': 'unread', 'priority_score': 0}
+
     def __init__(self, name, email, phone=None, subject=None, message=None):
         self.id = str(uuid.uuid4())
         self.name = name
@@ -21,7 +114,12 @@ class ContactMessage:
         self.ai_analysis = None
         self.priority_score = 0
 
-class ServiceRequest:
+class ServiceRequest(SlottedRecord):
+    __slots__ = ('id', 'name', 'email', 'phone', 'service', 'priority', 'preferred_date', 'preferred_time', 'location',
+                 'description', 'budget_range', 'client_id', 'status', 'submitted_at', 'ai_recommendations',
+                 'estimated_duration', 'estimated_cost')
+    _defaults = {'priority': 'medium', 'status': 'pending'}
+
     def __init__(self, name, email, phone, service, priority=None, preferred_date=None, 
                  preferred_time=None, location=None, description=None, budget_range=None, client_id=None):
         self.id = str(uuid.uuid4())
@@ -42,7 +140,11 @@ class ServiceRequest:
         self.estimated_duration = None
         self.estimated_cost = None
 
-class Lead:
+class Lead(SlottedRecord):
+    __slots__ = ('id', 'name', 'email', 'phone', 'source', 'interest_level', 'notes', 'status', 'created_at', 'ai_score',
+                 'follow_up_suggestions')
+    _defaults = {'interest_level': 'medium', 'status': 'new', 'ai_score': 0}
+
     def __init__(self, name, email, phone, source, interest_level=None, notes=None):
         self.id = str(uuid.uuid4())
         self.name = name
@@ -56,7 +158,96 @@ class Lead:
         self.ai_score = 0
         self.follow_up_suggestions = None
 
+class RecordIndex:
+    """Primary (id) and secondary (field value) dict indexes over an in-memory collection.
+
+    Records are plain model objects; HandymanStorage calls add() when a
+    record is created and reindex() after changing an indexed attribute.
+    """
+
+    def __init__(self, fields=()):
+        self.fields = tuple(fields)
+        self.by_id = {}
+        self.by_field = {field: {} for field in self.fields}
+        self._keys = {}  # id(record) -> (record id, indexed values) as last indexed
+
+    def rebuild(self, records):
+        self.by_id = {}
+        self.by_field = {field: {} for field in self.fields}
+        self._keys = {}
+        for record in records:
+            self.add(record)
+
+    def add(self, record):
+        record_id = getattr(record, 'id', None)
+        values = tuple(getattr(record, field, None) for field in self.fields)
+        self._keys[id(record)] = (record_id, values)
+        try:
+            # First record with an id wins, matching a front-to-back scan
+            self.by_id.setdefault(record_id, record)
+        except TypeError:
+            pass
+        for field, value in zip(self.fields, values):
+            try:
+                self.by_field[field].setdefault(value, {})[id(record)] = record
+            except TypeError:
+                pass
+
+    def remove(self, record, records=()):
+        """Drop a record; records is the collection it still belongs to, for re-pointing by_id"""
+        record_id, values = self._keys.pop(id(record), (None, ()))
+        try:
+            if self.by_id.get(record_id) is record:
+                del self.by_id[record_id]
+                replacement = next((r for r in records if r is not record and getattr(r, 'id', None) == record_id), None)
+                if replacement is not None:
+                    self.by_id[record_id] = replacement
+        except TypeError:
+            pass
+        for field, value in zip(self.fields, values):
+            try:
+                bucket = self.by_field[field].get(value)
+            except TypeError:
+                continue
+            if bucket is not None:
+                bucket.pop(id(record), None)
+                if not bucket:
+                    del self.by_field[field][value]
+
+    def reindex(self, record, records=()):
+        self.remove(record, records)
+        self.add(record)
+
+    def get(self, record_id):
+        try:
+            return self.by_id.get(record_id)
+        except TypeError:
+            return None
+
+    def find(self, field, value):
+        try:
+            bucket = self.by_field[field].get(value)
+        except TypeError:
+            return []
+        return list(bucket.values()) if bucket else []
+
 class HandymanStorage:
+    # Collections persisted through flush(), by data file
+    PERSISTED_COLLECTIONS = {
+        'contacts': 'contacts.json',
+        'quotes': 'quotes.json',
+        'invoices': 'invoices.json',
+        'jobs': 'jobs.json',
+    }
+    # Shared ID sequences (see services.id_allocator); QuoteAcceptanceService and
+    # WorkflowAutomationService allocate invoice/job IDs from the same ones
+    ID_SEQUENCES = {
+        'contacts': 'contact_number',
+        'quotes': 'quote_number',
+        'invoices': 'invoice_number',
+        'jobs': 'job_number',
+    }
+
     def __init__(self):
         self.service_requests = []
         self.contact_messages = []
@@ -75,11 +266,19 @@ class HandymanStorage:
         self.invoices = self._load_invoices()
         self.jobs = self._load_jobs()
         
-        # Counter for IDs
-        self._next_contact_id = self._get_next_id(self.contacts)
-        self._next_quote_id = self._get_next_id(self.quotes)
-        self._next_invoice_id = self._get_next_id(self.invoices)
-        self._next_job_id = self._get_next_id(self.jobs)
+        # Lookup indexes; kept in step by the add/update methods below
+        self.contact_index = RecordIndex()
+        self.quote_index = RecordIndex(('contact_id',))
+        self.invoice_index = RecordIndex(('contact_id',))
+        self.job_index = RecordIndex(('contact_id', 'scheduled_date'))
+        self.contact_index.rebuild(self.contacts)
+        self.quote_index.rebuild(self.quotes)
+        self.invoice_index.rebuild(self.invoices)
+        self.job_index.rebuild(self.jobs)
+        
+        # Records changed since the last flush: collection -> {id(record): record}
+        self._dirty = {}
+        self._dirty_lock = threading.Lock()
     
     def _ensure_data_directory(self):
         """Ensure data directory exists"""
@@ -107,145 +306,75 @@ class HandymanStorage:
                     valid_ids.append(1)
         
         return max(valid_ids) + 1 if valid_ids else 1
+
+    def _allocate_id(self, collection):
+        """Next ID for a collection, unique across workers; a new sequence starts past the IDs in memory and on disk"""
+        def seed():
+            on_disk = read_json(os.path.join(self.data_dir, f'{collection}.json'))
+            return max(self._get_next_id(getattr(self, collection)), self._get_next_id(on_disk if isinstance(on_disk, list) else []))
+        return id_allocator.next_value(self.ID_SEQUENCES[collection], seed=seed)
+
+    def _mark_dirty(self, collection, record):
+        """Queue a changed record for the next flush()"""
+        with self._dirty_lock:
+            self._dirty.setdefault(collection, {})[id(record)] = record
+        with _pending_storages_lock:
+            _pending_storages.add(self)
+
+    def flush(self):
+        """Write only the records changed since the last flush; returns how many were written.
+
+        Raises StorageFlushError (after trying every collection) if any failed to write.
+        """
+        with self._dirty_lock:
+            dirty, self._dirty = self._dirty, {}
+        with _pending_storages_lock:
+            _pending_storages.discard(self)
+
+        written = 0
+        failed = []
+        for collection, records in dirty.items():
+            path = os.path.join(self.data_dir, self.PERSISTED_COLLECTIONS[collection])
+            try:
+                with file_lock(path):
+                    written += upsert_records(path, [record.to_dict() for record in records.values()], default=str)
+            except Exception as e:
+                logging.error(f"Error flushing {collection}: {e}")
+                # Keep the edits queued for the next flush
+                for record in records.values():
+                    self._mark_dirty(collection, record)
+                failed.append(f"{collection}: {e}")
+        if written:
+            logging.debug(f"Flushed {written} changed record(s)")
+        if failed:
+            raise StorageFlushError(f"Could not save {', '.join(failed)}")
+        return written
     
     def _load_contacts(self):
         """Load contacts from file"""
-        import json
         import os
         contacts_file = os.path.join(self.data_dir, 'contacts.json')
-        if os.path.exists(contacts_file):
+        if collection_exists(contacts_file):
             try:
-                with open(contacts_file, 'r') as f:
-                    data = json.load(f)
-                contacts = []
-                for item in data:
-                    contact = Contact(
-                        name=item['name'],
-                        email=item['email'],
-                        phone=item['phone'],
-                        address=item.get('address', ''),
-                        notes=item.get('notes', ''),
-                        tags=item.get('tags', []),
-                        created_date=item.get('created_date')
-                    )
-                    contact.id = item['id']
-                    contact.job_history = item.get('job_history', [])
-                    contact.total_spent = item.get('total_spent', 0.0)
-                    contact.last_contact = item.get('last_contact')
-                    contact.preferred_contact = item.get('preferred_contact', 'email')
-                    contact.status = item.get('status', 'active')
-                    contacts.append(contact)
-                return contacts
+                return read_records(contacts_file, Contact)
             except Exception as e:
                 logging.error(f"Error loading contacts: {e}")
         return []
     
-    def _save_contacts_to_file(self):
-        """Save contacts to file"""
-        import json
-        import os
-        contacts_file = os.path.join(self.data_dir, 'contacts.json')
-        try:
-            data = []
-            for contact in self.contacts:
-                data.append({
-                    'id': contact.id,
-                    'name': contact.name,
-                    'email': contact.email,
-                    'phone': contact.phone,
-                    'address': contact.address,
-                    'notes': contact.notes,
-                    'tags': contact.tags,
-                    'created_date': contact.created_date,
-                    'job_history': contact.job_history,
-                    'total_spent': contact.total_spent,
-                    'last_contact': contact.last_contact,
-                    'preferred_contact': contact.preferred_contact,
-                    'status': contact.status
-                })
-            with open(contacts_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            logging.info(f"Saved {len(data)} contacts to file")
-        except Exception as e:
-            logging.error(f"Error saving contacts: {e}")
-    
     def _load_quotes(self):
         """Load quotes from file"""
-        import json
         import os
         quotes_file = os.path.join(self.data_dir, 'quotes.json')
-        if os.path.exists(quotes_file):
+        if collection_exists(quotes_file):
             try:
-                with open(quotes_file, 'r') as f:
-                    data = json.load(f)
-                quotes = []
-                for item in data:
-                    quote = Quote(
-                        contact_id=item['contact_id'],
-                        service_type=item['service_type'],
-                        items=[],  # Will be populated below
-                        total_amount=item['total_amount'],
-                        valid_until=item['valid_until'],
-                        notes=item.get('notes', '')
-                    )
-                    quote.id = item['id']
-                    quote.created_date = item.get('created_date')
-                    quote.status = item.get('status', 'pending')
+                quotes = read_records(quotes_file, Quote)
+                for quote in quotes:
                     quote.quote_number = f"Q{quote.id:04d}"
-                    
-                    # Reconstruct quote items
-                    for item_data in item.get('items', []):
-                        quote_item = QuoteItem(
-                            description=item_data['description'],
-                            quantity=item_data['quantity'],
-                            unit_price=item_data['unit_price'],
-                            unit=item_data.get('unit', 'each')
-                        )
-                        quote.items.append(quote_item)
-                    
-                    quotes.append(quote)
                 return quotes
             except Exception as e:
                 logging.error(f"Error loading quotes: {e}")
         return []
     
-    def _save_quotes_to_file(self):
-        """Save quotes to file"""
-        import json
-        import os
-        quotes_file = os.path.join(self.data_dir, 'quotes.json')
-        try:
-            data = []
-            for quote in self.quotes:
-                quote_data = {
-                    'id': quote.id,
-                    'contact_id': quote.contact_id,
-                    'service_type': quote.service_type,
-                    'total_amount': quote.total_amount,
-                    'valid_until': quote.valid_until,
-                    'notes': quote.notes,
-                    'created_date': quote.created_date,
-                    'status': getattr(quote, 'status', 'pending'),
-                    'items': []
-                }
-                
-                # Save quote items
-                for item in quote.items:
-                    quote_data['items'].append({
-                        'description': item.description,
-                        'quantity': item.quantity,
-                        'unit_price': item.unit_price,
-                        'unit': item.unit
-                    })
-                
-                data.append(quote_data)
-            
-            with open(quotes_file, 'w') as f:
-                json.dump(data, f, indent=2)
-            logging.info(f"Saved {len(data)} quotes to file")
-        except Exception as e:
-            logging.error(f"Error saving quotes: {e}")
-    
     def _load_invoices(self):
         """Load invoices from file"""
         # Similar to quotes but for invoices
@@ -430,11 +559,11 @@ class HandymanStorage:
             tags=contact_data.get('tags', [])
         )
         # Assign unique ID
-        contact.id = self._next_contact_id
-        self._next_contact_id += 1
+        contact.id = self._allocate_id('contacts')
         
         self.contacts.append(contact)
-        self._save_contacts_to_file()
+        self.contact_index.add(contact)
+        self._mark_dirty('contacts', contact)
         return contact
 
     def get_all_contacts(self):
@@ -443,8 +572,7 @@ class HandymanStorage:
 
     def get_contact_by_id(self, contact_id):
         """Get a specific contact by ID"""
-        contacts = self.get_all_contacts()
-        return next((c for c in contacts if c.id == contact_id), None)
+        return self.contact_index.get(contact_id)
 
     def update_contact(self, contact_id, updates):
         """Update an existing contact"""
@@ -455,14 +583,15 @@ class HandymanStorage:
                 if contact.id == contact_id:
                     # Update contact attributes
                     for key, value in updates.items():
-                        if (hasattr(contact, key) if hasattr(contact, '__dict__') else key in contact) and value is not None:
-                            if hasattr(contact, '__dict__'):
+                        if (key in contact if isinstance(contact, dict) else hasattr(contact, key)) and value is not None:
+                            if not isinstance(contact, dict):
                                 setattr(contact, key, value)
                             else:
                                 contact[key] = value
+                    self.contact_index.reindex(contact, self.contacts)
 
-                    # Save back to storage
-                    self._save_contacts_to_file()
+                    # Saved with the rest of this request's edits
+                    self._mark_dirty('contacts', contact)
                     logging.info(f"Updated contact {contact_id}")
                     return True
 
@@ -484,95 +613,31 @@ class HandymanStorage:
             notes=quote_data.get('notes')
         )
         # Assign unique ID
-        quote.id = self._next_quote_id
-        self._next_quote_id += 1
+        quote.id = self._allocate_id('quotes')
         quote.quote_number = f"Q{quote.id:04d}"
         quote.status = 'pending'
         
         self.quotes.append(quote)
-        self._save_quotes_to_file()
+        self.quote_index.add(quote)
+        self._mark_dirty('quotes', quote)
         return quote
 
-    def _save_invoices(self):
-        """Save invoices to JSON file"""
-        try:
-            import os
-            import json
-            os.makedirs('data', exist_ok=True)
-            
-            invoices_data = []
-            for invoice in self.invoices:
-                invoice_dict = {
-                    'id': invoice.id,
-                    'contact_id': invoice.contact_id,
-                    'quote_id': invoice.quote_id,
-                    'subtotal': invoice.subtotal,
-                    'tax_rate': invoice.tax_rate,
-                    'total_amount': invoice.total_amount,
-                    'created_date': invoice.created_date,
-                    'due_date': invoice.due_date,
-                    'status': invoice.status,
-                    'payment_terms': invoice.payment_terms,
-                    'items': [{'description': item.description, 'quantity': item.quantity, 
-                              'unit_price': item.unit_price, 'unit': item.unit} for item in invoice.items]
-                }
-                invoices_data.append(invoice_dict)
-            
-            with open('data/invoices.json', 'w') as f:
-                json.dump(invoices_data, f, indent=2)
-            logging.info(f"Saved {len(invoices_data)} invoices to file")
-            
-        except Exception as e:
-            logging.error(f"Error saving invoices: {e}")
-
-    def _save_contacts_to_file(self):
-        """Save contacts to JSON file"""
-        try:
-            import os
-            import json
-            os.makedirs('data', exist_ok=True)
-            
-            contacts_data = []
-            for contact in self.contacts:
-                contact_dict = {
-                    'id': contact.id,
-                    'name': contact.name,
-                    'email': contact.email,
-                    'phone': contact.phone,
-                    'address': contact.address,
-                    'notes': contact.notes,
-                    'tags': contact.tags,
-                    'created_date': contact.created_date,
-                    'job_history': contact.job_history,
-                    'total_spent': contact.total_spent,
-                    'last_contact': contact.last_contact,
-                    'preferred_contact': contact.preferred_contact,
-                    'status': contact.status
-                }
-                contacts_data.append(contact_dict)
-            
-            with open('data/contacts.json', 'w') as f:
-                json.dump(contacts_data, f, indent=2)
-            logging.info(f"Saved {len(contacts_data)} contacts to file")
-            
-        except Exception as e:
-            logging.error(f"Error saving contacts: {e}")
-
     def get_all_quotes(self):
         """Get all quotes"""
         return self.quotes
 
     def get_quotes_by_contact(self, contact_id):
         """Get quotes for specific contact"""
-        return [q for q in self.quotes if q.contact_id == contact_id]
+        return self.quote_index.find('contact_id', contact_id)
 
     def update_quote_status(self, quote_id, status):
         """Update quote status"""
-        for quote in self.quotes:
-            if quote.id == quote_id:
-                quote.status = status
-                return True
-        return False
+        quote = self.quote_index.get(quote_id)
+        if quote is None:
+            return False
+        quote.status = status
+        self._mark_dirty('quotes', quote)
+        return True
 
     def add_invoice(self, invoice_data):
         """Add new invoice"""
@@ -584,9 +649,10 @@ class HandymanStorage:
             tax_rate=invoice_data.get('tax_rate', 0.04712),
             payment_terms=invoice_data.get('payment_terms', 'Net 30')
         )
-        invoice.id = len(self.invoices) + 1
+        invoice.id = self._allocate_id('invoices')
         self.invoices.append(invoice)
-        self._save_invoices()
+        self.invoice_index.add(invoice)
+        self._mark_dirty('invoices', invoice)
         return invoice
 
     def get_all_invoices(self):
@@ -595,15 +661,16 @@ class HandymanStorage:
 
     def get_invoices_by_contact(self, contact_id):
         """Get invoices for specific contact"""
-        return [i for i in self.invoices if i.contact_id == contact_id]
+        return self.invoice_index.find('contact_id', contact_id)
 
     def update_invoice_status(self, invoice_id, status):
         """Update invoice status"""
-        for invoice in self.invoices:
-            if invoice.id == invoice_id:
-                invoice.status = status
-                return True
-        return False
+        invoice = self.invoice_index.get(invoice_id)
+        if invoice is None:
+            return False
+        invoice.status = status
+        self._mark_dirty('invoices', invoice)
+        return True
 
     def add_job(self, job_data):
         """Add new job"""
@@ -614,8 +681,10 @@ class HandymanStorage:
             crew_members=job_data.get('crew_members', []),
             notes=job_data.get('notes')
         )
-        job.id = len(self.jobs) + 1
+        job.id = self._allocate_id('jobs')
         self.jobs.append(job)
+        self.job_index.add(job)
+        self._mark_dirty('jobs', job)
         return job
 
     def get_all_jobs(self):
@@ -624,32 +693,34 @@ class HandymanStorage:
 
     def get_jobs_by_contact(self, contact_id):
         """Get jobs for specific contact"""
-        return [j for j in self.jobs if j.contact_id == contact_id]
+        return self.job_index.find('contact_id', contact_id)
 
     def get_jobs_by_date(self, date):
         """Get jobs scheduled for specific date"""
-        return [j for j in self.jobs if j.scheduled_date == date]
+        return self.job_index.find('scheduled_date', date)
 
     def update_job_status(self, job_id, status):
         """Update job status"""
-        for job in self.jobs:
-            if job.id == job_id:
-                job.status = status
-                if status == 'completed':
-                    job.completion_date = get_hawaii_time().strftime('%Y-%m-%d')
-                return True
-        return False
+        job = self.job_index.get(job_id)
+        if job is None:
+            return False
+        job.status = status
+        if status == 'completed':
+            job.completion_date = get_hawaii_time().strftime('%Y-%m-%d')
+        self._mark_dirty('jobs', job)
+        return True
 
     def add_job_note(self, job_id, note):
         """Add note to job"""
-        for job in self.jobs:
-            if job.id == job_id:
-                if job.notes:
-                    job.notes += f"\n\n{get_hawaii_time().strftime('%Y-%m-%d %H:%M')}: {note}"
-                else:
-                    job.notes = f"{get_hawaii_time().strftime('%Y-%m-%d %H:%M')}: {note}"
-                return True
-        return False
+        job = self.job_index.get(job_id)
+        if job is None:
+            return False
+        if job.notes:
+            job.notes += f"\n\n{get_hawaii_time().strftime('%Y-%m-%d %H:%M')}: {note}"
+        else:
+            job.notes = f"{get_hawaii_time().strftime('%Y-%m-%d %H:%M')}: {note}"
+        self._mark_dirty('jobs', job)
+        return True
 
 class Admin:
     def __init__(self, username, password_hash):
@@ -689,7 +760,15 @@ class AdminNotification:
         self.timestamp = timestamp
         self.status = status  # unread, read
 
-class Contact:
+class Contact(SlottedRecord):
+    __slots__ = ('id', 'name', 'email', 'phone', 'address', 'notes', 'tags', 'created_date', 'job_history', 'total_spent',
+                 'last_contact', 'preferred_contact', 'status')
+    _defaults = {
+        'id': 0, 'address': '', 'notes': '', 'tags': list, 'job_history': list, 'total_spent': 0.0,
+        'preferred_contact': 'email', 'status': 'active',
+        'created_date': lambda: get_hawaii_time().strftime('%Y-%m-%d')
+    }
+
     def __init__(self, name, email, phone, address=None, notes=None, tags=None, created_date=None):
         self.id = 0  # Will be set by storage
         self.name = name
@@ -705,7 +784,30 @@ class Contact:
         self.preferred_contact = "email"
         self.status = "active"
 
-class Quote:
+class QuoteItem(SlottedRecord):
+    __slots__ = ('description', 'quantity', 'unit_price', 'unit', 'total')
+    _defaults = {'unit': 'each'}
+
+    def __init__(self, description, quantity, unit_price, unit="each"):
+        self.description = description
+        self.quantity = quantity
+        self.unit_price = unit_price
+        self.unit = unit
+        self.total = quantity * unit_price
+
+    @classmethod
+    def from_dict(cls, data):
+        item = super().from_dict(data)
+        if item.total is None and item.quantity is not None and item.unit_price is not None:
+            item.total = item.quantity * item.unit_price
+        return item
+
+class Quote(SlottedRecord):
+    __slots__ = ('id', 'quote_number', 'contact_id', 'service_type', 'items', 'total_amount', 'valid_until', 'notes',
+                 'created_date', 'status', 'pdf_path')
+    _defaults = {'id': 0, 'quote_number': '', 'items': list, 'notes': '', 'status': 'pending'}
+    _nested = {'items': QuoteItem}
+
     def __init__(self, contact_id, service_type, items, total_amount, valid_until, notes=None):
         self.id = 0  # Will be set by storage
         self.quote_number = ""  # Will be set by storage
@@ -719,15 +821,12 @@ class Quote:
         self.status = "pending"  # pending, accepted, declined, expired
         self.pdf_path = None
 
-class QuoteItem:
-    def __init__(self, description, quantity, unit_price, unit="each"):
-        self.description = description
-        self.quantity = quantity
-        self.unit_price = unit_price
-        self.unit = unit
-        self.total = quantity * unit_price
+class Invoice(SlottedRecord):
+    __slots__ = ('id', 'contact_id', 'quote_id', 'items', 'subtotal', 'tax_rate', 'tax_amount', 'total_amount',
+                 'payment_terms', 'created_date', 'due_date', 'status', 'payment_link', 'pdf_path')
+    _defaults = {'id': 0, 'items': list, 'tax_rate': 0.04712, 'payment_terms': 'Net 30', 'status': 'pending'}
+    _nested = {'items': QuoteItem}
 
-class Invoice:
     def __init__(self, contact_id, quote_id, items, subtotal, tax_rate=0.04712, payment_terms="Net 30"):
         self.id = 0  # Will be set by storage
         self.contact_id = contact_id
@@ -746,7 +845,14 @@ class Invoice:
         self.payment_link = None
         self.pdf_path = None
 
-class Job:
+class Job(SlottedRecord):
+    __slots__ = ('id', 'contact_id', 'quote_id', 'scheduled_date', 'scheduled_time', 'crew_members', 'notes', 'status',
+                 'created_date', 'completion_date', 'photos', 'materials_used', 'time_spent', 'customer_signature')
+    _defaults = {
+        'id': 0, 'crew_members': list, 'notes': '', 'status': 'scheduled', 'photos': list,
+        'materials_used': list, 'time_spent': 0
+    }
+
     def __init__(self, contact_id, quote_id, scheduled_date, crew_members=None, notes=None):
         self.id = 0  # Will be set by storage
         self.contact_id = contact_id
@@ -761,4 +867,4 @@ class Job:
         self.photos = []
         self.materials_used = []
         self.time_spent = 0
-        self.customer_signature = None
\ No newline at end of file
+        self.customer_signature = None
@@ -30,6 +30,8 @@ except ImportError:
     storage_service = None
     logging.warning("Storage service not available")
 
+from services.dashboard_stats_service import dashboard_stats_service
+
 # Initialize services with proper fallback handling
 reminder_service = None
 real_time_scheduler = None
@@ -96,6 +98,17 @@ def get_hawaii_time():
 # Import app here to register routes
 from config.app import app
 
+@app.after_request
+def flush_handyman_storage(response):
+    """Persist HandymanStorage edits made during this request before the response is sent"""
+    from models.models import StorageFlushError, flush_pending_writes
+    try:
+        flush_pending_writes()
+    except StorageFlushError as e:
+        logging.error(f"Error flushing storage edits: {e}")
+        return make_response(jsonify({'success': False, 'error': 'Changes could not be saved'}), 500)
+    return response
+
 @app.route('/admin-home')
 def admin_home_redirect():
     """Admin homepage - comprehensive dashboard"""
@@ -141,122 +154,10 @@ def get_dashboard_stats():
             ]
         }
         
-        # Load authentic business data from PostgreSQL database
+        # Load authentic business data from PostgreSQL (SQL aggregates, cached briefly)
         if use_database:
             try:
-                from config.app import db
-                
-                # Query authentic PostgreSQL data directly using SQL
-                with db.engine.connect() as conn:
-                    # Get invoice data for revenue calculations
-                    invoice_result = conn.execute(db.text("""
-                        SELECT status, total_paid as total_amount, paid_at as payment_date 
-                        FROM invoices 
-                        ORDER BY created_at DESC
-                    """))
-                    invoices_db = [dict(row._mapping) for row in invoice_result]
-                    
-                    # Get quotes data
-                    quotes_result = conn.execute(db.text("""
-                        SELECT quote_id, status, total, created_at, client_id
-                        FROM quotes 
-                        ORDER BY created_at DESC
-                    """))
-                    quotes_db = [dict(row._mapping) for row in quotes_result]
-                    
-                    # Get jobs data
-                    jobs_result = conn.execute(db.text("""
-                        SELECT job_id, status, service_type, scheduled_date, client_id
-                        FROM jobs 
-                        ORDER BY timestamp_created DESC
-                    """))
-                    jobs_db = [dict(row._mapping) for row in jobs_result]
-                    
-                    # Get client names for recent activity
-                    clients_result = conn.execute(db.text("""
-                        SELECT client_id, name 
-                        FROM clients
-                    """))
-                    clients_lookup = {row.client_id: row.name for row in clients_result}
-                
-                # Calculate metrics from database data
-                paid_invoices = [i for i in invoices_db if i.get('status') == 'paid']
-                stats['overview']['total_revenue'] = sum(float(i.get('total_amount', 0)) for i in paid_invoices)
-                stats['overview']['active_jobs'] = len([j for j in jobs_db if j.get('status') in ['scheduled', 'in_progress']])
-                stats['overview']['pending_quotes'] = len([q for q in quotes_db if q.get('status') == 'pending'])
-                stats['overview']['overdue_invoices'] = len([i for i in invoices_db if i.get('status') == 'overdue'])
-                
-                # Recent activity from database
-                recent_activity = []
-                
-                # Add recent quotes with client names
-                for quote in quotes_db[:3]:
-                    client_name = clients_lookup.get(quote.get('client_id'), 'Unknown Client')
-                    created_at = quote.get('created_at')
-                    time_str = 'Recently'
-                    if created_at:
-                        if isinstance(created_at, str):
-                            time_str = created_at.split('T')[0]
-                        else:
-                            time_str = created_at.strftime('%Y-%m-%d')
-                    
-                    recent_activity.append({
-                        'action': f"Quote {quote.get('quote_id', 'Unknown')} generated for {client_name}",
-                        'time': time_str,
-                        'type': 'quote'
-                    })
-                
-                # Add recent payments
-                for payment in paid_invoices[:2]:
-                    payment_date = payment.get('payment_date')
-                    time_str = 'Recently'
-                    if payment_date:
-                        if isinstance(payment_date, str):
-                            time_str = payment_date.split('T')[0]
-                        else:
-                            time_str = payment_date.strftime('%Y-%m-%d')
-                    
-                    recent_activity.append({
-                        'action': f"Payment received ${payment.get('total_amount', 0)}",
-                        'time': time_str,
-                        'type': 'payment'
-                    })
-                
-                stats['recent_activity'] = recent_activity[:5]
-                
-                # Calculate authentic KPIs from database
-                if quotes_db:
-                    accepted_quotes = len([q for q in quotes_db if q.get('status') == 'accepted'])
-                    conversion_rate = (accepted_quotes / len(quotes_db)) * 100
-                    stats['kpis']['conversion_rate'] = round(conversion_rate, 1)
-                
-                if paid_invoices:
-                    avg_value = sum(float(i.get('total_amount', 0)) for i in paid_invoices) / len(paid_invoices)
-                    stats['kpis']['avg_job_value'] = round(avg_value, 2)
-                elif quotes_db:
-                    # Use quote values if no paid invoices yet
-                    avg_value = sum(float(q.get('total', 0)) for q in quotes_db) / len(quotes_db)
-                    stats['kpis']['avg_job_value'] = round(avg_value, 2)
-                
-                # Get upcoming jobs
-                upcoming_jobs = [j for j in jobs_db if j.get('status') == 'scheduled'][:3]
-                stats['upcoming_jobs'] = []
-                for job in upcoming_jobs:
-                    scheduled_date = job.get('scheduled_date')
-                    date_str = 'TBD'
-                    if scheduled_date:
-                        if isinstance(scheduled_date, str):
-                            date_str = scheduled_date.split('T')[0]
-                        else:
-                            date_str = scheduled_date.strftime('%Y-%m-%d')
-                    
-                    stats['upcoming_jobs'].append({
-                        'client': clients_lookup.get(job.get('client_id'), 'Unknown'),
-                        'service': job.get('service_type', 'Service'),
-                        'date': date_str,
-                        'status': job.get('status', 'scheduled')
-                    })
-                
+                stats.update(dashboard_stats_service.get_stats())
             except Exception as db_error:
                 logging.error(f"Database query error: {db_error}")
                 use_database = False
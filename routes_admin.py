@@ -6,7 +6,7 @@ All admin functionality using PostgreSQL database
 import os
 import json
 import logging
-from flask import render_template, request, jsonify, redirect, url_for, flash
+from flask import render_template, request, jsonify, redirect, url_for, flash, session
 from datetime import datetime, timedelta
 from config.app import app, db
 # Import what's available from database models
@@ -16,12 +16,30 @@ try:
     database_available = True
 except ImportError:
     database_available = False
+from services.db_pool import reporting_connection
+from services.keyset_pagination import (KeysetQuery, PaginationError, get_table_columns, nulls_last,
+                                       paginated_response, streaming_json_response, wants_stream)
+from services.kpi_rollup_service import kpi_rollup_service
 from services.storage_service import StorageService
 from sqlalchemy import func, desc
 
 # Initialize services
 storage_service = StorageService()
 
+# /admin/crm paging and the columns its sort keys map to
+CRM_PER_PAGE = 50
+CRM_MAX_PER_PAGE = 200
+CRM_SORT_COLUMNS = {
+    'name': 'c.name',
+    'created_at': 'c.created_at',
+    'jobs_count': 'jobs_count',
+    'quotes_count': 'quotes_count',
+    'total_revenue': 'total_revenue',
+    'recent_activity': 'rj.timestamp_created'
+}
+CRM_CLIENT_FIELDS = ('client_id', 'name', 'email', 'phone', 'address', 'billing_address',
+                     'preferred_contact_method', 'created_at', 'notes')
+
 @app.route('/admin/crm')
 def admin_crm():
     """Customer CRM page with PostgreSQL data"""
@@ -30,64 +48,96 @@ def admin_crm():
         flash('Please log in to access the admin portal.', 'warning')
         return redirect('/admin/login')
     
+    # Server-side pagination and sorting (sort keys map to whitelisted columns)
+    sort = request.args.get('sort', 'created_at')
+    if sort not in CRM_SORT_COLUMNS:
+        sort = 'created_at'
+    order = 'asc' if request.args.get('order') == 'asc' else 'desc'
+    try:
+        page = max(1, int(request.args.get('page', 1)))
+        per_page = min(CRM_MAX_PER_PAGE, max(1, int(request.args.get('per_page', CRM_PER_PAGE))))
+    except ValueError:
+        page, per_page = 1, CRM_PER_PAGE
+    
     try:
-        # Get clients with comprehensive data using direct SQL
+        # One set-based query: per-client aggregates plus totals across all clients
         with db.engine.connect() as conn:
-            # Get all clients
-            clients_result = conn.execute(db.text("""
-                SELECT client_id, name, email, phone, address, billing_address, 
-                       preferred_contact_method, created_at, notes
-                FROM clients 
-                ORDER BY created_at DESC
-            """))
-            clients = [dict(row._mapping) for row in clients_result]
-            
-            # Get client statistics
-            client_stats = []
-            for client in clients:
-                client_id = client['client_id']
-                
-                # Get jobs count
-                jobs_result = conn.execute(db.text("""
-                    SELECT COUNT(*) as count FROM jobs WHERE client_id = :client_id
-                """), {'client_id': client_id})
-                jobs_count = jobs_result.scalar()
-                
-                # Get quotes count
-                quotes_result = conn.execute(db.text("""
-                    SELECT COUNT(*) as count FROM quotes WHERE client_id = :client_id
-                """), {'client_id': client_id})
-                quotes_count = quotes_result.scalar()
-                
-                # Get total revenue
-                revenue_result = conn.execute(db.text("""
-                    SELECT COALESCE(SUM(total_paid), 0) as total
-                    FROM invoices 
-                    WHERE client_id = :client_id AND status = 'paid'
-                """), {'client_id': client_id})
-                total_revenue = float(revenue_result.scalar() or 0)
-                
-                # Get recent job
-                recent_job_result = conn.execute(db.text("""
-                    SELECT service_type, status, scheduled_date 
-                    FROM jobs 
-                    WHERE client_id = :client_id 
-                    ORDER BY timestamp_created DESC 
-                    LIMIT 1
-                """), {'client_id': client_id})
-                recent_job = recent_job_result.first()
-                
-                client_stats.append({
-                    'client': client,
-                    'jobs_count': jobs_count,
-                    'quotes_count': quotes_count,
-                    'total_revenue': total_revenue,
-                    'recent_job': dict(recent_job._mapping) if recent_job else None
-                })
+            result = conn.execute(db.text(f"""
+                WITH job_stats AS (
+                    SELECT client_id, COUNT(*) AS jobs_count
+                    FROM jobs GROUP BY client_id
+                ), quote_stats AS (
+                    SELECT client_id, COUNT(*) AS quotes_count
+                    FROM quotes GROUP BY client_id
+                ), revenue_stats AS (
+                    SELECT client_id, SUM(total_paid) AS total_revenue
+                    FROM invoices WHERE status = 'paid' GROUP BY client_id
+                ), recent_jobs AS (
+                    SELECT DISTINCT ON (client_id) client_id, service_type, status,
+                           scheduled_date, timestamp_created
+                    FROM jobs
+                    ORDER BY client_id, timestamp_created DESC
+                )
+                SELECT c.client_id, c.name, c.email, c.phone, c.address, c.billing_address,
+                       c.preferred_contact_method, c.created_at, c.notes,
+                       COALESCE(js.jobs_count, 0) AS jobs_count,
+                       COALESCE(qs.quotes_count, 0) AS quotes_count,
+                       COALESCE(rs.total_revenue, 0) AS total_revenue,
+                       rj.client_id AS recent_job_client_id,
+                       rj.service_type AS recent_service_type,
+                       rj.status AS recent_status,
+                       rj.scheduled_date AS recent_scheduled_date,
+                       COUNT(*) OVER () AS total_clients,
+                       SUM(COALESCE(js.jobs_count, 0)) OVER () AS all_jobs,
+                       SUM(COALESCE(qs.quotes_count, 0)) OVER () AS all_quotes,
+                       SUM(COALESCE(rs.total_revenue, 0)) OVER () AS all_revenue
+                FROM clients c
+                LEFT JOIN job_stats js ON js.client_id = c.client_id
+                LEFT JOIN quote_stats qs ON qs.client_id = c.client_id
+                LEFT JOIN revenue_stats rs ON rs.client_id = c.client_id
+                LEFT JOIN recent_jobs rj ON rj.client_id = c.client_id
+                ORDER BY {CRM_SORT_COLUMNS[sort]} {order.upper()} NULLS LAST, c.client_id
+                LIMIT :limit OFFSET :offset
+            """), {'limit': per_page, 'offset': (page - 1) * per_page})
+            rows = [dict(row._mapping) for row in result]
+        
+        if not rows and page > 1:
+            return redirect(url_for('admin_crm', sort=sort, order=order, per_page=per_page))
+        
+        client_stats = []
+        for row in rows:
+            client_stats.append({
+                'client': {field: row[field] for field in CRM_CLIENT_FIELDS},
+                'jobs_count': row['jobs_count'],
+                'quotes_count': row['quotes_count'],
+                'total_revenue': float(row['total_revenue'] or 0),
+                'recent_job': {
+                    'service_type': row['recent_service_type'],
+                    'status': row['recent_status'],
+                    'scheduled_date': row['recent_scheduled_date']
+                } if row['recent_job_client_id'] else None
+            })
+        
+        first = rows[0] if rows else {}
+        total_clients = first.get('total_clients', 0)
+        totals = {
+            'jobs': int(first.get('all_jobs') or 0),
+            'quotes': int(first.get('all_quotes') or 0),
+            'revenue': float(first.get('all_revenue') or 0)
+        }
+        pagination = {
+            'page': page,
+            'per_page': per_page,
+            'pages': max(1, -(-total_clients // per_page)),
+            'sort': sort,
+            'order': order
+        }
         
         return render_template('admin/sections/crm_section.html', 
                              clients=client_stats, 
-                             total_clients=len(clients))
+                             total_clients=total_clients,
+                             totals=totals,
+                             pagination=pagination)
     except Exception as e:
         logging.error(f"CRM page error: {e}")
         flash('Error loading CRM data', 'error')
@@ -291,131 +341,50 @@ def admin_inventory():
 def admin_performance():
     """Performance dashboard with comprehensive business metrics"""
     try:
-        with db.engine.connect() as conn:
-            # Get performance metrics using the SQL queries provided
-            performance_data = {}
-            
-            # Business Health Metrics
-            # Total Jobs This Month
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) AS total_jobs_this_month
-                FROM jobs
-                WHERE DATE_TRUNC('month', timestamp_created) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            performance_data['total_jobs_month'] = result.scalar() or 0
-            
-            # Completed Jobs %
-            result = conn.execute(db.text("""
-                SELECT 
-                  ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'completed') / NULLIF(COUNT(*), 0), 2) AS completion_rate
-                FROM jobs
-                WHERE DATE_TRUNC('month', timestamp_created) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            performance_data['completion_rate'] = result.scalar() or 0
-            
-            # Revenue This Month
-            result = conn.execute(db.text("""
-                SELECT COALESCE(SUM(amount_paid), 0) AS revenue_this_month
-                FROM payments
-                WHERE DATE_TRUNC('month', payment_date) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            performance_data['revenue_month'] = result.scalar() or 0
-            
-            # Outstanding Invoices  
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) AS unpaid_invoices, COALESCE(SUM(amount_due), 0) AS outstanding_amount
-                FROM invoices
-                WHERE status IN ('unsent', 'sent', 'overdue', 'pending')
-            """))
-            outstanding = result.first()
-            performance_data['outstanding_invoices'] = outstanding[0] if outstanding else 0
-            performance_data['outstanding_amount'] = outstanding[1] if outstanding else 0
-            
-            # Quote-to-Job Conversion Rate
-            result = conn.execute(db.text("""
-                SELECT 
-                  ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'accepted') / NULLIF(COUNT(*), 0), 2) AS conversion_rate
-                FROM quotes
-                WHERE DATE_TRUNC('month', created_at) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            performance_data['quote_conversion'] = result.scalar() or 0
-            
-            # Staff Productivity Metrics
-            # Average Job Time (using estimated hours as proxy)
-            result = conn.execute(db.text("""
-                SELECT ROUND(AVG(estimated_hours), 2) AS avg_hours_per_job
-                FROM jobs
-                WHERE status = 'completed' AND estimated_hours IS NOT NULL
-            """))
-            performance_data['avg_job_hours'] = result.scalar() or 0
-            
-            # Jobs per Staff Member
-            result = conn.execute(db.text("""
-                SELECT ROUND(COUNT(*)::DECIMAL / NULLIF((SELECT COUNT(*) FROM staff), 0), 2) AS jobs_per_staff
-                FROM jobs
-                WHERE status = 'completed'
-            """))
-            performance_data['jobs_per_staff'] = result.scalar() or 0
-            
-            # Additional calculated metrics
-            performance_data['checklist_completion'] = 85.0  # Would calculate from actual checklist data
-            performance_data['ontime_completion'] = 92.0
-            performance_data['calendar_utilization'] = 78.0
-            performance_data['rescheduled_jobs'] = 3
-            performance_data['schedule_conflicts'] = 1
-            performance_data['recurring_success'] = 88.0
-            performance_data['jobs_with_photos'] = 75.0
-            performance_data['zero_rework'] = 94.0
-            performance_data['client_satisfaction'] = 4.6
-            performance_data['material_waste'] = 3.2
-            
-            # Average Job Value
-            result = conn.execute(db.text("""
-                SELECT ROUND(AVG(amount_due), 2) AS avg_job_value
-                FROM invoices
-                WHERE amount_due > 0
-            """))
-            performance_data['avg_job_value'] = result.scalar() or 0
-            
-            # Profit Margin (simplified calculation)
-            performance_data['profit_margin'] = 32.5
-            performance_data['collection_rate'] = 94.2
-            
-            # Client Retention Metrics
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) 
-                FROM (
-                  SELECT client_id 
-                  FROM jobs 
-                  GROUP BY client_id 
-                  HAVING COUNT(*) > 1
-                ) AS repeat_clients
-            """))
-            performance_data['repeat_clients'] = result.scalar() or 0
-            
-            # Average Revenue Per Client
-            result = conn.execute(db.text("""
-                SELECT ROUND(AVG(total_paid), 2) AS avg_client_revenue
-                FROM (
-                  SELECT client_id, SUM(amount_paid) AS total_paid
-                  FROM payments
-                  GROUP BY client_id
-                ) AS client_totals
-            """))
-            performance_data['avg_client_revenue'] = result.scalar() or 0
-            
-            # Calculate repeat client rate
-            result = conn.execute(db.text("""
-                SELECT COUNT(DISTINCT client_id) AS total_clients FROM jobs
-            """))
-            total_clients = result.scalar() or 1
-            performance_data['repeat_client_rate'] = (performance_data['repeat_clients'] / total_clients) * 100 if total_clients > 0 else 0
-            
-            # Additional metrics
-            performance_data['followup_success'] = 76.0
-            performance_data['referral_jobs'] = 4
-            performance_data['jobs_growth'] = 15
-            performance_data['revenue_growth'] = 22
+        performance_data = {}
+        
+        # Business health and productivity metrics come from the KPI rollup tables
+        kpis = kpi_rollup_service.get_dashboard_kpis()
+        totals = kpis['totals']
+        performance_data['total_jobs_month'] = kpis['total_jobs_month']
+        performance_data['completion_rate'] = kpis['completion_rate']
+        performance_data['revenue_month'] = kpis['revenue_month']
+        performance_data['outstanding_invoices'] = totals.get('outstanding_invoices', 0)
+        performance_data['outstanding_amount'] = totals.get('outstanding_amount', 0)
+        performance_data['quote_conversion'] = kpis['quote_conversion']
+        performance_data['avg_job_hours'] = totals.get('avg_job_hours', 0)
+        performance_data['jobs_per_staff'] = totals.get('jobs_per_staff', 0)
+        
+        # Additional calculated metrics
+        performance_data['checklist_completion'] = 85.0  # Would calculate from actual checklist data
+        performance_data['ontime_completion'] = 92.0
+        performance_data['calendar_utilization'] = 78.0
+        performance_data['rescheduled_jobs'] = 3
+        performance_data['schedule_conflicts'] = 1
+        performance_data['recurring_success'] = 88.0
+        performance_data['jobs_with_photos'] = 75.0
+        performance_data['zero_rework'] = 94.0
+        performance_data['client_satisfaction'] = 4.6
+        performance_data['material_waste'] = 3.2
+        
+        # Average Job Value
+        performance_data['avg_job_value'] = totals.get('avg_job_value', 0)
+        
+        # Profit Margin (simplified calculation)
+        performance_data['profit_margin'] = 32.5
+        performance_data['collection_rate'] = 94.2
+        
+        # Client Retention Metrics
+        performance_data['repeat_clients'] = totals.get('repeat_clients', 0)
+        performance_data['avg_client_revenue'] = totals.get('avg_client_revenue', 0)
+        total_clients = totals.get('total_clients', 0)
+        performance_data['repeat_client_rate'] = (performance_data['repeat_clients'] / total_clients) * 100 if total_clients > 0 else 0
+        
+        # Additional metrics
+        performance_data['followup_success'] = 76.0
+        performance_data['referral_jobs'] = 4
+        performance_data['jobs_growth'] = 15
+        performance_data['revenue_growth'] = 22
         
         return render_template('admin/sections/performance_section.html', 
                              performance=performance_data)
@@ -428,7 +397,7 @@ def admin_performance():
 def admin_financial_reports():
     """Financial reports page with comprehensive business reports"""
     try:
-        with db.engine.connect() as conn:
+        with reporting_connection() as conn:
             # Generate comprehensive financial reports using the SQL queries provided
             reports_data = {}
             
@@ -851,6 +820,18 @@ def admin_data_management():
         flash('Error loading data management', 'error')
         return redirect('/admin-home')
 
+@app.route('/api/admin/storage/cache-stats')
+def api_storage_cache_stats():
+    """Get JSON data file cache hit/miss counters"""
+    try:
+        return jsonify({
+            'success': True,
+            'cache': storage_service.get_cache_stats()
+        })
+    except Exception as e:
+        logging.error(f"Storage cache stats error: {e}")
+        return jsonify({'success': False, 'message': 'Unable to fetch cache statistics'}), 500
+
 # Duplicate admin_notifications route removed to avoid conflicts
 
 @app.route('/admin/settings')
@@ -1748,51 +1729,80 @@ def api_csv_stats():
         logging.error(f"CSV stats error: {e}")
         return jsonify({'contacts': 0, 'quotes': 0, 'invoices': 0, 'clients': 0, 'total': 0})
 
+# Keyset-paginated CRM listings (?limit=, ?cursor=, ?fields= plus the filters below;
+# one page of up to DEFAULT_PAGE_SIZE rows by default, every matching row streamed with ?stream=1)
+CONTACTS_LIST_QUERY = KeysetQuery(
+    'clients', [*nulls_last('created_at', "'epoch'::timestamp"), 'client_id'],
+    columns={'contact_id': 'client_id', 'name': 'name', 'email': 'email', 'phone': 'phone',
+             'message': 'notes', 'created_at': 'created_at'},
+    filters={'q': "name ILIKE '%' || :value || '%' OR email ILIKE '%' || :value || '%'",
+             'since': 'created_at >= :value'}
+)
+QUOTES_LIST_QUERY = KeysetQuery(
+    'quotes', [*nulls_last('created_at', "'epoch'::timestamp"), 'quote_number'],
+    columns={'quote_id': 'quote_number', 'client_id': 'client_id', 'service_type': "'Service'",
+             'total_amount': 'total_amount', 'status': 'status', 'created_at': 'created_at'},
+    filters={'status': 'status = :value', 'client_id': 'client_id = :value', 'since': 'created_at >= :value'}
+)
+INVOICES_LIST_QUERY = KeysetQuery(
+    'invoices', [*nulls_last('created_at', "'epoch'::timestamp"), 'invoice_id'],
+    columns={'invoice_id': 'invoice_id', 'client_id': 'client_id', 'amount_due': 'amount_due',
+             'status': 'status', 'created_at': 'created_at', 'due_date': 'due_date'},
+    filters={'status': 'status = :value', 'client_id': 'client_id = :value', 'since': 'created_at >= :value'}
+)
+CLIENT_JOBS_QUERY = KeysetQuery(
+    'jobs', [*nulls_last('timestamp_created', "'epoch'::timestamp"), 'job_id'], where='client_id = :client_id',
+    filters={'jobs_status': 'status = :value'}
+)
+CLIENT_QUOTES_QUERY = KeysetQuery(
+    'quotes', [*nulls_last('created_at', "'epoch'::timestamp"), 'quote_number'], where='client_id = :client_id',
+    filters={'quotes_status': 'status = :value'}
+)
+
 @app.route('/api/contacts')
 def api_contacts():
-    """Get contacts data"""
+    """Get contacts (one page per request; ?stream=1 for every row)"""
     try:
+        if wants_stream(request.args):
+            return streaming_json_response(CONTACTS_LIST_QUERY.stream(db.engine, request.args))
+
         with db.engine.connect() as conn:
-            result = conn.execute(db.text("""
-                SELECT client_id as contact_id, name, email, phone, notes as message, created_at
-                FROM clients
-                ORDER BY created_at DESC
-            """))
-            contacts = [dict(row._mapping) for row in result]
-            return jsonify(contacts)
+            contacts, next_cursor = CONTACTS_LIST_QUERY.fetch(conn, request.args)
+            return paginated_response(contacts, next_cursor, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"API contacts error: {e}")
         return jsonify([])
 
 @app.route('/api/quotes')
 def api_quotes():
-    """Get quotes data"""
+    """Get quotes (one page per request; ?stream=1 for every row)"""
     try:
+        if wants_stream(request.args):
+            return streaming_json_response(QUOTES_LIST_QUERY.stream(db.engine, request.args))
+
         with db.engine.connect() as conn:
-            result = conn.execute(db.text("""
-                SELECT quote_number as quote_id, client_id, 'Service' as service_type, 
-                       total_amount, status, created_at
-                FROM quotes
-                ORDER BY created_at DESC
-            """))
-            quotes = [dict(row._mapping) for row in result]
-            return jsonify(quotes)
+            quotes, next_cursor = QUOTES_LIST_QUERY.fetch(conn, request.args)
+            return paginated_response(quotes, next_cursor, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"API quotes error: {e}")
         return jsonify([])
 
 @app.route('/api/invoices')
 def api_invoices():
-    """Get invoices data"""
+    """Get invoices (one page per request; ?stream=1 for every row)"""
     try:
+        if wants_stream(request.args):
+            return streaming_json_response(INVOICES_LIST_QUERY.stream(db.engine, request.args))
+
         with db.engine.connect() as conn:
-            result = conn.execute(db.text("""
-                SELECT invoice_id, client_id, amount_due, status, created_at, due_date
-                FROM invoices
-                ORDER BY created_at DESC
-            """))
-            invoices = [dict(row._mapping) for row in result]
-            return jsonify(invoices)
+            invoices, next_cursor = INVOICES_LIST_QUERY.fetch(conn, request.args)
+            return paginated_response(invoices, next_cursor, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"API invoices error: {e}")
         return jsonify([])
@@ -1826,37 +1836,38 @@ def api_dashboard_stats():
 
 @app.route('/api/admin/client/<client_id>')
 def api_client_details(client_id):
-    """API endpoint for client details"""
+    """API endpoint for client details (jobs/quotes paged with jobs_cursor/quotes_cursor)"""
     try:
         with db.engine.connect() as conn:
-            # Get client details
-            client_result = conn.execute(db.text("""
-                SELECT * FROM clients WHERE client_id = :client_id
+            # Get client details, projected with ?fields=
+            columns = get_table_columns(conn, 'clients')
+            requested = [name.strip() for name in request.args.get('fields', '').split(',') if name.strip()]
+            unknown = [name for name in requested if name not in columns]
+            if unknown:
+                raise PaginationError(f"Unknown field(s): {', '.join(unknown)}")
+            projection = ', '.join(f'"{name}"' for name in requested) if requested else '*'
+            client_result = conn.execute(db.text(f"""
+                SELECT {projection} FROM clients WHERE client_id = :client_id
             """), {'client_id': client_id})
             client = client_result.first()
             
             if not client:
                 return jsonify({'error': 'Client not found'}), 404
             
-            # Get client jobs
-            jobs_result = conn.execute(db.text("""
-                SELECT * FROM jobs WHERE client_id = :client_id
-                ORDER BY timestamp_created DESC
-            """), {'client_id': client_id})
-            jobs = [dict(row._mapping) for row in jobs_result]
-            
-            # Get client quotes
-            quotes_result = conn.execute(db.text("""
-                SELECT * FROM quotes WHERE client_id = :client_id
-                ORDER BY created_at DESC
-            """), {'client_id': client_id})
-            quotes = [dict(row._mapping) for row in quotes_result]
+            # Get a page of client jobs and quotes
+            params = {'client_id': client_id}
+            jobs, jobs_next_cursor = CLIENT_JOBS_QUERY.fetch(conn, request.args, params, prefix='jobs_')
+            quotes, quotes_next_cursor = CLIENT_QUOTES_QUERY.fetch(conn, request.args, params, prefix='quotes_')
             
             return jsonify({
                 'client': dict(client._mapping),
                 'jobs': jobs,
-                'quotes': quotes
+                'quotes': quotes,
+                'jobs_next_cursor': jobs_next_cursor,
+                'quotes_next_cursor': quotes_next_cursor
             })
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"Client details API error: {e}")
         return jsonify({'error': 'Failed to load client details'}), 500
\ No newline at end of file
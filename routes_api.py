@@ -9,55 +9,93 @@ import logging
 from flask import request, jsonify
 from datetime import datetime, timedelta
 from config.app import app, db
+from services.bulk_ingest import CLIENTS_TABLE, STAFF_TABLE
+from services.db_pool import get_pool_stats
+from services.id_allocator import next_db_sequence_value
+from services.keyset_pagination import (KeysetQuery, PaginationError, nulls_last, paginated_response,
+                                       stream_rows, streaming_json_response, wants_stream)
+from services.kpi_rollup_service import kpi_rollup_service
+from services.query_registry import query_registry
+from services.recurrence import RecurrenceRule
+
+
+def _next_document_number(conn, table, column, prefix, sequence):
+    """Allocate the next <prefix>NNN number from a per-year database sequence"""
+    year = datetime.now().year
+    full_prefix = f"{prefix}{year}-"
+    next_num = next_db_sequence_value(conn, f"{sequence}_{year}_seq", seed_sql=f"""
+        SELECT COALESCE(MAX(CAST(SUBSTRING({column} FROM {len(full_prefix) + 1}) AS INTEGER)), 0)
+        FROM {table}
+        WHERE {column} ~ '^{full_prefix}[0-9]+$'
+    """)
+    return f"{full_prefix}{next_num:03d}"
+
+
+# Keyset-paginated dropdown listings (?limit=, ?cursor=, ?fields= plus the filters below;
+# one page of up to DEFAULT_PAGE_SIZE rows by default, every matching row streamed with ?stream=1)
+CLIENTS_LIST_QUERY = KeysetQuery(
+    'clients', ["COALESCE(name, '')", 'client_id'], direction='ASC',
+    columns={'client_id': 'client_id', 'name': 'name', 'email': 'email', 'phone': 'phone'},
+    filters={'q': "name ILIKE '%' || :value || '%' OR email ILIKE '%' || :value || '%'"}
+)
+JOBS_LIST_QUERY = KeysetQuery(
+    'jobs', [*nulls_last('timestamp_created', "'epoch'::timestamp"), 'job_id'],
+    columns={'job_id': 'job_id', 'service_type': 'service_type', 'status': 'status', 'client_id': 'client_id'},
+    filters={'status': 'status = :value', 'client_id': 'client_id = :value'}
+)
+STAFF_LIST_QUERY = KeysetQuery(
+    'staff', ["COALESCE(name, '')", 'staff_id'], direction='ASC', where='active = true',
+    columns={'staff_id': 'staff_id', 'name': 'name', 'role': 'role', 'active': 'active'},
+    filters={'role': 'role = :value'}
+)
 
 @app.route('/api/admin/clients/list')
 def api_clients_list():
-    """Get list of all clients for dropdowns"""
+    """Get clients for dropdowns (one page per request; ?stream=1 for every row)"""
     try:
+        if wants_stream(request.args):
+            return streaming_json_response(CLIENTS_LIST_QUERY.stream(db.engine, request.args))
+        
         with db.engine.connect() as conn:
-            result = conn.execute(db.text("""
-                SELECT client_id, name, email, phone 
-                FROM clients 
-                ORDER BY name
-            """))
-            clients = [dict(row._mapping) for row in result]
+            clients, next_cursor = CLIENTS_LIST_QUERY.fetch(conn, request.args)
         
-        return jsonify(clients)
+        return paginated_response(clients, next_cursor, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"API clients list error: {e}")
         return jsonify({'error': 'Failed to load clients'}), 500
 
 @app.route('/api/admin/jobs/list')
 def api_jobs_list():
-    """Get list of all jobs for dropdowns"""
+    """Get jobs for dropdowns (one page per request; ?stream=1 for every row)"""
     try:
+        if wants_stream(request.args):
+            return streaming_json_response(JOBS_LIST_QUERY.stream(db.engine, request.args))
+        
         with db.engine.connect() as conn:
-            result = conn.execute(db.text("""
-                SELECT job_id, service_type, status, client_id
-                FROM jobs 
-                ORDER BY timestamp_created DESC
-            """))
-            jobs = [dict(row._mapping) for row in result]
+            jobs, next_cursor = JOBS_LIST_QUERY.fetch(conn, request.args)
         
-        return jsonify(jobs)
+        return paginated_response(jobs, next_cursor, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"API jobs list error: {e}")
         return jsonify({'error': 'Failed to load jobs'}), 500
 
 @app.route('/api/admin/staff/list')
 def api_staff_list():
-    """Get list of all staff for dropdowns"""
+    """Get active staff for dropdowns (one page per request; ?stream=1 for every row)"""
     try:
+        if wants_stream(request.args):
+            return streaming_json_response(STAFF_LIST_QUERY.stream(db.engine, request.args))
+        
         with db.engine.connect() as conn:
-            result = conn.execute(db.text("""
-                SELECT staff_id, name, role, active
-                FROM staff 
-                WHERE active = true
-                ORDER BY name
-            """))
-            staff = [dict(row._mapping) for row in result]
+            staff, next_cursor = STAFF_LIST_QUERY.fetch(conn, request.args)
         
-        return jsonify(staff)
+        return paginated_response(staff, next_cursor, request.args)
+    except PaginationError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         logging.error(f"API staff list error: {e}")
         return jsonify({'error': 'Failed to load staff'}), 500
@@ -71,13 +109,7 @@ def api_create_job():
         # Generate job ID
         with db.engine.connect() as conn:
             # Get next job number
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) + 1 as next_num 
-                FROM jobs 
-                WHERE job_id LIKE 'J2025-%'
-            """))
-            next_num = result.scalar()
-            job_id = f"J2025-{next_num:03d}"
+            job_id = _next_document_number(conn, 'jobs', 'job_id', 'J', 'job_number')
             
             # Insert new job
             conn.execute(db.text("""
@@ -96,6 +128,8 @@ def api_create_job():
             })
             conn.commit()
         
+        kpi_rollup_service.record_change()
+        
         return jsonify({'success': True, 'job_id': job_id})
     except Exception as e:
         logging.error(f"API create job error: {e}")
@@ -130,13 +164,7 @@ def api_create_invoice():
         
         with db.engine.connect() as conn:
             # Generate invoice number
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) + 1 as next_num 
-                FROM invoices 
-                WHERE invoice_id LIKE 'INV-2025-%'
-            """))
-            next_num = result.scalar()
-            invoice_number = f"INV-2025-{next_num:03d}"
+            invoice_number = _next_document_number(conn, 'invoices', 'invoice_id', 'INV-', 'invoice_number')
             
             # Calculate totals
             subtotal = sum(item['quantity'] * item['unit_price'] for item in data.get('items', []))
@@ -224,6 +252,8 @@ def api_record_payment():
             
             conn.commit()
         
+        kpi_rollup_service.record_change([data.get('payment_date')])
+        
         return jsonify({'success': True})
     except Exception as e:
         logging.error(f"API record payment error: {e}")
@@ -300,47 +330,46 @@ def api_adjust_inventory(item_id):
         logging.error(f"API adjust inventory error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def _calendar_event(job):
+    """Format a job row for FullCalendar"""
+    start_date = job['scheduled_date']
+    if isinstance(start_date, str):
+        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
+    
+    # Estimate end time based on estimated hours
+    estimated_hours = job.get('estimated_hours') or 4
+    end_date = start_date + timedelta(hours=float(estimated_hours))
+    
+    return {
+        'id': job['job_id'],
+        'title': f"{job['service_type']} - {job['client_name']}",
+        'start': start_date.isoformat(),
+        'end': end_date.isoformat(),
+        'extendedProps': {
+            'client': job['client_name'],
+            'location': job['location'],
+            'status': job['status'],
+            'jobId': job['job_id']
+        }
+    }
+
 @app.route('/api/admin/calendar/events')
 def api_calendar_events():
     """Get calendar events for FullCalendar"""
     try:
-        with db.engine.connect() as conn:
-            result = conn.execute(db.text("""
-                SELECT j.job_id, j.service_type, j.scheduled_date, j.status,
-                       j.estimated_hours, c.name as client_name, j.location
-                FROM jobs j
-                LEFT JOIN clients c ON j.client_id = c.client_id
-                WHERE j.scheduled_date IS NOT NULL
-                ORDER BY j.scheduled_date
-            """))
-            jobs = [dict(row._mapping) for row in result]
-            
-            # Format for FullCalendar
-            events = []
-            for job in jobs:
-                if job['scheduled_date']:
-                    start_date = job['scheduled_date']
-                    if isinstance(start_date, str):
-                        start_date = datetime.fromisoformat(start_date.replace('Z', '+00:00'))
-                    
-                    # Estimate end time based on estimated hours
-                    estimated_hours = job.get('estimated_hours', 4)
-                    end_date = start_date + timedelta(hours=estimated_hours)
-                    
-                    events.append({
-                        'id': job['job_id'],
-                        'title': f"{job['service_type']} - {job['client_name']}",
-                        'start': start_date.isoformat(),
-                        'end': end_date.isoformat(),
-                        'extendedProps': {
-                            'client': job['client_name'],
-                            'location': job['location'],
-                            'status': job['status'],
-                            'jobId': job['job_id']
-                        }
-                    })
-        
-        return jsonify(events)
+        def calendar_events():
+            with db.engine.connect() as conn:
+                # Server-side cursor: rows are formatted and sent as they arrive
+                yield from stream_rows(conn, """
+                    SELECT j.job_id, j.service_type, j.scheduled_date, j.status,
+                           j.estimated_hours, c.name as client_name, j.location
+                    FROM jobs j
+                    LEFT JOIN clients c ON j.client_id = c.client_id
+                    WHERE j.scheduled_date IS NOT NULL
+                    ORDER BY j.scheduled_date
+                """, transform=_calendar_event)
+        
+        return streaming_json_response(calendar_events())
     except Exception as e:
         logging.error(f"API calendar events error: {e}")
         return jsonify([])  # Return empty array on error
@@ -360,47 +389,121 @@ def api_check_conflicts():
         logging.error(f"API check conflicts error: {e}")
         return jsonify({'conflicts': []})
 
+@app.route('/api/admin/appointments/recurring', methods=['POST'])
+def api_create_recurring_appointments():
+    """Book a first appointment and its whole recurring series (e.g. a maintenance plan)"""
+    try:
+        from services.unified_scheduler import unified_scheduler
+
+        data = request.get_json() or {}
+        appointment_data = data.get('appointment') or {}
+        recurrence = data.get('recurrence') or {}
+        missing = [field for field in ('client_name', 'service_type', 'scheduled_date') if not appointment_data.get(field)]
+        if missing:
+            return jsonify({'error': f"Missing required fields: {', '.join(missing)}"}), 400
+        try:
+            RecurrenceRule.from_config(recurrence)
+        except (TypeError, ValueError) as e:
+            return jsonify({'error': f"Invalid recurrence: {e}"}), 400
+
+        validation = unified_scheduler.validate_appointment_time(
+            appointment_data['scheduled_date'],
+            appointment_data.get('scheduled_time', '09:00'),
+            appointment_data.get('estimated_duration', 120)
+        )
+        if not validation['valid']:
+            return jsonify({'error': validation['reason'], 'suggestions': validation.get('suggestions', [])}), 409
+
+        first = unified_scheduler.create_appointment(appointment_data)
+        series = unified_scheduler.create_recurring_appointments(first, recurrence)
+        return jsonify({
+            'success': True,
+            'appointment': first,
+            'recurring_appointments': series,
+            'created': 1 + len(series)
+        })
+    except Exception as e:
+        logging.error(f"Create recurring appointments error: {e}")
+        return jsonify({'error': 'Failed to create recurring appointments'}), 500
+
+@app.route('/api/admin/schedule/optimize-routes', methods=['POST'])
+def api_optimize_crew_routes():
+    """Plan crew assignments and stop order for a day (saved when apply is true)"""
+    try:
+        from services.unified_scheduler import unified_scheduler
+
+        data = request.get_json() or {}
+        if not data.get('date'):
+            return jsonify({'error': 'date is required'}), 400
+        result = unified_scheduler.plan_crew_routes(
+            data['date'],
+            staff_ids=data.get('staff_ids'),
+            time_flex_minutes=data.get('time_flex_minutes', 60),
+            apply=bool(data.get('apply', False))
+        )
+        return jsonify(result), 200 if result.get('success') else 400
+    except Exception as e:
+        logging.error(f"Optimize crew routes error: {e}")
+        return jsonify({'error': 'Failed to plan crew routes'}), 500
+
+@app.route('/api/admin/schedule/open-slots')
+def api_find_open_slots():
+    """Earliest open (date, time, staff) slots for a job across the booking horizon"""
+    try:
+        from services.unified_scheduler import unified_scheduler
+
+        staff_ids = [staff_id.strip() for staff_id in request.args.get('staff_ids', '').split(',') if staff_id.strip()]
+        result = unified_scheduler.find_open_slots(
+            duration_minutes=request.args.get('duration', 120, type=int),
+            count=max(1, min(50, request.args.get('count', 10, type=int))),
+            start_date=request.args.get('start_date') or None,
+            days=request.args.get('days', 30, type=int),
+            staff_ids=staff_ids or None,
+            skill=request.args.get('skill') or None,
+            require_all=request.args.get('require_all') == '1',
+            earliest=request.args.get('earliest') or None,
+            latest=request.args.get('latest') or None
+        )
+        return jsonify(result), 200 if result.get('success') else 400
+    except Exception as e:
+        logging.error(f"Find open slots error: {e}")
+        return jsonify({'error': 'Failed to search open slots'}), 500
+
 
 
+@app.route('/api/admin/system/db-pool')
+def api_db_pool_stats():
+    """Get database connection pool size, overflow and wait metrics"""
+    try:
+        return jsonify(get_pool_stats())
+    except Exception as e:
+        logging.error(f"DB pool stats error: {e}")
+        return jsonify({'error': 'Failed to load pool stats'}), 500
+
+@app.route('/api/admin/system/query-metrics')
+def api_query_metrics():
+    """Get per-query call counts and p50/p95/p99 latency"""
+    try:
+        if request.args.get('reset') == '1':
+            query_registry.reset_metrics()
+        return jsonify({'slow_query_ms': query_registry.slow_ms, 'queries': query_registry.get_metrics()})
+    except Exception as e:
+        logging.error(f"Query metrics error: {e}")
+        return jsonify({'error': 'Failed to load query metrics'}), 500
+
 @app.route('/api/admin/performance/live-data')
 def api_performance_live_data():
     """Get live performance data for real-time updates"""
     try:
-        with db.engine.connect() as conn:
-            # Get current metrics
-            data = {}
-            
-            # Total jobs this month
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) FROM jobs
-                WHERE DATE_TRUNC('month', timestamp_created) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            data['totalJobsMonth'] = result.scalar() or 0
-            
-            # Completion rate
-            result = conn.execute(db.text("""
-                SELECT ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'completed') / NULLIF(COUNT(*), 0), 2)
-                FROM jobs
-                WHERE DATE_TRUNC('month', timestamp_created) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            data['completionRate'] = result.scalar() or 0
-            
-            # Revenue this month
-            result = conn.execute(db.text("""
-                SELECT COALESCE(SUM(amount_paid), 0)
-                FROM payments
-                WHERE DATE_TRUNC('month', payment_date) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            data['revenueMonth'] = result.scalar() or 0
-            
-            # Quote conversion rate
-            result = conn.execute(db.text("""
-                SELECT ROUND(100.0 * COUNT(*) FILTER (WHERE status = 'accepted') / NULLIF(COUNT(*), 0), 2)
-                FROM quotes
-                WHERE DATE_TRUNC('month', created_at) = DATE_TRUNC('month', CURRENT_DATE)
-            """))
-            data['conversionRate'] = result.scalar() or 0
-            
+        # Read precomputed rows from the KPI rollup tables
+        kpis = kpi_rollup_service.get_dashboard_kpis()
+        data = {
+            'totalJobsMonth': kpis['total_jobs_month'],
+            'completionRate': kpis['completion_rate'],
+            'revenueMonth': kpis['revenue_month'],
+            'conversionRate': kpis['quote_conversion']
+        }
+        
         return jsonify(data)
     except Exception as e:
         logging.error(f"Performance live data error: {e}")
@@ -446,13 +549,7 @@ def api_create_quote():
         
         with db.engine.connect() as conn:
             # Generate quote number
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) + 1 as next_num 
-                FROM quotes 
-                WHERE quote_number LIKE 'Q2025-%'
-            """))
-            next_num = result.scalar()
-            quote_number = f"Q2025-{next_num:03d}"
+            quote_number = _next_document_number(conn, 'quotes', 'quote_number', 'Q', 'quote_number')
             
             # Calculate totals
             subtotal = sum(item['quantity'] * item['unit_price'] for item in data.get('items', []))
@@ -495,6 +592,8 @@ def api_create_quote():
             if data.get('status') == 'sent':
                 send_quote_email(quote_number, data.get('client_id'))
         
+        kpi_rollup_service.record_change()
+        
         return jsonify({'success': True, 'quote_number': quote_number})
     except Exception as e:
         logging.error(f"API create quote error: {e}")
@@ -546,13 +645,7 @@ def api_convert_quote_to_job(quote_number):
                 return jsonify({'error': 'Quote not found'}), 404
             
             # Generate job ID
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) + 1 as next_num 
-                FROM jobs 
-                WHERE job_id LIKE 'J2025-%'
-            """))
-            next_num = result.scalar()
-            job_id = f"J2025-{next_num:03d}"
+            job_id = _next_document_number(conn, 'jobs', 'job_id', 'J', 'job_number')
             
             # Create job from quote
             conn.execute(db.text("""
@@ -573,6 +666,8 @@ def api_convert_quote_to_job(quote_number):
             
             conn.commit()
         
+        kpi_rollup_service.record_change([quote.created_at])
+        
         return jsonify({'success': True, 'job_id': job_id})
     except Exception as e:
         logging.error(f"Convert quote to job error: {e}")
@@ -593,13 +688,7 @@ def api_convert_quote_to_invoice(quote_number):
                 return jsonify({'error': 'Quote not found'}), 404
             
             # Generate invoice number
-            result = conn.execute(db.text("""
-                SELECT COUNT(*) + 1 as next_num 
-                FROM invoices 
-                WHERE invoice_id LIKE 'INV-2025-%'
-            """))
-            next_num = result.scalar()
-            invoice_number = f"INV-2025-{next_num:03d}"
+            invoice_number = _next_document_number(conn, 'invoices', 'invoice_id', 'INV-', 'invoice_number')
             
             # Create invoice from quote
             conn.execute(db.text("""
@@ -956,13 +1045,18 @@ def api_complete_job(job_id):
     """Mark job as complete"""
     try:
         with db.engine.connect() as conn:
-            conn.execute(db.text("""
+            result = conn.execute(db.text("""
                 UPDATE jobs 
                 SET status = 'completed', completed_at = NOW()
                 WHERE job_id = :job_id
+                RETURNING timestamp_created
             """), {'job_id': job_id})
+            created = result.scalar()
             conn.commit()
         
+        # Completion counts toward the day the job was created
+        kpi_rollup_service.record_change([created])
+        
         return jsonify({'success': True})
     except Exception as e:
         logging.error(f"Complete job error: {e}")
@@ -975,11 +1069,9 @@ def api_create_staff():
     try:
         data = request.get_json()
         
-        # Generate staff ID
+        # Generate staff ID from the sequence bulk staff uploads also draw from
         with db.engine.connect() as conn:
-            result = conn.execute(db.text("SELECT COUNT(*) FROM staff"))
-            staff_count = result.scalar() or 0
-            staff_id = f"SPK{str(staff_count + 3).zfill(3)}"
+            staff_id = STAFF_TABLE.next_id(conn)
             
             conn.execute(db.text("""
                 INSERT INTO staff (staff_id, name, email, phone, role, pin, skills, availability, active)
@@ -1191,6 +1283,8 @@ def api_record_new_payment():
             
             conn.commit()
         
+        kpi_rollup_service.record_change([data.get('payment_date')])
+        
         return jsonify({'success': True, 'payment_id': payment_id})
     except Exception as e:
         logging.error(f"Record payment error: {e}")
@@ -1203,10 +1297,8 @@ def api_create_client():
         data = request.get_json()
         
         with db.engine.connect() as conn:
-            # Generate client ID
-            result = conn.execute(db.text("SELECT COUNT(*) FROM clients"))
-            client_count = result.scalar() or 0
-            client_id = f"CLI{str(client_count + 1).zfill(3)}"
+            # Generate client ID from the sequence bulk client uploads also draw from
+            client_id = CLIENTS_TABLE.next_id(conn)
             
             conn.execute(db.text("""
                 INSERT INTO clients (client_id, name, email, phone, address)
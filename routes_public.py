@@ -3,19 +3,18 @@ Public-facing routes for SPANKKS Construction website
 Pulls data exclusively from PostgreSQL database
 """
 
-import os
 import logging
-import psycopg2
 from psycopg2.extras import RealDictCursor
-from flask import render_template, request
+from flask import jsonify, render_template, request
 from config.app import app
+from services.db_pool import db_connection
 
 @app.route('/spankks-skool')
 def spankks_skool():
     """SPANKKS SKOOL educational platform with courses from database"""
     try:
         # Get courses organized by category from database
-        with psycopg2.connect(os.environ.get('DATABASE_URL')) as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
                     SELECT 
@@ -70,7 +69,7 @@ def consultation():
     """Consultation booking page with services from database"""
     try:
         # Get services for consultation form
-        with psycopg2.connect(os.environ.get('DATABASE_URL')) as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
                     SELECT 
@@ -117,7 +116,7 @@ def public_home():
     """Home page with featured services from database"""
     try:
         # Get featured services (highest value services from each category)
-        with psycopg2.connect(os.environ.get('DATABASE_URL')) as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
                     SELECT DISTINCT ON (sc.name)
@@ -168,7 +167,7 @@ def public_services():
     """Public services page with data from PostgreSQL database"""
     try:
         # Get all services organized by category from database
-        with psycopg2.connect(os.environ.get('DATABASE_URL')) as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
                     SELECT 
@@ -208,7 +207,7 @@ def public_pricing():
     """Public pricing page with data from PostgreSQL database"""
     try:
         # Get services organized by category from database
-        with psycopg2.connect(os.environ.get('DATABASE_URL')) as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 # Get services by category
                 cur.execute("""
@@ -282,7 +281,7 @@ def public_about():
     """About page with company information"""
     try:
         # Small husband and wife business in Honolulu - use authentic minimal stats only
-        with psycopg2.connect(os.environ.get('DATABASE_URL')) as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
                     SELECT 
@@ -308,7 +307,7 @@ def public_contact():
     """Contact page with service options from database"""
     try:
         # Get services for contact form dropdown
-        with psycopg2.connect(os.environ.get('DATABASE_URL')) as conn:
+        with db_connection() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
                 cur.execute("""
                     SELECT 
@@ -335,4 +334,15 @@ def public_contact():
                              
     except Exception as e:
         logger.error(f"Error loading contact page: {str(e)}")
-        return render_template('contact.html', services_by_category={})
\ No newline at end of file
+        return render_template('contact.html', services_by_category={})
+
+@app.route('/api/booking/availability')
+def public_booking_availability():
+    """Open consultation slots for the booking widget, up to 90 days ahead in one call"""
+    try:
+        from services.real_time_scheduler import MAX_AVAILABILITY_DAYS, real_time_scheduler
+        days = max(1, min(MAX_AVAILABILITY_DAYS, request.args.get('days', 60, type=int)))
+        return jsonify({'days': days, 'availability': real_time_scheduler.get_availability(days)})
+    except Exception as e:
+        logger.error(f"Error loading booking availability: {str(e)}")
+        return jsonify({'error': 'Availability is temporarily unavailable'}), 500
@@ -0,0 +1,81 @@
+"""
+Availability Index for SPANKKS Construction scheduling
+Per-day busy intervals (buffers included) answering slot-free checks with binary search
+"""
+
+from bisect import bisect_left, bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Tuple
+
+
+def time_to_minutes(time_str: str) -> int:
+    """'HH:MM' -> minutes after midnight"""
+    hours, minutes = time_str.split(':')[:2]
+    return int(hours) * 60 + int(minutes)
+
+
+def minutes_to_time(minutes: int) -> str:
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+class DayAvailabilityIndex:
+    """Busy time on one day, in minutes after midnight.
+
+    Each booking is widened by `buffer_minutes` on both sides, then the
+    bookings are kept sorted by start and also merged into disjoint busy
+    blocks. is_free() is two binary searches over the blocks; conflicts()
+    only looks at bookings starting before the requested slot ends.
+    """
+
+    def __init__(self, bookings: Iterable[Tuple[int, int, Dict[str, Any]]], buffer_minutes: int = 0):
+        self.buffer_minutes = buffer_minutes
+        self._bookings = sorted(
+            ((start - buffer_minutes, end + buffer_minutes, booking) for start, end, booking in bookings),
+            key=lambda entry: (entry[0], entry[1])
+        )
+        self._booking_starts = [start for start, _, _ in self._bookings]
+
+        self._block_starts: List[int] = []
+        self._block_ends: List[int] = []
+        for start, end, _ in self._bookings:
+            if self._block_ends and start <= self._block_ends[-1]:
+                self._block_ends[-1] = max(self._block_ends[-1], end)
+            else:
+                self._block_starts.append(start)
+                self._block_ends.append(end)
+
+    def __len__(self) -> int:
+        return len(self._bookings)
+
+    def is_free(self, start: int, end: int) -> bool:
+        """True when [start, end) overlaps no buffered booking"""
+        position = bisect_right(self._block_starts, start) - 1
+        if position >= 0 and self._block_ends[position] > start:
+            return False
+        following = position + 1
+        return following >= len(self._block_starts) or self._block_starts[following] >= end
+
+    def conflicts(self, start: int, end: int) -> List[Dict[str, Any]]:
+        """Bookings whose buffered interval overlaps [start, end), in start order"""
+        stop = bisect_left(self._booking_starts, end)
+        return [booking for booking_start, booking_end, booking in self._bookings[:stop] if booking_end > start]
+
+    def free_slots(self, open_minutes: int, close_minutes: int, duration: int, step: int = 30) -> Iterator[int]:
+        """Start minutes on the `step` grid from open_minutes where `duration` fits before close_minutes.
+
+        A slot that collides with a busy block skips straight to the first
+        grid point at or after that block's end.
+        """
+        current = open_minutes
+        while current + duration <= close_minutes:
+            position = bisect_right(self._block_starts, current) - 1
+            if position >= 0 and self._block_ends[position] > current:
+                blocked_until = self._block_ends[position]
+            else:
+                following = position + 1
+                if following >= len(self._block_starts) or self._block_starts[following] >= current + duration:
+                    yield current
+                    current += step
+                    continue
+                blocked_until = self._block_ends[following]
+            # Jump to the first grid point past the blocking interval
+            current += max(step, -(-(blocked_until - current) // step) * step)
@@ -0,0 +1,183 @@
+"""
+Bulk Ingest Service for SPANKKS Construction
+Loads validated CSV upload rows into PostgreSQL with COPY inside one transaction
+"""
+
+import csv
+import io
+import logging
+import os
+from dataclasses import dataclass
+from typing import Any, Dict, List, Sequence, Tuple
+
+from services.dashboard_stats_service import DASHBOARD_TABLES, dashboard_stats_service
+from services.db_pool import get_engine
+from services.id_allocator import ensure_db_sequence, next_db_sequence_value
+
+
+@dataclass(frozen=True)
+class BulkTable:
+    """A table bulk uploads load into, and how its IDs (e.g. CLI001) are generated"""
+    table: str
+    id_column: str
+    id_prefix: str
+    sequence: str
+    id_width: int = 3
+
+    @property
+    def seed_sql(self) -> str:
+        """Highest number already used in id_column, so the sequence starts after existing rows"""
+        return (
+            f"SELECT COALESCE(MAX(SUBSTRING({self.id_column} FROM {len(self.id_prefix) + 1})::bigint), 0) "
+            f"FROM {self.table} WHERE {self.id_column} ~ '^{self.id_prefix}[0-9]+$'"
+        )
+
+    def next_id(self, conn) -> str:
+        """Allocate one ID from the same sequence bulk loads number rows with"""
+        return f"{self.id_prefix}{next_db_sequence_value(conn, self.sequence, self.seed_sql):0{self.id_width}d}"
+
+
+CLIENTS_TABLE = BulkTable('clients', 'client_id', 'CLI', 'client_record')
+STAFF_TABLE = BulkTable('staff', 'staff_id', 'SPK', 'staff_record')
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def _db_message(error: Exception) -> str:
+    message = str(getattr(error, 'orig', None) or error)
+    return message.strip().splitlines()[0] if message.strip() else type(error).__name__
+
+
+class BulkIngestService:
+    """Inserts thousands of upload rows with a handful of statements.
+
+    Rows are COPYed into a temporary staging table (all text), then moved
+    into the target table with one INSERT ... SELECT that casts each column
+    to its real type and numbers new IDs from a database sequence. If that
+    insert fails, the rows are retried in halves under savepoints until the
+    offending rows are isolated, so the per-row error report still names
+    every bad row while the good ones are kept.
+    """
+
+    def database_enabled(self) -> bool:
+        """True when uploads should go to PostgreSQL rather than the JSON data files"""
+        if not os.environ.get('DATABASE_URL', '').startswith('postgres'):
+            return False
+        try:
+            return get_engine().dialect.name == 'postgresql'
+        except Exception as e:
+            logging.warning(f"Bulk ingest database unavailable: {e}")
+            return False
+
+    def load(self, target: BulkTable, records: Sequence[Tuple[int, Dict[str, Any]]]) -> Tuple[int, List[Tuple[int, str]]]:
+        """Insert (row_num, row) records; returns (rows inserted, [(row_num, error)])"""
+        if not records:
+            return 0, []
+        from sqlalchemy import text
+
+        errors: List[Tuple[int, str]] = []
+        with get_engine().begin() as conn:
+            column_types = self._column_types(conn, target.table)
+            columns = [name for name in records[0][1] if name in column_types and name != target.id_column]
+            skipped = [name for name in records[0][1] if name not in column_types]
+            if skipped:
+                logging.info(f"Bulk ingest into {target.table} ignores columns it doesn't have: {', '.join(skipped)}")
+
+            staging = f"bulk_{target.table}_staging"
+            conn.execute(text(
+                f"CREATE TEMP TABLE {staging} (row_num integer, "
+                + ", ".join(f"{_quote(name)} text" for name in columns)
+                + ") ON COMMIT DROP"
+            ))
+            self._copy(conn, staging, columns, records)
+            # The insert and every bisection retry select rows by row_num
+            conn.execute(text(f"CREATE INDEX ON {staging} (row_num)"))
+            conn.execute(text(f"ANALYZE {staging}"))
+
+            id_column = target.id_column in column_types
+            if id_column:
+                ensure_db_sequence(conn, target.sequence, target.seed_sql)
+            insert_sql = self._insert_sql(target, staging, columns, column_types, id_column)
+            inserted = self._insert(conn, text(insert_sql), [row_num for row_num, _ in records], errors)
+
+        if inserted and target.table in DASHBOARD_TABLES:
+            # Committed now; don't leave the dashboard on counts from before the upload
+            dashboard_stats_service.invalidate()
+        logging.info(f"Bulk ingest loaded {inserted} of {len(records)} rows into {target.table}")
+        return inserted, errors
+
+    @staticmethod
+    def _column_types(conn, table: str) -> Dict[str, str]:
+        from sqlalchemy import text
+
+        result = conn.execute(text("""
+            SELECT attname, format_type(atttypid, atttypmod)
+            FROM pg_attribute
+            WHERE attrelid = CAST(:table AS regclass) AND attnum > 0 AND NOT attisdropped
+        """), {'table': table})
+        return {name: type_name for name, type_name in result}
+
+    @staticmethod
+    def _copy(conn, staging: str, columns: List[str], records: Sequence[Tuple[int, Dict[str, Any]]]):
+        """COPY records into the staging table; empty values become NULL"""
+        cursor = conn.connection.cursor()
+        try:
+            if hasattr(cursor, 'copy_expert'):
+                buffer = io.StringIO()
+                writer = csv.writer(buffer)
+                for row_num, row in records:
+                    writer.writerow([row_num] + [row.get(name) for name in columns])
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f"COPY {staging} (row_num, {', '.join(_quote(name) for name in columns)}) FROM STDIN WITH (FORMAT csv)",
+                    buffer
+                )
+                return
+        finally:
+            cursor.close()
+
+        # Drivers without COPY support get batched multi-row inserts instead
+        from sqlalchemy import text
+
+        placeholders = ', '.join(f":c{position}" for position in range(len(columns)))
+        conn.execute(text(
+            f"INSERT INTO {staging} (row_num, {', '.join(_quote(name) for name in columns)}) VALUES (:row_num, {placeholders})"
+        ), [
+            dict({'row_num': row_num}, **{f"c{position}": (row.get(name) or None) for position, name in enumerate(columns)})
+            for row_num, row in records
+        ])
+
+    @staticmethod
+    def _insert_sql(target: BulkTable, staging: str, columns: List[str], column_types: Dict[str, str],
+                    id_column: bool) -> str:
+        targets = [_quote(name) for name in columns]
+        values = [f"s.{_quote(name)}::{column_types[name]}" for name in columns]
+        source = f"SELECT * FROM {staging} WHERE row_num = ANY(:rows) ORDER BY row_num"
+        if id_column:
+            targets.insert(0, target.id_column)
+            values.insert(0, (
+                f"'{target.id_prefix}' || LPAD(s._seq::text, GREATEST({target.id_width}, LENGTH(s._seq::text)), '0')"
+            ))
+            source = f"SELECT *, nextval('{target.sequence}') AS _seq FROM ({source}) ordered"
+        return f"INSERT INTO {target.table} ({', '.join(targets)}) SELECT {', '.join(values)} FROM ({source}) s"
+
+    def _insert(self, conn, statement, row_nums: List[int], errors: List[Tuple[int, str]]) -> int:
+        """Insert the staged rows; on failure split the batch until the bad rows are isolated"""
+        from sqlalchemy.exc import DBAPIError
+
+        try:
+            with conn.begin_nested():
+                return conn.execute(statement, {'rows': row_nums}).rowcount
+        except DBAPIError as e:
+            if len(row_nums) == 1:
+                errors.append((row_nums[0], f"Row {row_nums[0]}: Database error - {_db_message(e)}"))
+                return 0
+        middle = len(row_nums) // 2
+        return (self._insert(conn, statement, row_nums[:middle], errors)
+                + self._insert(conn, statement, row_nums[middle:], errors))
+
+
+# Global bulk ingest service instance
+bulk_ingest_service = BulkIngestService()
@@ -9,6 +9,7 @@ import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import pytz
+from services.persistence import with_file_lock, write_json
 
 class CalendarEnhancementService:
     def __init__(self):
@@ -71,8 +72,7 @@ class CalendarEnhancementService:
                 }
             }
             
-            with open(self.calendar_config_file, 'w') as f:
-                json.dump(default_config, f, indent=2)
+            write_json(self.calendar_config_file, default_config)
     
     def get_calendar_config(self) -> Dict:
         """Get current calendar configuration"""
@@ -83,6 +83,7 @@ class CalendarEnhancementService:
             self._ensure_config_file()
             return self.get_calendar_config()
     
+    @with_file_lock('calendar_config_file')
     def update_calendar_config(self, config_updates: Dict) -> bool:
         """Update calendar configuration"""
         try:
@@ -95,8 +96,7 @@ class CalendarEnhancementService:
                 else:
                     config[key] = value
             
-            with open(self.calendar_config_file, 'w') as f:
-                json.dump(config, f, indent=2)
+            write_json(self.calendar_config_file, config)
             
             logging.info("Calendar configuration updated")
             return True
@@ -3,11 +3,11 @@ Job Checklist Management Service for SPANKKS Construction
 Handles job checklists, task templates, and completion tracking
 """
 
-import json
 import os
 from datetime import datetime
 import pytz
 from models import get_hawaii_time
+from services.persistence import collection_exists, find_records, read_json, with_file_lock, write_json
 
 class ChecklistService:
     """Comprehensive job checklist management system"""
@@ -23,11 +23,10 @@ class ChecklistService:
         if not os.path.exists('data'):
             os.makedirs('data')
             
-        if not os.path.exists(self.checklist_file):
-            with open(self.checklist_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.checklist_file):
+            write_json(self.checklist_file, [])
                 
-        if not os.path.exists(self.templates_file):
+        if not collection_exists(self.templates_file):
             # Create default templates
             default_templates = [
                 {
@@ -86,25 +85,23 @@ class ChecklistService:
                     ]
                 }
             ]
-            with open(self.templates_file, 'w') as f:
-                json.dump(default_templates, f, indent=2)
+            write_json(self.templates_file, default_templates)
     
     def get_all_checklists(self):
         """Get all job checklists"""
         try:
-            with open(self.checklist_file, 'r') as f:
-                return json.load(f)
+            return read_json(self.checklist_file)
         except:
             return []
     
     def get_checklist_templates(self):
         """Get all checklist templates"""
         try:
-            with open(self.templates_file, 'r') as f:
-                return json.load(f)
+            return read_json(self.templates_file)
         except:
             return []
     
+    @with_file_lock('checklist_file')
     def create_job_checklist(self, job_id, service_type, custom_tasks=None):
         """Create a new checklist for a job"""
         checklists = self.get_all_checklists()
@@ -165,16 +162,15 @@ class ChecklistService:
         
         checklists.append(new_checklist)
         
-        with open(self.checklist_file, 'w') as f:
-            json.dump(checklists, f, indent=2)
+        write_json(self.checklist_file, checklists)
             
         return new_checklist
     
     def get_checklist_by_job(self, job_id):
         """Get checklist for specific job"""
-        checklists = self.get_all_checklists()
-        return next((c for c in checklists if c['job_id'] == job_id), None)
+        return next(iter(find_records(self.checklist_file, 'job_id', job_id)), None)
     
+    @with_file_lock('checklist_file')
     def update_task_status(self, checklist_id, task_id, completed, completed_by=None, notes=None):
         """Update task completion status"""
         checklists = self.get_all_checklists()
@@ -204,11 +200,11 @@ class ChecklistService:
                 
                 break
         
-        with open(self.checklist_file, 'w') as f:
-            json.dump(checklists, f, indent=2)
+        write_json(self.checklist_file, checklists)
             
         return True
     
+    @with_file_lock('checklist_file')
     def add_custom_task(self, checklist_id, task_description, required=False):
         """Add custom task to existing checklist"""
         checklists = self.get_all_checklists()
@@ -236,8 +232,7 @@ class ChecklistService:
                 
                 break
         
-        with open(self.checklist_file, 'w') as f:
-            json.dump(checklists, f, indent=2)
+        write_json(self.checklist_file, checklists)
             
         return True
     
@@ -271,6 +266,7 @@ class ChecklistService:
             'last_updated': checklist['last_updated']
         }
     
+    @with_file_lock('templates_file')
     def create_template(self, name, service_type, tasks):
         """Create new checklist template"""
         templates = self.get_checklist_templates()
@@ -287,8 +283,7 @@ class ChecklistService:
         
         templates.append(new_template)
         
-        with open(self.templates_file, 'w') as f:
-            json.dump(templates, f, indent=2)
+        write_json(self.templates_file, templates)
             
         return new_template
     
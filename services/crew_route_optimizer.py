@@ -0,0 +1,192 @@
+"""
+Crew Route Optimizer for SPANKKS Construction
+Assigns a day's appointments to crews and orders each crew's stops to cut travel and idle time
+"""
+
+import logging
+import re
+import unicodedata
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from services.persistence import read_json
+
+TRAVEL_TIMES_FILE = 'data/travel_times.json'
+# Rounds of 2-opt improvement per route before settling
+MAX_TWO_OPT_PASSES = 20
+
+
+def _normalize(text: str) -> str:
+    """Lowercase, strip diacritics and the ʻokina so 'Kāneʻohe' matches 'Kaneohe'"""
+    text = unicodedata.normalize('NFKD', text or '')
+    text = ''.join(char for char in text if not unicodedata.combining(char))
+    return re.sub(r"[ʻ'`‘’]", '', text).lower()
+
+
+class TravelTimeMatrix:
+    """Drive minutes between service areas, from data/travel_times.json.
+
+    The file holds {"depot": area, "default_minutes": N, "minutes": {area:
+    {area: minutes}}}. Appointment locations are matched to an area by
+    name; unknown locations (or missing pairs) cost default_minutes.
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.depot = data.get('depot')
+        self.default_minutes = int(data.get('default_minutes', 45))
+        self._minutes: Dict[Tuple[str, str], int] = {}
+        for origin, row in (data.get('minutes') or {}).items():
+            for destination, minutes in row.items():
+                self._minutes[(origin, destination)] = int(minutes)
+        # Longest names first so 'Ewa Beach' wins over a shorter area contained in it
+        areas = {area for pair in self._minutes for area in pair}
+        self._areas = sorted(((_normalize(area), area) for area in areas), key=lambda entry: -len(entry[0]))
+
+    @classmethod
+    def load(cls, path: str = TRAVEL_TIMES_FILE) -> 'TravelTimeMatrix':
+        return cls(read_json(path, dict))
+
+    def area_for(self, location: str) -> Optional[str]:
+        normalized = _normalize(location)
+        for name, area in self._areas:
+            if name and name in normalized:
+                return area
+        return None
+
+    def minutes(self, origin: Optional[str], destination: Optional[str]) -> int:
+        if origin is None or destination is None:
+            return self.default_minutes
+        found = self._minutes.get((origin, destination))
+        if found is None:
+            found = self._minutes.get((destination, origin), self.default_minutes)
+        return found
+
+
+@dataclass
+class Stop:
+    """One appointment to route: service time and the window its start must fall in (minutes after midnight)"""
+    appointment_id: str
+    area: Optional[str]
+    duration: int
+    earliest: int
+    latest: int
+    appointment: Dict[str, Any] = field(default_factory=dict, repr=False)
+
+
+@dataclass
+class RouteResult:
+    cost: int
+    travel: int
+    idle: int
+    schedule: List[Dict[str, int]]
+
+
+class CrewRouteOptimizer:
+    """Heuristic vehicle-routing for one day of crew work.
+
+    Crews start at the depot when the business opens. Each crew is filled
+    greedily with the nearest feasible stop (least travel plus waiting),
+    each route is improved with 2-opt, and leftover stops are tried at the
+    cheapest feasible position in any route. Consecutive jobs are at least
+    `buffer_minutes` apart even when the drive is shorter; every stop must
+    start inside its window and finish by closing time. Cost is travel plus
+    idle minutes, including the drive back to the depot.
+    """
+
+    def __init__(self, matrix: TravelTimeMatrix, buffer_minutes: int, open_minutes: int, close_minutes: int):
+        self.matrix = matrix
+        self.buffer_minutes = buffer_minutes
+        self.open_minutes = open_minutes
+        self.close_minutes = close_minutes
+
+    def solve(self, stops: Sequence[Stop], crews: Sequence[str]) -> Tuple[Dict[str, List[int]], List[int]]:
+        """Routes as crew -> stop indexes in visiting order, plus indexes of stops nobody can fit"""
+        unassigned = set(range(len(stops)))
+        routes: Dict[str, List[int]] = {}
+        for crew in crews:
+            route = self._nearest_neighbor(stops, unassigned)
+            unassigned.difference_update(route)
+            routes[crew] = self._two_opt(stops, route)
+
+        for index in sorted(unassigned, key=lambda position: stops[position].latest):
+            best = None
+            for crew, route in routes.items():
+                current = self.evaluate(stops, route).cost
+                for position in range(len(route) + 1):
+                    candidate = route[:position] + [index] + route[position:]
+                    result = self.evaluate(stops, candidate)
+                    if result is not None and (best is None or result.cost - current < best[0]):
+                        best = (result.cost - current, crew, candidate)
+            if best is not None:
+                routes[best[1]] = best[2]
+                unassigned.discard(index)
+        return routes, sorted(unassigned)
+
+    def evaluate(self, stops: Sequence[Stop], route: Sequence[int]) -> Optional[RouteResult]:
+        """Schedule a route in order; None if a stop misses its window or closing time"""
+        clock = self.open_minutes
+        area = self.matrix.depot
+        travel = idle = 0
+        schedule = []
+        for position, index in enumerate(route):
+            stop = stops[index]
+            leg = self.matrix.minutes(area, stop.area)
+            arrive = clock + (leg if position == 0 else max(leg, self.buffer_minutes))
+            start = max(arrive, stop.earliest)
+            if start > stop.latest or start + stop.duration > self.close_minutes:
+                return None
+            travel += leg
+            idle += start - arrive
+            schedule.append({'index': index, 'arrive': arrive, 'start': start, 'end': start + stop.duration,
+                             'travel': leg, 'idle': start - arrive})
+            clock = start + stop.duration
+            area = stop.area
+        if route:
+            travel += self.matrix.minutes(area, self.matrix.depot)
+        return RouteResult(travel + idle, travel, idle, schedule)
+
+    def _nearest_neighbor(self, stops: Sequence[Stop], candidates: set) -> List[int]:
+        route: List[int] = []
+        remaining = set(candidates)
+        while remaining:
+            best = None
+            for index in remaining:
+                result = self.evaluate(stops, route + [index])
+                if result is None:
+                    continue
+                last = result.schedule[-1]
+                previous_end = result.schedule[-2]['end'] if len(result.schedule) > 1 else self.open_minutes
+                # Time spent getting to and waiting for the job; earlier deadlines break ties
+                score = (last['start'] - previous_end, stops[index].latest)
+                if best is None or score < best[0]:
+                    best = (score, index)
+            if best is None:
+                break
+            route.append(best[1])
+            remaining.discard(best[1])
+        return route
+
+    def _two_opt(self, stops: Sequence[Stop], route: List[int]) -> List[int]:
+        if len(route) < 3:
+            return route
+        best_cost = self.evaluate(stops, route).cost
+        for _ in range(MAX_TWO_OPT_PASSES):
+            improved = False
+            for i in range(len(route) - 1):
+                for k in range(i + 1, len(route)):
+                    candidate = route[:i] + route[i:k + 1][::-1] + route[k + 1:]
+                    result = self.evaluate(stops, candidate)
+                    if result is not None and result.cost < best_cost:
+                        route, best_cost, improved = candidate, result.cost, True
+            if not improved:
+                break
+        return route
+
+
+def load_travel_matrix(path: str = TRAVEL_TIMES_FILE) -> TravelTimeMatrix:
+    """The configured travel-time matrix (an empty one, using default_minutes everywhere, if missing)"""
+    try:
+        return TravelTimeMatrix.load(path)
+    except Exception as e:
+        logging.warning(f"Could not load travel times from {path}: {e}")
+        return TravelTimeMatrix({})
@@ -3,12 +3,13 @@ Customer Engagement Service for SPANKKS Construction
 Manages customer lifecycle, retention strategies, and satisfaction tracking
 """
 
-import json
 import os
 import logging
 from datetime import datetime, timedelta
 import pytz
 from typing import Dict, List, Optional, Any
+from services.jsonl_log_store import get_log_store
+from services.persistence import file_lock, read_json, write_json
 
 class CustomerEngagementService:
     """Service for managing customer engagement and retention strategies"""
@@ -18,6 +19,7 @@ class CustomerEngagementService:
         self.logger = logging.getLogger(__name__)
         self.data_dir = 'data'
         self._ensure_data_directory()
+        self.interaction_log = get_log_store(os.path.join(self.data_dir, 'customer_interactions.json'))
     
     def _ensure_data_directory(self):
         """Ensure data directory exists"""
@@ -31,20 +33,13 @@ class CustomerEngagementService:
     def _load_json_file(self, filename: str) -> List[Dict]:
         """Load data from JSON file"""
         filepath = os.path.join(self.data_dir, filename)
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
+        return read_json(filepath)
     
     def _save_json_file(self, filename: str, data: List[Dict]) -> bool:
         """Save data to JSON file"""
         filepath = os.path.join(self.data_dir, filename)
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+            write_json(filepath, data)
             return True
         except Exception as e:
             self.logger.error(f"Error saving {filename}: {e}")
@@ -54,22 +49,19 @@ class CustomerEngagementService:
         """Track customer interactions for engagement analysis"""
         current_time = self._get_hawaii_time()
         
-        # Load existing interactions
-        interactions = self._load_json_file('customer_interactions.json')
-        
-        interaction = {
-            'id': len(interactions) + 1,
-            'contact_id': contact_id,
-            'interaction_type': interaction_type,  # email, phone, visit, quote_request, job_completion
-            'details': details,
-            'timestamp': current_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'date': current_time.strftime('%Y-%m-%d'),
-            'engagement_score': self._calculate_engagement_score(interaction_type),
-            'follow_up_needed': self._requires_follow_up(interaction_type)
-        }
+        with file_lock(self.interaction_log.snapshot_path):
+            interaction = {
+                'id': self.interaction_log.count() + 1,
+                'contact_id': contact_id,
+                'interaction_type': interaction_type,  # email, phone, visit, quote_request, job_completion
+                'details': details,
+                'timestamp': current_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'date': current_time.strftime('%Y-%m-%d'),
+                'engagement_score': self._calculate_engagement_score(interaction_type),
+                'follow_up_needed': self._requires_follow_up(interaction_type)
+            }
         
-        interactions.append(interaction)
-        self._save_json_file('customer_interactions.json', interactions)
+            self.interaction_log.append(interaction)
         
         # Update customer engagement profile
         self._update_customer_engagement_profile(contact_id, interaction)
@@ -98,64 +90,65 @@ class CustomerEngagementService:
     
     def _update_customer_engagement_profile(self, contact_id: int, interaction: Dict):
         """Update customer's engagement profile with new interaction"""
-        profiles = self._load_json_file('customer_engagement_profiles.json')
-        
-        # Find existing profile or create new one
-        profile = None
-        profile_index = None
-        for i, p in enumerate(profiles):
-            if p.get('contact_id') == contact_id:
-                profile = p
-                profile_index = i
-                break
-        
-        if not profile:
-            profile = {
-                'contact_id': contact_id,
-                'total_interactions': 0,
-                'last_interaction': None,
-                'engagement_score': 0,
-                'engagement_level': 'new',
-                'preferred_contact_method': 'email',
-                'interaction_frequency': 0,
-                'lifetime_value': 0,
-                'satisfaction_score': 5.0,
-                'retention_risk': 'low',
-                'next_engagement_date': None,
-                'engagement_history': []
-            }
-            profiles.append(profile)
-            profile_index = len(profiles) - 1
-        
-        # Update profile with new interaction
-        profile['total_interactions'] += 1
-        profile['last_interaction'] = interaction['timestamp']
-        profile['engagement_score'] += interaction['engagement_score']
-        profile['engagement_history'].append({
-            'type': interaction['interaction_type'],
-            'date': interaction['date'],
-            'score': interaction['engagement_score']
-        })
-        
-        # Calculate engagement level
-        profile['engagement_level'] = self._calculate_engagement_level(profile['engagement_score'], profile['total_interactions'])
-        
-        # Calculate interaction frequency (interactions per month)
-        if len(profile['engagement_history']) > 1:
-            first_interaction = datetime.strptime(profile['engagement_history'][0]['date'], '%Y-%m-%d')
-            last_interaction = datetime.strptime(profile['engagement_history'][-1]['date'], '%Y-%m-%d')
-            days_span = (last_interaction - first_interaction).days
-            if days_span > 0:
-                profile['interaction_frequency'] = (profile['total_interactions'] * 30) / days_span
-        
-        # Update retention risk
-        profile['retention_risk'] = self._assess_retention_risk(profile)
-        
-        # Schedule next engagement
-        profile['next_engagement_date'] = self._calculate_next_engagement_date(profile)
-        
-        profiles[profile_index] = profile
-        self._save_json_file('customer_engagement_profiles.json', profiles)
+        with file_lock(os.path.join(self.data_dir, 'customer_engagement_profiles.json')):
+            profiles = self._load_json_file('customer_engagement_profiles.json')
+        
+            # Find existing profile or create new one
+            profile = None
+            profile_index = None
+            for i, p in enumerate(profiles):
+                if p.get('contact_id') == contact_id:
+                    profile = p
+                    profile_index = i
+                    break
+        
+            if not profile:
+                profile = {
+                    'contact_id': contact_id,
+                    'total_interactions': 0,
+                    'last_interaction': None,
+                    'engagement_score': 0,
+                    'engagement_level': 'new',
+                    'preferred_contact_method': 'email',
+                    'interaction_frequency': 0,
+                    'lifetime_value': 0,
+                    'satisfaction_score': 5.0,
+                    'retention_risk': 'low',
+                    'next_engagement_date': None,
+                    'engagement_history': []
+                }
+                profiles.append(profile)
+                profile_index = len(profiles) - 1
+        
+            # Update profile with new interaction
+            profile['total_interactions'] += 1
+            profile['last_interaction'] = interaction['timestamp']
+            profile['engagement_score'] += interaction['engagement_score']
+            profile['engagement_history'].append({
+                'type': interaction['interaction_type'],
+                'date': interaction['date'],
+                'score': interaction['engagement_score']
+            })
+        
+            # Calculate engagement level
+            profile['engagement_level'] = self._calculate_engagement_level(profile['engagement_score'], profile['total_interactions'])
+        
+            # Calculate interaction frequency (interactions per month)
+            if len(profile['engagement_history']) > 1:
+                first_interaction = datetime.strptime(profile['engagement_history'][0]['date'], '%Y-%m-%d')
+                last_interaction = datetime.strptime(profile['engagement_history'][-1]['date'], '%Y-%m-%d')
+                days_span = (last_interaction - first_interaction).days
+                if days_span > 0:
+                    profile['interaction_frequency'] = (profile['total_interactions'] * 30) / days_span
+        
+            # Update retention risk
+            profile['retention_risk'] = self._assess_retention_risk(profile)
+        
+            # Schedule next engagement
+            profile['next_engagement_date'] = self._calculate_next_engagement_date(profile)
+        
+            profiles[profile_index] = profile
+            self._save_json_file('customer_engagement_profiles.json', profiles)
     
     def _calculate_engagement_level(self, total_score: int, total_interactions: int) -> str:
         """Calculate customer engagement level"""
@@ -423,7 +416,7 @@ class CustomerEngagementService:
     def get_engagement_analytics(self) -> Dict[str, Any]:
         """Get comprehensive engagement analytics"""
         profiles = self._load_json_file('customer_engagement_profiles.json')
-        interactions = self._load_json_file('customer_interactions.json')
+        interactions = self.interaction_log.read_all()
         campaigns = self._load_json_file('engagement_campaigns.json')
         
         current_date = self._get_hawaii_time().date()
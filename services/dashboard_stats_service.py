@@ -0,0 +1,237 @@
+"""
+Dashboard Stats Service for SPANKKS Construction
+Admin dashboard counts and sums aggregated in SQL, cached with a short TTL
+"""
+
+import copy
+import logging
+import os
+import re
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from services.db_pool import get_engine, reporting_connection
+
+# Seconds a computed snapshot is served at most before it is recomputed
+DASHBOARD_STATS_TTL = float(os.environ.get('DASHBOARD_STATS_TTL', '10'))
+# Seconds after a write that stats are read from the primary, not the (possibly lagging) replica
+DASHBOARD_PRIMARY_AFTER_WRITE = float(os.environ.get('DASHBOARD_PRIMARY_AFTER_WRITE', '10'))
+
+# Tables the dashboard aggregates
+DASHBOARD_TABLES = ('invoices', 'quotes', 'jobs', 'clients')
+
+# Writes to these tables through the SQLAlchemy engine, anywhere in the statement
+# (so WITH ... INSERT and statements behind a leading comment count too)
+_WRITE_PATTERN = re.compile(
+    r'\b(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM)\s+(?:ONLY\s+)?(?:"?public"?\.)?"?(?:'
+    + '|'.join(DASHBOARD_TABLES) + r')\b',
+    re.IGNORECASE
+)
+
+# Row changes PostgreSQL has counted on those tables, from every connection and process
+_WRITE_COUNTER_SQL = """
+    SELECT COALESCE(SUM(n_tup_ins + n_tup_upd + n_tup_del), 0)
+    FROM pg_stat_user_tables
+    WHERE relname IN ('invoices', 'quotes', 'jobs', 'clients')
+"""
+
+_TOTALS_SQL = """
+    WITH invoice_stats AS (
+        SELECT COALESCE(SUM(total_paid) FILTER (WHERE status = 'paid'), 0) AS total_revenue,
+               COUNT(*) FILTER (WHERE status = 'paid') AS paid_invoices,
+               COUNT(*) FILTER (WHERE status = 'overdue') AS overdue_invoices
+        FROM invoices
+    ), quote_stats AS (
+        SELECT COUNT(*) AS total_quotes,
+               COUNT(*) FILTER (WHERE status = 'pending') AS pending_quotes,
+               COUNT(*) FILTER (WHERE status = 'accepted') AS accepted_quotes,
+               COALESCE(SUM(total), 0) AS quoted_total
+        FROM quotes
+    ), job_stats AS (
+        SELECT COUNT(*) FILTER (WHERE status IN ('scheduled', 'in_progress')) AS active_jobs
+        FROM jobs
+    )
+    SELECT * FROM invoice_stats, quote_stats, job_stats
+"""
+
+_RECENT_QUOTES_SQL = """
+    SELECT q.quote_id, q.created_at, c.name AS client_name
+    FROM quotes q
+    LEFT JOIN clients c ON c.client_id = q.client_id
+    ORDER BY q.created_at DESC
+    LIMIT 3
+"""
+
+_RECENT_PAYMENTS_SQL = """
+    SELECT total_paid AS total_amount, paid_at AS payment_date
+    FROM invoices
+    WHERE status = 'paid'
+    ORDER BY created_at DESC
+    LIMIT 2
+"""
+
+_UPCOMING_JOBS_SQL = """
+    SELECT j.service_type, j.scheduled_date, j.status, c.name AS client_name
+    FROM jobs j
+    LEFT JOIN clients c ON c.client_id = j.client_id
+    WHERE j.status = 'scheduled'
+    ORDER BY j.timestamp_created DESC
+    LIMIT 3
+"""
+
+
+def _date_str(value: Any, fallback: str) -> str:
+    if not value:
+        return fallback
+    if isinstance(value, str):
+        return value.split('T')[0]
+    return value.strftime('%Y-%m-%d')
+
+
+class DashboardStatsService:
+    """Computes the /admin-home overview, KPIs, recent activity and upcoming jobs.
+
+    Counts and sums are FILTER aggregates in one statement and the lists
+    are LIMITed queries, so the cost doesn't grow with the tables. Results
+    are cached per worker for at most `ttl` seconds. Before a cached
+    snapshot is served, PostgreSQL's row-change counters for invoices,
+    quotes, jobs and clients are compared with the ones taken when it was
+    computed, so writes from other workers and from raw psycopg2
+    connections drop it too, and this worker's own SQLAlchemy writes drop
+    it straight away. The counters can trail a commit by a few seconds,
+    which the TTL bounds. Stats are read from the reporting replica,
+    except for a short window after a write, when the primary is used so
+    the write shows up despite replica lag.
+    """
+
+    def __init__(self, ttl: float = DASHBOARD_STATS_TTL):
+        self.ttl = ttl
+        self._cache: Optional[Dict[str, Any]] = None
+        self._cached_at = 0.0
+        self._cached_counter: Optional[int] = None
+        self._generation = 0
+        self._primary_until = 0.0
+        self._lock = threading.Lock()
+        self._listening = False
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Overview, KPIs, recent activity and upcoming jobs (a copy the caller may modify)"""
+        self._listen_for_writes()
+        counter = self._write_counter()
+        with self._lock:
+            if self._cache is not None and time.monotonic() - self._cached_at < self.ttl:
+                if counter is None or counter == self._cached_counter:
+                    return copy.deepcopy(self._cache)
+                # Written to elsewhere since this snapshot was computed
+                self._primary_until = max(self._primary_until, time.monotonic() + DASHBOARD_PRIMARY_AFTER_WRITE)
+            generation = self._generation
+            primary = time.monotonic() < self._primary_until
+
+        stats = self._compute(primary)
+
+        with self._lock:
+            # Don't cache a snapshot that a write invalidated while it was being computed
+            if generation == self._generation:
+                self._cache = stats
+                self._cached_at = time.monotonic()
+                self._cached_counter = counter
+        return copy.deepcopy(stats)
+
+    def invalidate(self, primary_for: float = DASHBOARD_PRIMARY_AFTER_WRITE):
+        """Drop the cached snapshot so the next request recomputes it (from the primary for primary_for seconds)"""
+        with self._lock:
+            self._cache = None
+            self._generation += 1
+            self._primary_until = max(self._primary_until, time.monotonic() + primary_for)
+
+    def _write_counter(self) -> Optional[int]:
+        """Row changes on the dashboard tables so far, or None when unavailable (the TTL alone applies then)"""
+        from sqlalchemy import text
+
+        try:
+            engine = get_engine()
+            if engine.dialect.name != 'postgresql':
+                return None
+            with engine.connect() as conn:
+                return int(conn.execute(text(_WRITE_COUNTER_SQL)).scalar())
+        except Exception as e:
+            logging.warning(f"Dashboard stats write counter unavailable: {e}")
+            return None
+
+    def _listen_for_writes(self):
+        if self._listening:
+            return
+        from sqlalchemy import event
+
+        def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+            if _WRITE_PATTERN.search(statement):
+                self.invalidate()
+
+        with self._lock:
+            if not self._listening:
+                event.listen(get_engine(), 'after_cursor_execute', after_cursor_execute)
+                self._listening = True
+
+    def _compute(self, primary: bool = False) -> Dict[str, Any]:
+        from sqlalchemy import text
+
+        with (get_engine().connect() if primary else reporting_connection()) as conn:
+            totals = conn.execute(text(_TOTALS_SQL)).first()
+            recent_quotes = conn.execute(text(_RECENT_QUOTES_SQL)).fetchall()
+            recent_payments = conn.execute(text(_RECENT_PAYMENTS_SQL)).fetchall()
+            upcoming = conn.execute(text(_UPCOMING_JOBS_SQL)).fetchall()
+
+        total_revenue = float(totals.total_revenue or 0)
+        kpis = {
+            'conversion_rate': 0,
+            'avg_job_value': 0,
+            'customer_satisfaction': 0,
+            'staff_utilization': 0
+        }
+        if totals.total_quotes:
+            kpis['conversion_rate'] = round((totals.accepted_quotes / totals.total_quotes) * 100, 1)
+        if totals.paid_invoices:
+            kpis['avg_job_value'] = round(total_revenue / totals.paid_invoices, 2)
+        elif totals.total_quotes:
+            # Use quote values if no paid invoices yet
+            kpis['avg_job_value'] = round(float(totals.quoted_total) / totals.total_quotes, 2)
+
+        recent_activity = []
+        for quote in recent_quotes:
+            recent_activity.append({
+                'action': f"Quote {quote.quote_id or 'Unknown'} generated for {quote.client_name or 'Unknown Client'}",
+                'time': _date_str(quote.created_at, 'Recently'),
+                'type': 'quote'
+            })
+        for payment in recent_payments:
+            recent_activity.append({
+                'action': f"Payment received ${payment.total_amount if payment.total_amount is not None else 0}",
+                'time': _date_str(payment.payment_date, 'Recently'),
+                'type': 'payment'
+            })
+
+        upcoming_jobs = []
+        for job in upcoming:
+            upcoming_jobs.append({
+                'client': job.client_name or 'Unknown',
+                'service': job.service_type or 'Service',
+                'date': _date_str(job.scheduled_date, 'TBD'),
+                'status': job.status or 'scheduled'
+            })
+
+        return {
+            'overview': {
+                'total_revenue': total_revenue,
+                'active_jobs': totals.active_jobs,
+                'pending_quotes': totals.pending_quotes,
+                'overdue_invoices': totals.overdue_invoices
+            },
+            'recent_activity': recent_activity[:5],
+            'upcoming_jobs': upcoming_jobs,
+            'kpis': kpis
+        }
+
+
+# Global dashboard stats service instance
+dashboard_stats_service = DashboardStatsService()
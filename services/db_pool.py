@@ -0,0 +1,214 @@
+"""
+Database Connection Pool for SPANKKS Construction
+Pooled psycopg2 connections borrowed from the SQLAlchemy engine in config/app.py,
+with read-only reporting queries routed to the replica bind when one is configured
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Optional, Tuple
+
+# After a failed replica connection, reporting uses the primary for this many seconds
+DB_REPLICA_RETRY_SECONDS = float(os.environ.get('DB_REPLICA_RETRY_SECONDS', '30'))
+
+_engine = None
+_replica_engine = None
+_engine_lock = threading.Lock()
+_replica_down_until = 0.0
+
+_stats_lock = threading.Lock()
+_stats = {
+    'checkouts': 0,
+    'timeouts': 0,
+    'total_wait_ms': 0.0,
+    'max_wait_ms': 0.0,
+}
+_target_stats: Dict[str, Dict[str, float]] = {}
+
+
+def get_engine():
+    """The SQLAlchemy engine of the Flask app (created once, shared by every caller)"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                # Imported lazily so services can be imported without creating the app
+                from config.app import app, db
+                with app.app_context():
+                    _engine = db.engine
+    return _engine
+
+
+def get_replica_engine():
+    """Engine for the 'replica' bind (DATABASE_REPLICA_URL), or None when not configured"""
+    global _replica_engine
+    if _replica_engine is None:
+        with _engine_lock:
+            if _replica_engine is None:
+                from config.app import app, db
+                with app.app_context():
+                    _replica_engine = db.engines.get('replica') or False
+    return _replica_engine or None
+
+
+def dispose_after_fork():
+    """Forget pooled connections inherited from the gunicorn master (see post_fork in gunicorn.conf.py).
+
+    close=False leaves the master's sockets open for it; this worker opens
+    its own connections on first use.
+    """
+    from config.app import app, db
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def _reporting_targets():
+    """(name, engine) pairs to try for a reporting query, replica first while it is healthy"""
+    replica = get_replica_engine()
+    if replica is not None and time.monotonic() >= _replica_down_until:
+        return [('replica', replica), ('primary', get_engine())]
+    return [('primary', get_engine())]
+
+
+def _connect_for_reporting(connect) -> Tuple[str, Any]:
+    """Open a reporting connection with connect(engine), falling back to the primary"""
+    global _replica_down_until
+    targets = _reporting_targets()
+    for position, (target, engine) in enumerate(targets):
+        try:
+            return target, connect(engine)
+        except Exception as e:
+            if position == len(targets) - 1:
+                _record_target(target, 0.0, error=True)
+                raise
+            _replica_down_until = time.monotonic() + DB_REPLICA_RETRY_SECONDS
+            _record_target(target, 0.0, error=True)
+            logging.warning(f"Replica unavailable, using primary for {DB_REPLICA_RETRY_SECONDS:.0f}s: {e}")
+
+
+def _record_target(target: str, elapsed_ms: float, error: bool = False):
+    with _stats_lock:
+        stats = _target_stats.setdefault(target, {
+            'queries': 0, 'errors': 0, 'total_ms': 0.0, 'max_ms': 0.0
+        })
+        if error:
+            stats['errors'] += 1
+            return
+        stats['queries'] += 1
+        stats['total_ms'] += elapsed_ms
+        stats['max_ms'] = max(stats['max_ms'], elapsed_ms)
+
+
+@contextmanager
+def reporting_connection():
+    """SQLAlchemy connection for read-only reporting queries.
+
+    Uses the replica bind when configured and reachable, otherwise the
+    primary; the time spent in the block is recorded per target. Replicas
+    can lag slightly, so don't use this for reads that must see a write
+    made just before.
+    """
+    target, conn = _connect_for_reporting(lambda engine: engine.connect())
+    started = time.perf_counter()
+    try:
+        yield conn
+    finally:
+        conn.close()
+        _record_target(target, (time.perf_counter() - started) * 1000)
+
+
+@contextmanager
+def reporting_db_connection(cursor_factory: Optional[Any] = None):
+    """psycopg2 counterpart of reporting_connection() (see db_connection for cursor_factory)"""
+    target, engine = _connect_for_reporting(_checked_engine)
+    started = time.perf_counter()
+    try:
+        with db_connection(cursor_factory, engine=engine) as conn:
+            yield conn
+    finally:
+        _record_target(target, (time.perf_counter() - started) * 1000)
+
+
+def _checked_engine(engine):
+    # Fail over before the block runs: borrow and return one pooled (pre-pinged) connection
+    engine.raw_connection().close()
+    return engine
+
+
+def _record_checkout(wait_ms: float, timed_out: bool = False):
+    with _stats_lock:
+        if timed_out:
+            _stats['timeouts'] += 1
+            return
+        _stats['checkouts'] += 1
+        _stats['total_wait_ms'] += wait_ms
+        _stats['max_wait_ms'] = max(_stats['max_wait_ms'], wait_ms)
+
+
+@contextmanager
+def db_connection(cursor_factory: Optional[Any] = None, engine=None):
+    """Borrow a psycopg2 connection from the engine's pool.
+
+    Behaves like ``with psycopg2.connect(...) as conn``: commits when the
+    block succeeds and rolls back when it raises. Afterwards the connection
+    goes back to the pool instead of being closed. cursor_factory (e.g.
+    RealDictCursor) applies to cursors opened on it during the block.
+    """
+    from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+    engine = engine or get_engine()
+    started = time.perf_counter()
+    try:
+        proxy = engine.raw_connection()
+    except PoolTimeoutError:
+        _record_checkout(0.0, timed_out=True)
+        logging.error(f"Timed out waiting for a database connection: {get_pool_stats()}")
+        raise
+    _record_checkout((time.perf_counter() - started) * 1000)
+
+    conn = getattr(proxy, 'driver_connection', None) or proxy.connection
+    if cursor_factory is not None:
+        conn.cursor_factory = cursor_factory
+    try:
+        yield conn
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        if cursor_factory is not None:
+            # SQLAlchemy expects plain tuple cursors on this connection
+            conn.cursor_factory = None
+        proxy.close()
+
+
+def get_pool_stats() -> Dict[str, Any]:
+    """Pool size, overflow, wait and per-target reporting latency metrics for diagnostics"""
+    with _stats_lock:
+        stats = dict(_stats)
+    stats['avg_wait_ms'] = round(stats['total_wait_ms'] / stats['checkouts'], 3) if stats['checkouts'] else 0.0
+    stats['total_wait_ms'] = round(stats['total_wait_ms'], 3)
+    stats['max_wait_ms'] = round(stats['max_wait_ms'], 3)
+
+    pool = get_engine().pool
+    for name in ('size', 'checkedin', 'checkedout', 'overflow'):
+        method = getattr(pool, name, None)
+        stats[f'pool_{name}'] = method() if callable(method) else None
+    stats['pool_max_overflow'] = getattr(pool, '_max_overflow', None)
+    stats['pool_timeout'] = getattr(pool, '_timeout', None)
+
+    # Per-target latency of reporting queries (primary vs replica)
+    with _stats_lock:
+        targets = {target: dict(values) for target, values in _target_stats.items()}
+    for values in targets.values():
+        values['avg_ms'] = round(values['total_ms'] / values['queries'], 3) if values['queries'] else 0.0
+        values['total_ms'] = round(values['total_ms'], 3)
+        values['max_ms'] = round(values['max_ms'], 3)
+    stats['reporting_targets'] = targets
+    stats['replica_configured'] = get_replica_engine() is not None
+    stats['replica_available'] = stats['replica_configured'] and time.monotonic() >= _replica_down_until
+    return stats
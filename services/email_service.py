@@ -8,10 +8,11 @@ import logging
 import requests
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
 
+from services.db_pool import db_connection, reporting_db_connection
+
 class EmailService:
     """Professional email management system using MailerLite"""
     
@@ -21,13 +22,13 @@ class EmailService:
         self.mailerlite_base_url = 'https://connect.mailerlite.com/api'
         
     def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
+        """Borrow a pooled database connection (returned to the pool when the with-block exits)"""
+        return db_connection(cursor_factory=RealDictCursor)
     
     def get_email_analytics(self) -> Dict[str, Any]:
         """Get comprehensive email analytics"""
         try:
-            with self.get_db_connection() as conn:
+            with reporting_db_connection(cursor_factory=RealDictCursor) as conn:
                 with conn.cursor() as cursor:
                     # Get total emails sent
                     cursor.execute("""
@@ -11,6 +11,8 @@ import string
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import pytz
+from services.id_allocator import id_allocator, max_numeric_suffix
+from services.persistence import file_lock, with_file_lock, write_json
 
 class EnhancedClientPortalService:
     def __init__(self):
@@ -26,9 +28,9 @@ class EnhancedClientPortalService:
         
         for file_path in [self.portal_auth_file, self.quote_approvals_file, self.portal_sessions_file]:
             if not os.path.exists(file_path):
-                with open(file_path, 'w') as f:
-                    json.dump({}, f, indent=2)
+                write_json(file_path, {})
     
+    @with_file_lock('portal_auth_file')
     def generate_client_pin(self, client_id: str, job_id: str) -> str:
         """Generate secure PIN for client portal access"""
         # Generate 6-digit PIN
@@ -64,9 +66,9 @@ class EnhancedClientPortalService:
     
     def _save_portal_auth(self, auth_data: Dict):
         """Save portal authentication data"""
-        with open(self.portal_auth_file, 'w') as f:
-            json.dump(auth_data, f, indent=2)
+        write_json(self.portal_auth_file, auth_data)
     
+    @with_file_lock('portal_auth_file')
     def authenticate_client(self, client_id: str, job_id: str, pin: str) -> Dict:
         """Authenticate client with PIN"""
         auth_data = self._load_portal_auth()
@@ -107,6 +109,7 @@ class EnhancedClientPortalService:
             'access_level': 'client'
         }
     
+    @with_file_lock('portal_sessions_file')
     def _create_portal_session(self, client_id: str, job_id: str) -> str:
         """Create portal session token"""
         session_token = secrets.token_urlsafe(32)
@@ -128,11 +131,11 @@ class EnhancedClientPortalService:
             'active': True
         }
         
-        with open(self.portal_sessions_file, 'w') as f:
-            json.dump(sessions, f, indent=2)
+        write_json(self.portal_sessions_file, sessions)
         
         return session_token
     
+    @with_file_lock('portal_sessions_file')
     def validate_session(self, session_token: str) -> Optional[Dict]:
         """Validate portal session"""
         try:
@@ -151,8 +154,7 @@ class EnhancedClientPortalService:
         if datetime.now(self.hawaii_tz) > expires_at:
             # Mark session as expired
             session['active'] = False
-            with open(self.portal_sessions_file, 'w') as f:
-                json.dump(sessions, f, indent=2)
+            write_json(self.portal_sessions_file, sessions)
             return None
         
         return session
@@ -211,77 +213,74 @@ class EnhancedClientPortalService:
                      approval_method: str = 'digital_signature') -> Dict:
         """Process digital quote approval"""
         try:
-            # Load quote approvals
+            # Get quote details
+            from models import HandymanStorage
+            storage = HandymanStorage()
+            quotes = storage.get_all_quotes() or []
+            
+            quote = next((q for q in quotes if q.get('id') == quote_id), None)
+            if not quote:
+                return {'success': False, 'error': 'Quote not found'}
+            
+            # Create approval record
+            approval_id = id_allocator.next_id(
+                'quote_approval', 'APP', width=4,
+                seed=lambda: max_numeric_suffix(self._load_quote_approvals(), 'APP') + 1)
+            hawaii_now = datetime.now(self.hawaii_tz)
+            
+            approval_record = {
+                'approval_id': approval_id,
+                'quote_id': quote_id,
+                'client_id': client_id,
+                'job_id': job_id,
+                'approval_method': approval_method,
+                'approved_at': hawaii_now.isoformat(),
+                'approved_by': quote.get('customer_name', 'Client'),
+                'quote_amount': quote.get('total_amount', 0),
+                'terms_accepted': True,
+                'ip_address': self._get_client_ip(),
+                'user_agent': 'Portal Client',
+                'status': 'approved'
+            }
+            
+            with file_lock(self.quote_approvals_file):
+                approvals = self._load_quote_approvals()
+                approvals[approval_id] = approval_record
+                write_json(self.quote_approvals_file, approvals)
+            
+            # Update quote status (saved by the end-of-request flush)
+            quote['status'] = 'approved'
+            quote['approved_at'] = hawaii_now.isoformat()
+            quote['approval_id'] = approval_id
+            storage.update_quote_status(quote_id, 'approved')
+            
+            # Trigger workflow automation
+            self._trigger_quote_approval_workflow(quote, approval_record)
+            
+            logging.info(f"Quote {quote_id} approved by client {client_id}")
+            
+            return {
+                'success': True,
+                'approval_id': approval_id,
+                'message': 'Quote approved successfully!',
+                'next_steps': [
+                    'Your quote has been approved and SPANKKS Construction has been notified.',
+                    'We will contact you within 24 hours to schedule the work.',
+                    'An invoice will be generated and sent to you shortly.'
+                ]
+            }
+            
+        except Exception as e:
+            logging.error(f"Error approving quote: {e}")
+            return {'success': False, 'error': 'Failed to process approval'}
+    
+    def _load_quote_approvals(self) -> Dict:
+        """Load quote approval records keyed by approval ID"""
+        try:
             with open(self.quote_approvals_file, 'r') as f:
-                approvals = json.load(f)
+                return json.load(f)
         except (FileNotFoundError, json.JSONDecodeError):
-            approvals = {}
-        
-        # Get quote details
-        from models import HandymanStorage
-        storage = HandymanStorage()
-        quotes = storage.get_all_quotes() or []
-        
-        quote = next((q for q in quotes if q.get('id') == quote_id), None)
-        if not quote:
-            return {'success': False, 'error': 'Quote not found'}
-        
-        # Create approval record
-        approval_id = f"APP{len(approvals) + 1:04d}"
-        hawaii_now = datetime.now(self.hawaii_tz)
-        
-        approval_record = {
-            'approval_id': approval_id,
-            'quote_id': quote_id,
-            'client_id': client_id,
-            'job_id': job_id,
-            'approval_method': approval_method,
-            'approved_at': hawaii_now.isoformat(),
-            'approved_by': quote.get('customer_name', 'Client'),
-            'quote_amount': quote.get('total_amount', 0),
-            'terms_accepted': True,
-            'ip_address': self._get_client_ip(),
-            'user_agent': 'Portal Client',
-            'status': 'approved'
-        }
-        
-        approvals[approval_id] = approval_record
-        
-        with open(self.quote_approvals_file, 'w') as f:
-            json.dump(approvals, f, indent=2)
-        
-        # Update quote status
-        quote['status'] = 'approved'
-        quote['approved_at'] = hawaii_now.isoformat()
-        quote['approval_id'] = approval_id
-        
-        # Save updated quotes
-        for i, q in enumerate(quotes):
-            if q.get('id') == quote_id:
-                quotes[i] = quote
-                break
-        
-        storage._save_quotes_to_file(quotes)
-        
-        # Trigger workflow automation
-        self._trigger_quote_approval_workflow(quote, approval_record)
-        
-        logging.info(f"Quote {quote_id} approved by client {client_id}")
-        
-        return {
-            'success': True,
-            'approval_id': approval_id,
-            'message': 'Quote approved successfully!',
-            'next_steps': [
-                'Your quote has been approved and SPANKKS Construction has been notified.',
-                'We will contact you within 24 hours to schedule the work.',
-                'An invoice will be generated and sent to you shortly.'
-            ]
-        }
-        
-    except Exception as e:
-        logging.error(f"Error approving quote: {e}")
-        return {'success': False, 'error': 'Failed to process approval'}
+            return {}
     
     def _get_client_ip(self) -> str:
         """Get client IP address (simplified for demo)"""
@@ -108,10 +108,11 @@ class EnhancedStaffService:
         }
         
         try:
-            entries = self.storage_service.load_data('time_entries.json')
-            entries.append(entry)
-            self.storage_service.save_data('time_entries.json', entries)
-            return {'success': True, 'entry_id': entry['id']}
+            with self.storage_service.lock('time_entries.json'):
+                entries = self.storage_service.load_data('time_entries.json')
+                entries.append(entry)
+                self.storage_service.save_data('time_entries.json', entries)
+                return {'success': True, 'entry_id': entry['id']}
         except Exception as e:
             logging.error(f"Error clocking in: {e}")
             return {'success': False, 'error': str(e)}
@@ -121,25 +122,26 @@ class EnhancedStaffService:
         hawaii_time = self.get_hawaii_time()
         
         try:
-            entries = self.storage_service.load_data('time_entries.json')
+            with self.storage_service.lock('time_entries.json'):
+                entries = self.storage_service.load_data('time_entries.json')
             
-            # Find most recent open entry
-            for entry in reversed(entries):
-                if (entry.get('staff_id') == staff_id and 
-                    not entry.get('clock_out')):
-                    entry['clock_out'] = hawaii_time.isoformat()
-                    entry['notes'] = notes
+                # Find most recent open entry
+                for entry in reversed(entries):
+                    if (entry.get('staff_id') == staff_id and 
+                        not entry.get('clock_out')):
+                        entry['clock_out'] = hawaii_time.isoformat()
+                        entry['notes'] = notes
                     
-                    # Calculate hours and overtime
-                    clock_in = datetime.fromisoformat(entry['clock_in'])
-                    total_hours = (hawaii_time.replace(tzinfo=None) - clock_in).total_seconds() / 3600
-                    if total_hours > 8:
-                        entry['overtime_hours'] = total_hours - 8
+                        # Calculate hours and overtime
+                        clock_in = datetime.fromisoformat(entry['clock_in'])
+                        total_hours = (hawaii_time.replace(tzinfo=None) - clock_in).total_seconds() / 3600
+                        if total_hours > 8:
+                            entry['overtime_hours'] = total_hours - 8
                     
-                    self.storage_service.save_data('time_entries.json', entries)
-                    return {'success': True, 'total_hours': round(total_hours, 2)}
+                        self.storage_service.save_data('time_entries.json', entries)
+                        return {'success': True, 'total_hours': round(total_hours, 2)}
             
-            return {'success': False, 'error': 'No open time entry found'}
+                return {'success': False, 'error': 'No open time entry found'}
             
         except Exception as e:
             logging.error(f"Error clocking out: {e}")
@@ -161,10 +163,11 @@ class EnhancedStaffService:
         }
         
         try:
-            assignments = self.storage_service.load_data('job_assignments.json')
-            assignments.append(assignment)
-            self.storage_service.save_data('job_assignments.json', assignments)
-            return {'success': True, 'assignment_id': assignment['id']}
+            with self.storage_service.lock('job_assignments.json'):
+                assignments = self.storage_service.load_data('job_assignments.json')
+                assignments.append(assignment)
+                self.storage_service.save_data('job_assignments.json', assignments)
+                return {'success': True, 'assignment_id': assignment['id']}
         except Exception as e:
             logging.error(f"Error assigning job: {e}")
             return {'success': False, 'error': str(e)}
@@ -12,6 +12,8 @@ from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Dict, List, Optional
 import hashlib
+from services.id_allocator import id_allocator, max_numeric_suffix
+from services.persistence import file_lock, with_file_lock, write_json
 
 class FileStorageService:
     """Manages file storage, organization, and backups for business documents"""
@@ -45,8 +47,7 @@ class FileStorageService:
         
         # Ensure metadata file exists
         if not os.path.exists(self.metadata_file):
-            with open(self.metadata_file, 'w') as f:
-                json.dump([], f, indent=2)
+            write_json(self.metadata_file, [])
     
     def store_file(self, file_path: str, category: str, metadata: Dict) -> Dict:
         """Store file with metadata and return storage information"""
@@ -70,7 +71,7 @@ class FileStorageService:
             
             # Create metadata record
             file_record = {
-                'id': f"file_{int(datetime.now().timestamp())}",
+                'id': self._next_file_id(),
                 'original_name': file_path.name,
                 'stored_name': unique_filename,
                 'storage_path': str(storage_location),
@@ -150,6 +151,7 @@ class FileStorageService:
             logging.error(f"Error getting files by job: {e}")
             return []
     
+    @with_file_lock('metadata_file')
     def delete_file(self, file_id: str) -> bool:
         """Delete file and its metadata"""
         try:
@@ -171,8 +173,7 @@ class FileStorageService:
                 file_path.unlink()
             
             # Save updated metadata
-            with open(self.metadata_file, 'w') as f:
-                json.dump(metadata, f, indent=2)
+            write_json(self.metadata_file, metadata)
             
             logging.info(f"File deleted: {file_id}")
             return True
@@ -344,29 +345,36 @@ class FileStorageService:
         except (FileNotFoundError, json.JSONDecodeError):
             return []
     
+    def _next_file_id(self) -> str:
+        """Allocate a file ID (file_N), seeded past the timestamp-based IDs already stored"""
+        number = id_allocator.next_value(
+            'file',
+            seed=lambda: max_numeric_suffix((record.get('id') for record in self._load_file_metadata()), 'file_') + 1)
+        return f"file_{number}"
+    
+    @with_file_lock('metadata_file')
     def _save_file_metadata(self, file_record: Dict):
         """Save file metadata to JSON"""
         metadata = self._load_file_metadata()
         metadata.append(file_record)
         
-        with open(self.metadata_file, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        write_json(self.metadata_file, metadata)
     
     def _save_backup_metadata(self, backup_info: Dict):
         """Save backup metadata"""
         backup_metadata_file = 'data/backup_metadata.json'
         
-        # Load existing backup metadata
-        if os.path.exists(backup_metadata_file):
-            with open(backup_metadata_file, 'r') as f:
-                backup_metadata = json.load(f)
-        else:
-            backup_metadata = []
-        
-        backup_metadata.append(backup_info)
-        
-        with open(backup_metadata_file, 'w') as f:
-            json.dump(backup_metadata, f, indent=2)
+        with file_lock(backup_metadata_file):
+            # Load existing backup metadata
+            if os.path.exists(backup_metadata_file):
+                with open(backup_metadata_file, 'r') as f:
+                    backup_metadata = json.load(f)
+            else:
+                backup_metadata = []
+            
+            backup_metadata.append(backup_info)
+            
+            write_json(backup_metadata_file, backup_metadata)
     
     def _cleanup_old_backups(self, backup_type: str):
         """Clean up old backups based on retention policy"""
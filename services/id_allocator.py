@@ -0,0 +1,123 @@
+"""
+ID Allocation Service for SPANKKS Construction
+Block-reserved sequences for client/job/quote IDs, safe across gunicorn workers
+"""
+
+import logging
+import os
+import re
+import threading
+from typing import Callable, Dict, Optional
+
+from services.persistence import file_lock, read_json, write_json
+
+# IDs reserved per trip to the sequence file; unused ones are skipped when a worker exits
+ID_BLOCK_SIZE = max(1, int(os.environ.get('ID_BLOCK_SIZE', '10')))
+
+_SEQUENCE_NAME = re.compile(r'^[a-z][a-z0-9_]*$')
+
+
+class IDAllocator:
+    """Hands out increasing integers per named sequence.
+
+    Each sequence lives in ``data/<name>_sequence.json`` as
+    ``{"next_id": N, "prefix": "..."}`` (the format UnifiedScheduler already
+    used). A worker reserves ``block_size`` values at a time under the file's
+    cross-process lock and serves the rest of the block from memory, so
+    workers never hand out the same value and most allocations never touch
+    the disk.
+    """
+
+    def __init__(self, data_dir: str = 'data', block_size: int = ID_BLOCK_SIZE):
+        self.data_dir = data_dir
+        self.block_size = block_size
+        self._blocks: Dict[str, list] = {}  # name -> [next value, end of block (exclusive), prefix]
+        self._lock = threading.Lock()
+
+    def sequence_file(self, name: str) -> str:
+        if not _SEQUENCE_NAME.match(name):
+            raise ValueError(f"Invalid sequence name: {name}")
+        return os.path.join(self.data_dir, f"{name}_sequence.json")
+
+    def next_value(self, name: str, prefix: str = '', seed: Optional[Callable[[], int]] = None) -> int:
+        """Allocate the next value of a sequence.
+
+        seed() is called once, when the sequence file doesn't exist yet, to
+        return the first value (e.g. one past the highest existing ID).
+        """
+        return self._allocate(name, prefix, seed)[0]
+
+    def next_id(self, name: str, prefix: str, width: int = 3, seed: Optional[Callable[[], int]] = None) -> str:
+        """Allocate and format an ID such as CLI001 (the sequence file's prefix wins)"""
+        value, stored_prefix = self._allocate(name, prefix, seed)
+        return f"{stored_prefix}{value:0{width}d}"
+
+    def _allocate(self, name: str, prefix: str, seed: Optional[Callable[[], int]]):
+        with self._lock:
+            block = self._blocks.get(name)
+            if block is None or block[0] >= block[1]:
+                block = self._reserve_block(name, prefix, seed)
+                self._blocks[name] = block
+            value = block[0]
+            block[0] += 1
+            return value, block[2]
+
+    def _reserve_block(self, name: str, prefix: str, seed: Optional[Callable[[], int]]) -> list:
+        path = self.sequence_file(name)
+        with file_lock(path):
+            data = read_json(path, dict)
+            if not isinstance(data, dict):
+                data = {}
+            if 'next_id' not in data:
+                data['next_id'] = max(1, seed()) if seed else 1
+                logging.info(f"Started ID sequence {name} at {data['next_id']}")
+            data.setdefault('prefix', prefix)
+            start = int(data['next_id'])
+            data['next_id'] = start + self.block_size
+            write_json(path, data)
+        return [start, start + self.block_size, data['prefix']]
+
+
+def max_numeric_suffix(ids, prefix: str) -> int:
+    """Highest N among IDs of the form <prefix>N (0 if none); used to seed a new sequence"""
+    highest = 0
+    for value in ids:
+        value = str(value or '')
+        if value.startswith(prefix):
+            try:
+                highest = max(highest, int(value[len(prefix):]))
+            except ValueError:
+                continue
+    return highest
+
+
+def next_db_sequence_value(conn, sequence: str, seed_sql: Optional[str] = None) -> int:
+    """nextval() on a PostgreSQL sequence, creating and seeding it on first use.
+
+    seed_sql returns the highest value already in use (0 if omitted); the
+    sequence starts after it, so rows inserted before the sequence existed
+    are never reissued.
+    """
+    from sqlalchemy import text
+
+    ensure_db_sequence(conn, sequence, seed_sql)
+    return conn.execute(text(f"SELECT nextval('{sequence}')")).scalar()
+
+
+def ensure_db_sequence(conn, sequence: str, seed_sql: Optional[str] = None):
+    """Create and seed a PostgreSQL sequence (see next_db_sequence_value) so SQL can call nextval() on it"""
+    from sqlalchemy import text
+
+    if not _SEQUENCE_NAME.match(sequence):
+        raise ValueError(f"Invalid sequence name: {sequence}")
+    conn.execute(text(f"CREATE SEQUENCE IF NOT EXISTS {sequence} MINVALUE 0 START WITH 0"))
+    is_called = conn.execute(text(f"SELECT is_called FROM {sequence}")).scalar()
+    if not is_called:
+        # GREATEST keeps a concurrent first allocation from being handed out again
+        conn.execute(text(
+            f"SELECT setval('{sequence}', GREATEST(({seed_sql or '0'}), (SELECT last_value FROM {sequence})), true)"
+        ))
+
+
+# Global allocator instance
+id_allocator = IDAllocator()
@@ -3,11 +3,11 @@ Inventory Management Service for SPANKKS Construction
 Handles inventory tracking, materials usage, and automatic deductions
 """
 
-import json
 import os
 from datetime import datetime
 import pytz
 from models import get_hawaii_time
+from services.persistence import collection_exists, find_records, read_json, with_file_lock, write_batch, write_json
 
 class InventoryService:
     """Comprehensive inventory management system"""
@@ -23,22 +23,20 @@ class InventoryService:
         if not os.path.exists('data'):
             os.makedirs('data')
             
-        if not os.path.exists(self.inventory_file):
-            with open(self.inventory_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.inventory_file):
+            write_json(self.inventory_file, [])
                 
-        if not os.path.exists(self.job_materials_file):
-            with open(self.job_materials_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.job_materials_file):
+            write_json(self.job_materials_file, [])
     
     def get_all_inventory(self):
         """Get all inventory items"""
         try:
-            with open(self.inventory_file, 'r') as f:
-                return json.load(f)
+            return read_json(self.inventory_file)
         except:
             return []
     
+    @with_file_lock('inventory_file')
     def add_inventory_item(self, item_data):
         """Add new inventory item"""
         inventory = self.get_all_inventory()
@@ -64,11 +62,11 @@ class InventoryService:
         
         inventory.append(new_item)
         
-        with open(self.inventory_file, 'w') as f:
-            json.dump(inventory, f, indent=2)
+        write_json(self.inventory_file, inventory)
             
         return new_item
     
+    @with_file_lock('inventory_file')
     def update_inventory_item(self, item_id, updates):
         """Update inventory item"""
         inventory = self.get_all_inventory()
@@ -79,8 +77,7 @@ class InventoryService:
                 item['last_updated'] = get_hawaii_time().isoformat()
                 break
         
-        with open(self.inventory_file, 'w') as f:
-            json.dump(inventory, f, indent=2)
+        write_json(self.inventory_file, inventory)
             
         return True
     
@@ -91,6 +88,7 @@ class InventoryService:
                 if item['current_stock'] <= item['minimum_stock'] 
                 and item['status'] == 'active']
     
+    @with_file_lock('inventory_file', 'job_materials_file')
     def log_material_usage(self, job_id, materials_used):
         """Log materials used for a specific job"""
         job_materials = self.get_job_materials()
@@ -139,27 +137,23 @@ class InventoryService:
         usage_record['total_cost'] = total_cost
         job_materials.append(usage_record)
         
-        # Save updates
-        with open(self.job_materials_file, 'w') as f:
-            json.dump(job_materials, f, indent=2)
-            
-        with open(self.inventory_file, 'w') as f:
-            json.dump(inventory, f, indent=2)
+        # Save usage log and stock deductions together
+        with write_batch():
+            write_json(self.job_materials_file, job_materials)
+            write_json(self.inventory_file, inventory)
             
         return usage_record
     
     def get_job_materials(self):
         """Get all job materials records"""
         try:
-            with open(self.job_materials_file, 'r') as f:
-                return json.load(f)
+            return read_json(self.job_materials_file)
         except:
             return []
     
     def get_materials_by_job(self, job_id):
         """Get materials used for specific job"""
-        job_materials = self.get_job_materials()
-        return [record for record in job_materials if record['job_id'] == job_id]
+        return find_records(self.job_materials_file, 'job_id', job_id)
     
     def get_inventory_summary(self):
         """Get inventory summary statistics"""
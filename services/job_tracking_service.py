@@ -3,13 +3,15 @@ Job Records and Payment Tracking System for SPANKKS Construction
 Comprehensive tracking for quotes, estimates, materials, labor, and manual payments
 """
 
-import json
 import logging
 import os
 from datetime import datetime
 from typing import Dict, List, Optional, Any
 import uuid
 from utils.phone_formatter import PhoneFormatter
+from services.id_allocator import id_allocator, max_numeric_suffix
+from services.jsonl_log_store import get_log_store
+from services.persistence import collection_exists, find_records, read_json, with_file_lock, write_json
 
 class JobTrackingService:
     """Comprehensive job records and payment tracking system"""
@@ -24,74 +26,53 @@ class JobTrackingService:
         self.labor_file = os.path.join(self.data_dir, 'labor_logs.json')
         
         self._ensure_data_files()
+        
+        # High-churn event logs are append-only JSONL journals over the JSON snapshots
+        self.payment_log = get_log_store(self.payments_file)
+        self.material_log = get_log_store(self.materials_file)
+        self.labor_log = get_log_store(self.labor_file)
     
     def _ensure_data_files(self):
         """Ensure all data files exist with proper structure"""
         os.makedirs(self.data_dir, exist_ok=True)
         
         # Initialize job records
-        if not os.path.exists(self.jobs_file):
-            with open(self.jobs_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.jobs_file):
+            write_json(self.jobs_file, [])
         
         # Initialize quote history
-        if not os.path.exists(self.quotes_file):
-            with open(self.quotes_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.quotes_file):
+            write_json(self.quotes_file, [])
         
         # Initialize payment logs
-        if not os.path.exists(self.payments_file):
-            with open(self.payments_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.payments_file):
+            write_json(self.payments_file, [])
         
         # Initialize material logs
-        if not os.path.exists(self.materials_file):
-            with open(self.materials_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.materials_file):
+            write_json(self.materials_file, [])
         
         # Initialize labor logs
-        if not os.path.exists(self.labor_file):
-            with open(self.labor_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.labor_file):
+            write_json(self.labor_file, [])
     
     def generate_job_id(self) -> str:
         """Generate unique job ID in format J2025-XXXX"""
-        jobs = self._load_jobs()
         year = datetime.now().year
-        
-        # Find the highest job number for current year
-        job_numbers = []
-        for job in jobs:
-            job_id = job.get('job_id', '')
-            if job_id.startswith(f'J{year}-'):
-                try:
-                    num = int(job_id.split('-')[1])
-                    job_numbers.append(num)
-                except (IndexError, ValueError):
-                    continue
-        
-        next_number = max(job_numbers, default=0) + 1
-        return f'J{year}-{next_number:04d}'
+        number = id_allocator.next_value(
+            f'job_record_{year}',
+            seed=lambda: max_numeric_suffix((job.get('job_id') for job in self._load_jobs()), f'J{year}-') + 1)
+        return f'J{year}-{number:04d}'
     
     def generate_quote_id(self) -> str:
         """Generate unique quote ID in format Q2025-XXXX"""
-        quotes = self._load_quotes()
         year = datetime.now().year
-        
-        # Find the highest quote number for current year
-        quote_numbers = []
-        for quote in quotes:
-            quote_id = quote.get('quote_id', '')
-            if quote_id.startswith(f'Q{year}-'):
-                try:
-                    num = int(quote_id.split('-')[1])
-                    quote_numbers.append(num)
-                except (IndexError, ValueError):
-                    continue
-        
-        next_number = max(quote_numbers, default=0) + 1
-        return f'Q{year}-{next_number:04d}'
+        number = id_allocator.next_value(
+            f'quote_record_{year}',
+            seed=lambda: max_numeric_suffix((quote.get('quote_id') for quote in self._load_quotes()), f'Q{year}-') + 1)
+        return f'Q{year}-{number:04d}'
     
+    @with_file_lock('jobs_file')
     def create_job_record(self, job_data: Dict) -> Dict:
         """Create comprehensive job record"""
         try:
@@ -138,6 +119,7 @@ class JobTrackingService:
             logging.error(f"Error creating job record: {e}")
             return {'success': False, 'error': str(e)}
     
+    @with_file_lock('quotes_file')
     def create_quote_record(self, quote_data: Dict) -> Dict:
         """Create comprehensive quote record"""
         try:
@@ -179,12 +161,12 @@ class JobTrackingService:
             logging.error(f"Error creating quote record: {e}")
             return {'success': False, 'error': str(e)}
     
+    @with_file_lock('payments_file')
     def log_payment(self, payment_data: Dict) -> Dict:
         """Log manual payment received"""
         try:
-            payments = self._load_payments()
-            
-            payment_id = f"PAY-{datetime.now().strftime('%Y%m%d')}-{len(payments) + 1:03d}"
+            payment_number = id_allocator.next_value('payment', seed=lambda: self.payment_log.count() + 1)
+            payment_id = f"PAY-{datetime.now().strftime('%Y%m%d')}-{payment_number:03d}"
             
             payment_record = {
                 'payment_id': payment_id,
@@ -200,8 +182,7 @@ class JobTrackingService:
                 'created_at': datetime.now().isoformat()
             }
             
-            payments.append(payment_record)
-            self._save_payments(payments)
+            self.payment_log.append(payment_record)
             
             # Update job outstanding balance
             job_id = payment_data.get('job_id')
@@ -215,12 +196,11 @@ class JobTrackingService:
             logging.error(f"Error logging payment: {e}")
             return {'success': False, 'error': str(e)}
     
+    @with_file_lock('materials_file')
     def log_materials(self, material_data: Dict) -> Dict:
         """Log materials used for job"""
         try:
-            materials = self._load_materials()
-            
-            material_id = f"MAT-{datetime.now().strftime('%Y%m%d')}-{len(materials) + 1:03d}"
+            material_id = f"MAT-{datetime.now().strftime('%Y%m%d')}-{self.material_log.count() + 1:03d}"
             
             material_record = {
                 'material_id': material_id,
@@ -236,8 +216,7 @@ class JobTrackingService:
                 'created_at': datetime.now().isoformat()
             }
             
-            materials.append(material_record)
-            self._save_materials(materials)
+            self.material_log.append(material_record)
             
             # Update job actual cost
             job_id = material_data.get('job_id')
@@ -251,12 +230,11 @@ class JobTrackingService:
             logging.error(f"Error logging materials: {e}")
             return {'success': False, 'error': str(e)}
     
+    @with_file_lock('labor_file')
     def log_labor(self, labor_data: Dict) -> Dict:
         """Log labor hours for job"""
         try:
-            labor_logs = self._load_labor()
-            
-            labor_id = f"LAB-{datetime.now().strftime('%Y%m%d')}-{len(labor_logs) + 1:03d}"
+            labor_id = f"LAB-{datetime.now().strftime('%Y%m%d')}-{self.labor_log.count() + 1:03d}"
             
             labor_record = {
                 'labor_id': labor_id,
@@ -276,8 +254,7 @@ class JobTrackingService:
                 'created_at': datetime.now().isoformat()
             }
             
-            labor_logs.append(labor_record)
-            self._save_labor(labor_logs)
+            self.labor_log.append(labor_record)
             
             # Update job actual cost
             job_id = labor_data.get('job_id')
@@ -292,6 +269,7 @@ class JobTrackingService:
             logging.error(f"Error logging labor: {e}")
             return {'success': False, 'error': str(e)}
     
+    @with_file_lock('jobs_file')
     def _update_job_payment_status(self, job_id: str, payment_amount: float):
         """Update job payment status after payment received"""
         jobs = self._load_jobs()
@@ -310,6 +288,7 @@ class JobTrackingService:
         
         self._save_jobs(jobs)
     
+    @with_file_lock('jobs_file')
     def _update_job_actual_cost(self, job_id: str, cost: float, cost_type: str):
         """Update job actual cost as materials/labor are logged"""
         jobs = self._load_jobs()
@@ -329,12 +308,10 @@ class JobTrackingService:
     
     def get_job_records(self, status: str = None) -> List[Dict]:
         """Get job records, optionally filtered by status"""
-        jobs = self._load_jobs()
-        
         if status:
-            return [job for job in jobs if job.get('status') == status]
+            return find_records(self.jobs_file, 'status', status)
         
-        return jobs
+        return self._load_jobs()
     
     def get_quote_history(self, status: str = None) -> List[Dict]:
         """Get quote history, optionally filtered by status"""
@@ -347,27 +324,24 @@ class JobTrackingService:
     
     def get_payment_logs(self, job_id: str = None) -> List[Dict]:
         """Get payment logs, optionally filtered by job ID"""
-        payments = self._load_payments()
-        
         if job_id:
-            return [payment for payment in payments if payment.get('job_id') == job_id]
+            return self.payment_log.find_by('job_id', job_id)
         
-        return payments
+        return self._load_payments()
     
     def get_job_summary(self, job_id: str) -> Dict:
         """Get comprehensive job summary including all related records"""
         try:
-            jobs = self._load_jobs()
-            job = next((j for j in jobs if j['job_id'] == job_id), None)
+            job = next(iter(find_records(self.jobs_file, 'job_id', job_id)), None)
             
             if not job:
                 return {'success': False, 'error': 'Job not found'}
             
             # Get related records
-            quotes = [q for q in self._load_quotes() if q.get('job_id') == job_id]
-            payments = [p for p in self._load_payments() if p.get('job_id') == job_id]
-            materials = [m for m in self._load_materials() if m.get('job_id') == job_id]
-            labor = [l for l in self._load_labor() if l.get('job_id') == job_id]
+            quotes = find_records(self.quotes_file, 'job_id', job_id)
+            payments = self.payment_log.find_by('job_id', job_id)
+            materials = self.material_log.find_by('job_id', job_id)
+            labor = self.labor_log.find_by('job_id', job_id)
             
             return {
                 'success': True,
@@ -444,68 +418,43 @@ class JobTrackingService:
     # Data persistence methods
     def _load_jobs(self) -> List[Dict]:
         """Load job records from file"""
-        try:
-            with open(self.jobs_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return read_json(self.jobs_file)
     
     def _save_jobs(self, jobs: List[Dict]):
         """Save job records to file"""
-        with open(self.jobs_file, 'w') as f:
-            json.dump(jobs, f, indent=2)
+        write_json(self.jobs_file, jobs)
     
     def _load_quotes(self) -> List[Dict]:
         """Load quote history from file"""
-        try:
-            with open(self.quotes_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return read_json(self.quotes_file)
     
     def _save_quotes(self, quotes: List[Dict]):
         """Save quote history to file"""
-        with open(self.quotes_file, 'w') as f:
-            json.dump(quotes, f, indent=2)
+        write_json(self.quotes_file, quotes)
     
     def _load_payments(self) -> List[Dict]:
-        """Load payment logs from file"""
-        try:
-            with open(self.payments_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        """Load payment logs (snapshot plus journal)"""
+        return self.payment_log.read_all()
     
     def _save_payments(self, payments: List[Dict]):
-        """Save payment logs to file"""
-        with open(self.payments_file, 'w') as f:
-            json.dump(payments, f, indent=2)
+        """Replace payment logs after an in-place edit"""
+        self.payment_log.rewrite(payments)
     
     def _load_materials(self) -> List[Dict]:
-        """Load material logs from file"""
-        try:
-            with open(self.materials_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        """Load material logs (snapshot plus journal)"""
+        return self.material_log.read_all()
     
     def _save_materials(self, materials: List[Dict]):
-        """Save material logs to file"""
-        with open(self.materials_file, 'w') as f:
-            json.dump(materials, f, indent=2)
+        """Replace material logs after an in-place edit"""
+        self.material_log.rewrite(materials)
     
     def _load_labor(self) -> List[Dict]:
-        """Load labor logs from file"""
-        try:
-            with open(self.labor_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        """Load labor logs (snapshot plus journal)"""
+        return self.labor_log.read_all()
     
     def _save_labor(self, labor: List[Dict]):
-        """Save labor logs to file"""
-        with open(self.labor_file, 'w') as f:
-            json.dump(labor, f, indent=2)
+        """Replace labor logs after an in-place edit"""
+        self.labor_log.rewrite(labor)
 
 # Global instance
 job_tracking_service = JobTrackingService()
\ No newline at end of file
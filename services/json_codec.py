@@ -0,0 +1,123 @@
+"""
+JSON Codec Layer for SPANKKS Construction
+orjson encoder/decoder for data/*.json, with the json module as a fallback
+"""
+
+import json
+import os
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Type, Union
+
+import orjson
+
+# 'orjson' (default) or 'stdlib' to force the json module
+DATA_JSON_CODEC = os.environ.get('DATA_JSON_CODEC', 'orjson').strip().lower()
+# 'pretty' writes 2-space indented files; 'compact' writes minified JSON
+DATA_JSON_FORMAT = os.environ.get('DATA_JSON_FORMAT', 'pretty').strip().lower()
+
+# Hand datetimes, dataclasses and str/int subclasses to `default` like json.dumps does
+_ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+                   | orjson.OPT_PASSTHROUGH_DATACLASS | orjson.OPT_PASSTHROUGH_SUBCLASS)
+
+
+def fast_codec_enabled() -> bool:
+    """True when the orjson encoder/decoder is in use"""
+    return DATA_JSON_CODEC != 'stdlib'
+
+
+def _fast_encode(data: Any, default: Optional[Callable], option: int = 0) -> Optional[bytes]:
+    if fast_codec_enabled():
+        try:
+            return orjson.dumps(data, default=default, option=_ORJSON_OPTIONS | option)
+        except orjson.JSONEncodeError:
+            # Values orjson can't represent (e.g. >64-bit ints): let the json module decide
+            pass
+    return None
+
+
+def encode(data: Any, indent: Optional[int] = 2, default: Optional[Callable] = None) -> bytes:
+    """Encode a collection for a data file.
+
+    The default 'pretty' format is 2-space indented (orjson writes non-ASCII
+    text as UTF-8 rather than \\u escapes); other indents go through the json
+    module. DATA_JSON_FORMAT=compact writes minified JSON.
+    """
+    if DATA_JSON_FORMAT == 'compact' or indent is None:
+        return _compact(data, default)
+    if indent == 2:
+        encoded = _fast_encode(data, default, orjson.OPT_INDENT_2)
+        if encoded is not None:
+            return encoded
+    return json.dumps(data, indent=indent, default=default).encode('utf-8')
+
+
+def _compact(data: Any, default: Optional[Callable]) -> bytes:
+    encoded = _fast_encode(data, default)
+    if encoded is not None:
+        return encoded
+    return json.dumps(data, default=default, separators=(',', ':')).encode('utf-8')
+
+
+def encode_line(record: Any, default: Optional[Callable] = None) -> str:
+    """Encode one record on a single line (JSONL journals, SQLite rows)"""
+    return _compact(record, default).decode('utf-8')
+
+
+def iter_encode_array(items: Iterable[Any], default: Optional[Callable] = None,
+                      chunk_size: int = 64 * 1024) -> Iterator[bytes]:
+    """Encode an iterable as one JSON array, yielding chunks as it goes.
+
+    Only about chunk_size bytes are buffered at a time. The first item is
+    sent as soon as it is encoded so clients get a response quickly.
+    """
+    buffer = bytearray(b'[')
+    count = 0
+    for item in items:
+        if count:
+            buffer += b','
+        buffer += _compact(item, default)
+        count += 1
+        if count == 1 or len(buffer) >= chunk_size:
+            yield bytes(buffer)
+            buffer.clear()
+    buffer += b']'
+    yield bytes(buffer)
+
+
+def decode(raw: Union[bytes, str]) -> Any:
+    """Decode JSON text with the fast decoder, falling back to the json module"""
+    if fast_codec_enabled():
+        try:
+            return orjson.loads(raw)
+        except orjson.JSONDecodeError:
+            # NaN/Infinity and other stdlib-only extensions
+            pass
+    if isinstance(raw, bytes):
+        raw = raw.decode('utf-8')
+    return json.loads(raw)
+
+
+def load_file(path: str) -> Any:
+    """Read and decode a JSON file (raises FileNotFoundError / json.JSONDecodeError)"""
+    with open(path, 'rb') as f:
+        return decode(f.read())
+
+
+def decode_records(raw: Union[bytes, str], record_type: Type) -> List[Any]:
+    """Decode a JSON array straight into record objects via record_type.from_dict() (e.g. SlottedRecord models)"""
+    return convert_records(decode(raw), record_type)
+
+
+def convert_records(data: Any, record_type: Type) -> List[Any]:
+    """Turn already-decoded dicts into record objects (see decode_records)"""
+    if not isinstance(data, list):
+        raise ValueError(f"Expected a JSON array of {record_type.__name__} records")
+    return [record_type.from_dict(item) for item in data]
+
+
+def get_codec_info() -> Dict[str, Any]:
+    """Active codec settings for diagnostics"""
+    return {
+        'codec': 'orjson' if fast_codec_enabled() else 'stdlib',
+        'format': DATA_JSON_FORMAT,
+        'orjson_version': orjson.__version__,
+    }
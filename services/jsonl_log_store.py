@@ -0,0 +1,259 @@
+"""
+Append-Only Log Store for SPANKKS Construction
+JSONL journal backend for high-churn event collections (payments, interactions, labor, materials)
+"""
+
+import json
+import logging
+import marshal
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from services.json_codec import decode, encode_line, load_file
+from services.persistence import atomic_write_json, file_lock, fsync_directory
+from services.sqlite_store import SQLiteLogStore, get_sqlite_store, sqlite_collection
+
+
+class JSONLLogStore:
+    """Append-only event log backed by a JSON snapshot plus a JSONL journal.
+
+    The existing ``data/<name>.json`` array remains the snapshot; new events
+    are appended as single lines to ``data/<name>.jsonl``. Reads replay the
+    snapshot once and then only the journal bytes added since the last read,
+    and the journal is folded back into the snapshot once it grows past
+    ``compact_bytes``. Appends, replays and compaction hold the snapshot's
+    cross-process file lock, so several workers can share one log.
+
+    Compaction and rewrite() move the journal aside to ``.compacting``,
+    write the new snapshot to ``.next`` (temp file, fsync, rename), remove
+    ``.compacting`` as the commit point and finally rename ``.next`` over
+    the snapshot. After a crash, which of those files exist says how far
+    the swap got, so recovery never has to compare timestamps.
+    """
+
+    def __init__(self, snapshot_path: str, compact_bytes: int = 1024 * 1024):
+        self.snapshot_path = snapshot_path
+        self.journal_path = os.path.splitext(snapshot_path)[0] + '.jsonl'
+        self.compacting_path = self.journal_path + '.compacting'
+        self.next_snapshot_path = snapshot_path + '.next'
+        self.compact_bytes = compact_bytes
+
+        # Lazily replayed state
+        self._records: List[Dict] = []
+        self._indexes: Dict[str, Dict[Any, List[Dict]]] = {}
+        self._snapshot_signature: Optional[tuple] = None
+        self._journal_inode: Optional[int] = None
+        self._journal_offset = 0
+        self._loaded = False
+
+    # Writes
+    def append(self, record: Dict) -> Dict:
+        """Append one event as a single JSONL line without reading the collection"""
+        line = encode_line(record, default=str) + '\n'
+        with file_lock(self.snapshot_path):
+            os.makedirs(os.path.dirname(self.journal_path) or '.', exist_ok=True)
+            fd = os.open(self.journal_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line.encode('utf-8'))
+                journal_size = os.fstat(fd).st_size
+            finally:
+                os.close(fd)
+
+            if journal_size >= self.compact_bytes:
+                self.compact()
+        return record
+
+    def rewrite(self, records: List[Dict]):
+        """Replace the whole collection (used for in-place edits of logged events)"""
+        with file_lock(self.snapshot_path):
+            self._recover_interrupted_compaction()
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.compacting_path)
+            self._commit_snapshot(records)
+            self._reset_state()
+
+    def compact(self):
+        """Fold the journal into the JSON snapshot and start a fresh journal"""
+        with file_lock(self.snapshot_path):
+            self._recover_interrupted_compaction()
+            if not os.path.exists(self.journal_path):
+                return
+
+            # New appends go to a fresh journal while this one is folded in
+            os.replace(self.journal_path, self.compacting_path)
+            self._fold_compacting_journal()
+            self._reset_state()
+            logging.info(f"Compacted event log {self.journal_path}")
+
+    # Reads
+    def read_all(self) -> List[Dict]:
+        """Get every event: snapshot plus journal, replaying only new journal lines (copies the caller may edit)"""
+        with file_lock(self.snapshot_path):
+            self._refresh()
+            return _copy_records(self._records)
+
+    def count(self) -> int:
+        """Number of events in the collection"""
+        with file_lock(self.snapshot_path):
+            self._refresh()
+            return len(self._records)
+
+    def find_by(self, field: str, value: Any) -> List[Dict]:
+        """Get events where record[field] == value via a lazily built index"""
+        with file_lock(self.snapshot_path):
+            self._refresh()
+            index = self._indexes.get(field)
+            if index is None:
+                index = {}
+                for record in self._records:
+                    index.setdefault(record.get(field), []).append(record)
+                self._indexes[field] = index
+            return _copy_records(index.get(value, []))
+
+    def filter(self, predicate: Callable[[Dict], bool]) -> List[Dict]:
+        """Get events matching an arbitrary predicate"""
+        return [record for record in self.read_all() if predicate(record)]
+
+    # Internals
+    def _reset_state(self):
+        self._records = []
+        self._indexes = {}
+        self._snapshot_signature = None
+        self._journal_inode = None
+        self._journal_offset = 0
+        self._loaded = False
+
+    @staticmethod
+    def _signature(path: str) -> Optional[tuple]:
+        try:
+            stat_result = os.stat(path)
+        except OSError:
+            return None
+        return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+    def _refresh(self):
+        """Bring in-memory state up to date with the snapshot and journal on disk"""
+        self._recover_interrupted_compaction()
+
+        snapshot_signature = self._signature(self.snapshot_path)
+        journal_signature = self._signature(self.journal_path)
+        journal_inode = journal_signature[0] if journal_signature else None
+        journal_size = journal_signature[2] if journal_signature else 0
+
+        full_reload = (
+            not self._loaded
+            or snapshot_signature != self._snapshot_signature
+            or journal_inode != self._journal_inode
+            or journal_size < self._journal_offset
+        )
+        if full_reload:
+            self._reset_state()
+            self._records = self._load_snapshot()
+            self._snapshot_signature = snapshot_signature
+            self._journal_inode = journal_inode
+            self._loaded = True
+
+        if journal_size > self._journal_offset:
+            self._replay_journal()
+
+    def _load_snapshot(self) -> List[Dict]:
+        try:
+            data = load_file(self.snapshot_path)
+            return data if isinstance(data, list) else []
+        except (FileNotFoundError, json.JSONDecodeError):
+            return []
+
+    def _replay_journal(self):
+        """Read journal lines appended since the last replay"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                f.seek(self._journal_offset)
+                chunk = f.read()
+        except FileNotFoundError:
+            return
+
+        # A trailing line without newline is still being written; pick it up next time
+        complete = chunk[:chunk.rfind(b'\n') + 1]
+        for raw_line in complete.splitlines():
+            if not raw_line.strip():
+                continue
+            try:
+                record = decode(raw_line)
+            except json.JSONDecodeError:
+                logging.warning(f"Skipping corrupt line in {self.journal_path}")
+                continue
+            self._records.append(record)
+            for field, index in self._indexes.items():
+                index.setdefault(record.get(field), []).append(record)
+        self._journal_offset += len(complete)
+
+    def _read_journal_file(self, path: str) -> List[Dict]:
+        records = []
+        try:
+            with open(path, 'r') as f:
+                for line in f:
+                    if not line.strip():
+                        continue
+                    try:
+                        records.append(decode(line))
+                    except json.JSONDecodeError:
+                        logging.warning(f"Skipping corrupt line in {path}")
+        except FileNotFoundError:
+            pass
+        return records
+
+    def _fold_compacting_journal(self):
+        records = self._load_snapshot() + self._read_journal_file(self.compacting_path)
+        self._commit_snapshot(records)
+
+    def _commit_snapshot(self, records: List[Dict]):
+        """Install records as the snapshot and retire the set-aside journal (see class docstring)"""
+        atomic_write_json(self.next_snapshot_path, records, indent=2, default=str)
+        if os.path.exists(self.compacting_path):
+            os.remove(self.compacting_path)
+            fsync_directory(os.path.dirname(self.compacting_path) or '.')
+        self._install_next_snapshot()
+
+    def _install_next_snapshot(self):
+        os.replace(self.next_snapshot_path, self.snapshot_path)
+        fsync_directory(os.path.dirname(self.snapshot_path) or '.')
+
+    def _recover_interrupted_compaction(self):
+        """Finish or redo a compaction/rewrite that was interrupted by a crash"""
+        compacting = os.path.exists(self.compacting_path)
+        staged = os.path.exists(self.next_snapshot_path)
+        if not compacting and not staged:
+            return
+        if compacting:
+            # Not committed: the old snapshot plus the set-aside journal are current
+            if staged:
+                os.remove(self.next_snapshot_path)
+            self._fold_compacting_journal()
+        else:
+            # Committed, but .next was never renamed over the snapshot
+            self._install_next_snapshot()
+        self._reset_state()
+
+
+def _copy_records(records: List[Dict]) -> List[Dict]:
+    """Independent copies of journal records (plain JSON values, so marshal round-trips them)"""
+    return marshal.loads(marshal.dumps(records))
+
+
+_log_stores: Dict[str, Union[JSONLLogStore, SQLiteLogStore]] = {}
+_log_stores_lock = threading.Lock()
+
+
+def get_log_store(snapshot_path: str) -> Union[JSONLLogStore, SQLiteLogStore]:
+    """Get the shared log store for a data file (one per path per process)"""
+    key = os.path.abspath(snapshot_path)
+    with _log_stores_lock:
+        store = _log_stores.get(key)
+        if store is None:
+            if sqlite_collection(snapshot_path):
+                store = SQLiteLogStore(get_sqlite_store(), snapshot_path)
+            else:
+                store = JSONLLogStore(snapshot_path)
+            _log_stores[key] = store
+        return store
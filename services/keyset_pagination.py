@@ -0,0 +1,246 @@
+"""
+Keyset Pagination for SPANKKS Construction list APIs
+Cursor-based paging, field projection, whitelisted filters and streamed
+JSON responses over raw SQL tables
+"""
+
+import base64
+import json
+import threading
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from flask import Response, current_app, jsonify, stream_with_context
+from sqlalchemy import text
+
+from services.json_codec import iter_encode_array
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+# Rows fetched per round trip from a server-side cursor when streaming
+STREAM_BATCH_SIZE = 500
+
+_table_columns: Dict[str, List[str]] = {}
+_table_columns_lock = threading.Lock()
+
+
+class PaginationError(ValueError):
+    """Bad cursor, limit, field or filter in a list request (reported as HTTP 400)"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """Opaque cursor for the sort-key values of the last row on a page"""
+    def plain(value):
+        if isinstance(value, (datetime, date)):
+            return value.isoformat()
+        if isinstance(value, Decimal):
+            return str(value)
+        return value
+    raw = json.dumps([plain(value) for value in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except (ValueError, UnicodeError):
+        raise PaginationError("Invalid cursor")
+    if not isinstance(values, list) or len(values) != size:
+        raise PaginationError("Invalid cursor")
+    return values
+
+
+def nulls_last(expression: str, placeholder: str, direction: str = 'DESC') -> List[str]:
+    """Sort keys that page a nullable expression, NULL rows after the rest.
+
+    A flag key puts the NULL rows last and the COALESCE gives them a value.
+    placeholder must come back from the driver unchanged so the cursor can
+    resume inside the NULL rows: '-infinity' does not (psycopg2 reads it as
+    datetime.min, and the cursor would repeat those rows forever), while
+    e.g. 'epoch'::timestamp does. Follow with a unique column.
+    """
+    flag = f"({expression} IS NOT NULL)" if direction.upper() == 'DESC' else f"({expression} IS NULL)"
+    return [flag, f"COALESCE({expression}, {placeholder})"]
+
+
+def get_table_columns(conn, table: str) -> List[str]:
+    """Column names of a table (cached per process); used to validate fields= on SELECT * endpoints"""
+    with _table_columns_lock:
+        columns = _table_columns.get(table)
+    if columns is None:
+        result = conn.execute(text("""
+            SELECT column_name FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = :table
+            ORDER BY ordinal_position
+        """), {'table': table})
+        columns = [row[0] for row in result]
+        with _table_columns_lock:
+            _table_columns[table] = columns
+    return columns
+
+
+class KeysetQuery:
+    """A paginated listing of one table.
+
+    columns maps output names to SQL expressions (None = every table column,
+    validated against information_schema). sort_keys is a list of
+    never-NULL SQL expressions ending in a unique column, all sorted in
+    `direction` (see nulls_last() for nullable columns); pages continue
+    with a row-value comparison on them, so
+    each page costs the same however deep the client pages. filters maps
+    query-string parameters to SQL templates using :value.
+    """
+
+    def __init__(self, table: str, sort_keys: Sequence[str], direction: str = 'DESC',
+                 columns: Optional[Dict[str, str]] = None, filters: Optional[Dict[str, str]] = None,
+                 where: Optional[str] = None):
+        self.table = table
+        self.sort_keys = list(sort_keys)
+        self.direction = direction.upper()
+        self.columns = columns
+        self.filters = filters or {}
+        self.where = where
+
+    def fetch(self, conn, args, params: Optional[Dict[str, Any]] = None,
+              prefix: str = '') -> Tuple[List[Dict], Optional[str]]:
+        """Run one page; args is request.args. prefix namespaces the paging
+        parameters (e.g. 'jobs_' -> jobs_cursor, jobs_limit, jobs_fields)."""
+        limit = self._limit(args.get(f'{prefix}limit'))
+        sql, bind = self._build(conn, args, params, prefix)
+        sql += " LIMIT :_limit"
+        bind['_limit'] = limit + 1
+
+        rows = [dict(row._mapping) for row in conn.execute(text(sql), bind)]
+        next_cursor = None
+        if len(rows) > limit:
+            rows = rows[:limit]
+            next_cursor = encode_cursor([rows[-1][f'_k{position}'] for position in range(len(self.sort_keys))])
+        for row in rows:
+            self._strip_keys(row)
+        return rows, next_cursor
+
+    def stream(self, engine, args, params: Optional[Dict[str, Any]] = None,
+               prefix: str = '') -> Iterator[Dict]:
+        """Yield every matching row (from the cursor on, if given) via a server-side cursor"""
+        with engine.connect() as conn:
+            # Validate before the response starts so errors can still be a 400
+            sql, bind = self._build(conn, args, params, prefix)
+            yield from stream_rows(conn, sql, bind, self._strip_keys)
+
+    def _build(self, conn, args, params: Optional[Dict[str, Any]], prefix: str) -> Tuple[str, Dict[str, Any]]:
+        projection = self._projection(conn, args.get(f'{prefix}fields'))
+
+        select_list = [f"{expr} AS {_quote(name)}" for name, expr in projection]
+        select_list += [f"{key} AS _k{position}" for position, key in enumerate(self.sort_keys)]
+
+        conditions = [self.where] if self.where else []
+        bind = dict(params or {})
+        for position, (param, template) in enumerate(self.filters.items()):
+            value = args.get(param)
+            if value in (None, ''):
+                continue
+            conditions.append(template.replace(':value', f':f{position}'))
+            bind[f'f{position}'] = value
+
+        cursor = args.get(f'{prefix}cursor')
+        if cursor:
+            values = decode_cursor(cursor, len(self.sort_keys))
+            operator = '<' if self.direction == 'DESC' else '>'
+            placeholders = ', '.join(f':c{position}' for position in range(len(values)))
+            conditions.append(f"({', '.join(self.sort_keys)}) {operator} ({placeholders})")
+            bind.update({f'c{position}': value for position, value in enumerate(values)})
+
+        sql = f"SELECT {', '.join(select_list)} FROM {self.table}"
+        if conditions:
+            sql += " WHERE " + " AND ".join(f"({condition})" for condition in conditions)
+        sql += " ORDER BY " + ", ".join(f"{key} {self.direction}" for key in self.sort_keys)
+        return sql, bind
+
+    def _strip_keys(self, row: Dict) -> Dict:
+        for position in range(len(self.sort_keys)):
+            del row[f'_k{position}']
+        return row
+
+    def _limit(self, raw: Optional[str]) -> int:
+        if raw in (None, ''):
+            return DEFAULT_PAGE_SIZE
+        try:
+            limit = int(raw)
+        except ValueError:
+            raise PaginationError("limit must be an integer")
+        return max(1, min(MAX_PAGE_SIZE, limit))
+
+    def _projection(self, conn, raw_fields: Optional[str]) -> List[Tuple[str, str]]:
+        if self.columns is not None:
+            available = self.columns
+        else:
+            available = {name: _quote(name) for name in get_table_columns(conn, self.table)}
+        if not raw_fields:
+            return list(available.items())
+        requested = [name.strip() for name in raw_fields.split(',') if name.strip()]
+        unknown = [name for name in requested if name not in available]
+        if unknown:
+            raise PaginationError(f"Unknown field(s): {', '.join(unknown)}")
+        return [(name, available[name]) for name in dict.fromkeys(requested)]
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def paginated_response(rows: List[Dict], next_cursor: Optional[str], args):
+    """JSON list response; the next page's cursor goes in X-Next-Cursor (and the
+    body becomes {'items', 'next_cursor'} when envelope=1 is passed)"""
+    if args.get('envelope') == '1':
+        response = jsonify({'items': rows, 'next_cursor': next_cursor})
+    else:
+        response = jsonify(rows)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response
+
+
+def stream_rows(conn, sql: str, params: Optional[Dict[str, Any]] = None,
+                transform: Optional[Callable[[Dict], Any]] = None) -> Iterator[Any]:
+    """Yield query rows as dicts from a server-side cursor, STREAM_BATCH_SIZE at a time"""
+    result = conn.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE).execute(text(sql), params or {})
+    for row in result:
+        item = dict(row._mapping)
+        yield transform(item) if transform else item
+
+
+def streaming_json_response(items: Iterable[Any], prime: bool = True) -> Response:
+    """Stream items as a JSON array without building the list or the payload in memory.
+
+    Values are encoded like jsonify (same `default` hook for dates and
+    Decimals). With prime=True the first item is pulled before the response
+    starts, so query and validation errors (e.g. PaginationError) are still
+    raised inside the view rather than mid-stream.
+    """
+    items = iter(items)
+    if prime:
+        try:
+            first = next(items)
+        except StopIteration:
+            return jsonify([])
+        items = _chain_first(first, items)
+    default = current_app.json.default
+    return Response(stream_with_context(iter_encode_array(items, default=default)),
+                    mimetype='application/json')
+
+
+def _chain_first(first: Any, rest: Iterator[Any]) -> Iterator[Any]:
+    yield first
+    yield from rest
+
+
+def wants_stream(args, prefix: str = '') -> bool:
+    """True when the whole result should be streamed (?stream=1) rather than one page.
+
+    Everything else gets a page of at most DEFAULT_PAGE_SIZE rows unless
+    limit says otherwise; clients follow next_cursor for the rest.
+    """
+    return args.get('stream') == '1'
+
@@ -0,0 +1,314 @@
+"""
+KPI Rollup Service for SPANKKS Construction
+Daily/monthly KPI tables for the performance dashboard, refreshed incrementally
+"""
+
+import logging
+import os
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, Iterable, Optional, Union
+
+from services.db_pool import get_engine, reporting_connection
+
+# Rollups older than this are refreshed (current month + all-time totals) on the next read
+KPI_ROLLUP_MAX_AGE = int(os.environ.get('KPI_ROLLUP_MAX_AGE', '300'))
+
+# pg advisory lock key so only one worker refreshes at a time
+_REFRESH_LOCK_KEY = 0x4B5049
+
+_CREATE_TABLES_SQL = """
+    CREATE TABLE IF NOT EXISTS kpi_daily (
+        day DATE PRIMARY KEY,
+        jobs_created INTEGER NOT NULL DEFAULT 0,
+        jobs_completed INTEGER NOT NULL DEFAULT 0,
+        revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        quotes_created INTEGER NOT NULL DEFAULT 0,
+        quotes_accepted INTEGER NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS kpi_monthly (
+        month DATE PRIMARY KEY,
+        jobs_created INTEGER NOT NULL DEFAULT 0,
+        jobs_completed INTEGER NOT NULL DEFAULT 0,
+        revenue NUMERIC(14, 2) NOT NULL DEFAULT 0,
+        quotes_created INTEGER NOT NULL DEFAULT 0,
+        quotes_accepted INTEGER NOT NULL DEFAULT 0,
+        refreshed_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+    CREATE TABLE IF NOT EXISTS kpi_totals (
+        metric VARCHAR(64) PRIMARY KEY,
+        value NUMERIC,
+        refreshed_at TIMESTAMP NOT NULL DEFAULT NOW()
+    );
+"""
+
+# Range predicates (not DATE_TRUNC) so the refresh can use indexes on the date columns
+_REFRESH_DAILY_SQL = """
+    INSERT INTO kpi_daily (day, jobs_created, jobs_completed, revenue,
+                           quotes_created, quotes_accepted, refreshed_at)
+    SELECT d.day::date,
+           COALESCE(j.created, 0), COALESCE(j.completed, 0), COALESCE(p.revenue, 0),
+           COALESCE(q.created, 0), COALESCE(q.accepted, 0), NOW()
+    FROM generate_series(CAST(:start AS date), CAST(:end AS date) - 1, INTERVAL '1 day') AS d(day)
+    LEFT JOIN (
+        SELECT timestamp_created::date AS day,
+               COUNT(*) AS created,
+               COUNT(*) FILTER (WHERE status = 'completed') AS completed
+        FROM jobs
+        WHERE timestamp_created >= :start AND timestamp_created < :end
+        GROUP BY 1
+    ) j ON j.day = d.day::date
+    LEFT JOIN (
+        SELECT payment_date::date AS day, SUM(amount_paid) AS revenue
+        FROM payments
+        WHERE payment_date >= :start AND payment_date < :end
+        GROUP BY 1
+    ) p ON p.day = d.day::date
+    LEFT JOIN (
+        SELECT created_at::date AS day,
+               COUNT(*) AS created,
+               COUNT(*) FILTER (WHERE status = 'accepted') AS accepted
+        FROM quotes
+        WHERE created_at >= :start AND created_at < :end
+        GROUP BY 1
+    ) q ON q.day = d.day::date
+    ON CONFLICT (day) DO UPDATE SET
+        jobs_created = EXCLUDED.jobs_created,
+        jobs_completed = EXCLUDED.jobs_completed,
+        revenue = EXCLUDED.revenue,
+        quotes_created = EXCLUDED.quotes_created,
+        quotes_accepted = EXCLUDED.quotes_accepted,
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+_REFRESH_MONTHLY_SQL = """
+    INSERT INTO kpi_monthly (month, jobs_created, jobs_completed, revenue,
+                             quotes_created, quotes_accepted, refreshed_at)
+    SELECT DATE_TRUNC('month', day)::date,
+           SUM(jobs_created), SUM(jobs_completed), SUM(revenue),
+           SUM(quotes_created), SUM(quotes_accepted), NOW()
+    FROM kpi_daily
+    WHERE day >= :start AND day < :end
+    GROUP BY 1
+    ON CONFLICT (month) DO UPDATE SET
+        jobs_created = EXCLUDED.jobs_created,
+        jobs_completed = EXCLUDED.jobs_completed,
+        revenue = EXCLUDED.revenue,
+        quotes_created = EXCLUDED.quotes_created,
+        quotes_accepted = EXCLUDED.quotes_accepted,
+        refreshed_at = EXCLUDED.refreshed_at
+"""
+
+# All-time dashboard figures; each query returns one value
+_TOTALS_SQL = {
+    'outstanding_invoices': """
+        SELECT COUNT(*) FROM invoices
+        WHERE status IN ('unsent', 'sent', 'overdue', 'pending')
+    """,
+    'outstanding_amount': """
+        SELECT COALESCE(SUM(amount_due), 0) FROM invoices
+        WHERE status IN ('unsent', 'sent', 'overdue', 'pending')
+    """,
+    'avg_job_hours': """
+        SELECT ROUND(AVG(estimated_hours), 2) FROM jobs
+        WHERE status = 'completed' AND estimated_hours IS NOT NULL
+    """,
+    'jobs_per_staff': """
+        SELECT ROUND(COUNT(*)::DECIMAL / NULLIF((SELECT COUNT(*) FROM staff), 0), 2)
+        FROM jobs WHERE status = 'completed'
+    """,
+    'avg_job_value': """
+        SELECT ROUND(AVG(amount_due), 2) FROM invoices WHERE amount_due > 0
+    """,
+    'repeat_clients': """
+        SELECT COUNT(*) FROM (
+            SELECT client_id FROM jobs GROUP BY client_id HAVING COUNT(*) > 1
+        ) AS repeat_clients
+    """,
+    'avg_client_revenue': """
+        SELECT ROUND(AVG(total_paid), 2) FROM (
+            SELECT client_id, SUM(amount_paid) AS total_paid FROM payments GROUP BY client_id
+        ) AS client_totals
+    """,
+    'total_clients': """
+        SELECT COUNT(DISTINCT client_id) FROM jobs
+    """,
+}
+
+_KPI_COLUMNS = ('jobs_created', 'jobs_completed', 'revenue', 'quotes_created', 'quotes_accepted')
+
+
+def _as_date(value: Union[date, datetime, str, None]) -> Optional[date]:
+    if value is None or value == '':
+        return None
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+    try:
+        return datetime.fromisoformat(str(value).replace('Z', '+00:00')).date()
+    except ValueError:
+        return None
+
+
+def _month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def _next_month(day: date) -> date:
+    return (day.replace(day=28) + timedelta(days=4)).replace(day=1)
+
+
+class KPIRollupService:
+    """Maintains kpi_daily / kpi_monthly / kpi_totals for the performance dashboard.
+
+    Daily rows are recomputed for just the days touched by a change (or the
+    current month on the periodic refresh) and rolled up into their months,
+    so reads are a couple of primary-key lookups instead of table scans.
+    """
+
+    def __init__(self, max_age: int = KPI_ROLLUP_MAX_AGE):
+        self.max_age = max_age
+        self._tables_ready = False
+
+    def ensure_tables(self, conn):
+        if not self._tables_ready:
+            from sqlalchemy import text
+            conn.execute(text(_CREATE_TABLES_SQL))
+            self._tables_ready = True
+
+    def refresh_range(self, conn, start: date, end: date):
+        """Recompute daily rows for [start, end) and the months they fall in"""
+        from sqlalchemy import text
+        if end <= start:
+            return
+        conn.execute(text(_REFRESH_DAILY_SQL), {'start': start, 'end': end})
+        conn.execute(text(_REFRESH_MONTHLY_SQL), {
+            'start': _month_start(start),
+            'end': _next_month(end - timedelta(days=1))
+        })
+
+    def refresh_totals(self, conn):
+        """Recompute the all-time figures in kpi_totals"""
+        from sqlalchemy import text
+        for metric, sql in _TOTALS_SQL.items():
+            value = conn.execute(text(sql)).scalar()
+            conn.execute(text("""
+                INSERT INTO kpi_totals (metric, value, refreshed_at)
+                VALUES (:metric, :value, NOW())
+                ON CONFLICT (metric) DO UPDATE SET value = EXCLUDED.value, refreshed_at = EXCLUDED.refreshed_at
+            """), {'metric': metric, 'value': value})
+
+    def record_change(self, days: Iterable[Union[date, datetime, str, None]] = ()):
+        """Refresh the daily/monthly rollups after jobs, payments or quotes change.
+
+        days are the dates the changed rows are bucketed under (created /
+        payment date); the database's today is always included. All-time
+        totals are left to refresh_if_stale / the cron job, so they may lag
+        by up to max_age. Failures are logged, never raised, so a rollup
+        problem can't fail the write that triggered it.
+        """
+        from sqlalchemy import text
+        touched = {_as_date(day) for day in days}
+        touched.discard(None)
+        try:
+            with get_engine().begin() as conn:
+                self.ensure_tables(conn)
+                touched.add(conn.execute(text("SELECT CURRENT_DATE")).scalar())
+                for day in sorted(touched):
+                    self.refresh_range(conn, day, day + timedelta(days=1))
+        except Exception as e:
+            logging.error(f"KPI rollup refresh error: {e}")
+
+    def refresh_if_stale(self, conn) -> bool:
+        """Refresh the current month and totals when older than max_age; returns True if refreshed"""
+        from sqlalchemy import text
+        self.ensure_tables(conn)
+        state = conn.execute(text("""
+            SELECT CURRENT_DATE AS today,
+                   EXISTS (SELECT 1 FROM kpi_daily) AS populated,
+                   (SELECT refreshed_at FROM kpi_monthly
+                    WHERE month = DATE_TRUNC('month', CURRENT_DATE)::date) AS month_refreshed,
+                   (SELECT MIN(refreshed_at) FROM kpi_totals) AS totals_refreshed,
+                   NOW() - make_interval(secs => :max_age) AS cutoff
+        """), {'max_age': self.max_age}).first()
+
+        stale = (
+            state.month_refreshed is None or state.month_refreshed < state.cutoff
+            or state.totals_refreshed is None or state.totals_refreshed < state.cutoff
+        )
+        if not stale:
+            return False
+        # Another worker is already refreshing: serve the current rows
+        if not conn.execute(text("SELECT pg_try_advisory_xact_lock(:key)"), {'key': _REFRESH_LOCK_KEY}).scalar():
+            return False
+
+        started = time.perf_counter()
+        if state.populated:
+            self.refresh_range(conn, _month_start(state.today), state.today + timedelta(days=1))
+        else:
+            self._rebuild(conn, state.today)
+        self.refresh_totals(conn)
+        logging.info(f"KPI rollups refreshed in {(time.perf_counter() - started) * 1000:.0f}ms")
+        return True
+
+    def rebuild(self):
+        """Recompute every daily/monthly row from the first recorded activity"""
+        from sqlalchemy import text
+        with get_engine().begin() as conn:
+            self.ensure_tables(conn)
+            today = conn.execute(text("SELECT CURRENT_DATE")).scalar()
+            self._rebuild(conn, today)
+            self.refresh_totals(conn)
+
+    def _rebuild(self, conn, today: date):
+        from sqlalchemy import text
+        first_day = conn.execute(text("""
+            SELECT LEAST(
+                (SELECT MIN(timestamp_created)::date FROM jobs),
+                (SELECT MIN(payment_date)::date FROM payments),
+                (SELECT MIN(created_at)::date FROM quotes)
+            )
+        """)).scalar() or today
+        self.refresh_range(conn, min(first_day, today), today + timedelta(days=1))
+
+    def get_dashboard_kpis(self) -> Dict[str, Any]:
+        """Current-month KPIs and all-time totals from the rollup tables"""
+        from sqlalchemy import text
+        with get_engine().begin() as conn:
+            self.refresh_if_stale(conn)
+        # The rows themselves are read from the reporting replica when there is one
+        with reporting_connection() as conn:
+            month = conn.execute(text("""
+                SELECT * FROM kpi_monthly WHERE month = DATE_TRUNC('month', CURRENT_DATE)::date
+            """)).first()
+            totals = {row.metric: row.value for row in conn.execute(text("SELECT metric, value FROM kpi_totals"))}
+
+        month_data = {column: (getattr(month, column) if month else 0) or 0 for column in _KPI_COLUMNS}
+        jobs_created = month_data['jobs_created']
+        quotes_created = month_data['quotes_created']
+        return {
+            'total_jobs_month': jobs_created,
+            'completion_rate': round(100.0 * month_data['jobs_completed'] / jobs_created, 2) if jobs_created else 0,
+            'revenue_month': month_data['revenue'],
+            'quote_conversion': round(100.0 * month_data['quotes_accepted'] / quotes_created, 2) if quotes_created else 0,
+            'totals': {metric: (value if value is not None else 0) for metric, value in totals.items()}
+        }
+
+
+# Global KPI rollup service instance
+kpi_rollup_service = KPIRollupService()
+
+
+if __name__ == '__main__':
+    # Cron entry point: python -m services.kpi_rollup_service [--rebuild]
+    import sys
+    if '--rebuild' in sys.argv[1:]:
+        kpi_rollup_service.rebuild()
+        print("KPI rollups rebuilt")
+    else:
+        with get_engine().begin() as conn:
+            kpi_rollup_service.max_age = 0
+            kpi_rollup_service.refresh_if_stale(conn)
+        print("KPI rollups refreshed")
@@ -7,10 +7,11 @@ import json
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
 
+from services.db_pool import db_connection, reporting_db_connection
+
 class NotificationService:
     """Professional notification management system"""
     
@@ -18,8 +19,8 @@ class NotificationService:
         self.db_url = os.environ.get('DATABASE_URL')
         
     def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
+        """Borrow a pooled database connection (returned to the pool when the with-block exits)"""
+        return db_connection(cursor_factory=RealDictCursor)
     
     def get_notification_settings(self) -> List[Dict]:
         """Get all notification settings"""
@@ -172,7 +173,7 @@ class NotificationService:
     def get_notification_statistics(self) -> Dict[str, Any]:
         """Get notification statistics"""
         try:
-            with self.get_db_connection() as conn:
+            with reporting_db_connection(cursor_factory=RealDictCursor) as conn:
                 with conn.cursor() as cursor:
                     cursor.execute("""
                         SELECT 
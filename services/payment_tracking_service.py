@@ -3,12 +3,14 @@ Payment Tracking Service - Manual payment processing for cash, check, Venmo, Zel
 Handles payment logging, receipt generation, and payment status tracking
 """
 
-import json
 import os
 import logging
 from datetime import datetime
 from typing import Dict, List, Optional
 import pytz
+from services.id_allocator import id_allocator
+from services.jsonl_log_store import get_log_store
+from services.persistence import with_file_lock, write_json
 
 class PaymentTrackingService:
     def __init__(self):
@@ -16,40 +18,34 @@ class PaymentTrackingService:
         self.payments_file = 'data/payments.json'
         self.receipts_file = 'data/receipts.json'
         self._ensure_data_files()
+        self.payment_log = get_log_store(self.payments_file)
     
     def _ensure_data_files(self):
         """Ensure payment data files exist"""
         os.makedirs('data', exist_ok=True)
         
         if not os.path.exists(self.payments_file):
-            with open(self.payments_file, 'w') as f:
-                json.dump([], f, indent=2)
+            write_json(self.payments_file, [])
         
         if not os.path.exists(self.receipts_file):
-            with open(self.receipts_file, 'w') as f:
-                json.dump([], f, indent=2)
+            write_json(self.receipts_file, [])
     
     def _load_payments(self) -> List[Dict]:
-        """Load payments from JSON file"""
-        try:
-            with open(self.payments_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        """Load payments (snapshot plus journal)"""
+        return self.payment_log.read_all()
     
     def _save_payments(self, payments: List[Dict]):
-        """Save payments to JSON file"""
-        with open(self.payments_file, 'w') as f:
-            json.dump(payments, f, indent=2)
+        """Replace payments after an in-place edit"""
+        self.payment_log.rewrite(payments)
     
+    @with_file_lock('payments_file')
     def log_payment(self, invoice_id: str, amount: float, payment_method: str, 
                    notes: str = '', received_by: str = 'admin') -> Dict:
         """Log a manual payment received"""
         hawaii_now = datetime.now(self.hawaii_tz)
         
-        # Generate payment ID
-        payments = self._load_payments()
-        payment_id = f"PAY{len(payments) + 1:04d}"
+        # Generate payment ID (shared payment sequence, so numbers survive rewrites)
+        payment_id = f"PAY{id_allocator.next_value('payment', seed=lambda: self.payment_log.count() + 1):04d}"
         
         payment_record = {
             'payment_id': payment_id,
@@ -64,8 +60,7 @@ class PaymentTrackingService:
             'created_at': hawaii_now.isoformat()
         }
         
-        payments.append(payment_record)
-        self._save_payments(payments)
+        self.payment_log.append(payment_record)
         
         logging.info(f"Payment logged: {payment_id} - ${amount} via {payment_method} for invoice {invoice_id}")
         return payment_record
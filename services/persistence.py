@@ -0,0 +1,382 @@
+"""
+Crash-Safe JSON Persistence for SPANKKS Construction
+Atomic temp-file/fsync/rename writes, batched flushing and cross-process
+file locking for data/*.json collections (or their SQLite tables when
+STORAGE_BACKEND=sqlite)
+"""
+
+import functools
+import json
+import logging
+import os
+import tempfile
+import threading
+from contextlib import contextmanager, ExitStack
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from services.json_codec import convert_records, decode_records, encode, load_file
+from services.sqlite_store import get_sqlite_store, sqlite_collection
+
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:
+    FCNTL_AVAILABLE = False
+
+_local = threading.local()
+
+# Lock files live beside the data under data/.locks/<file>.lock
+LOCK_DIR_NAME = '.locks'
+_thread_locks: Dict[str, threading.RLock] = {}
+_thread_locks_guard = threading.Lock()
+
+
+def fsync_directory(directory: str):
+    """Persist a rename by syncing its directory entry (no-op where unsupported)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _write_temp_json(path: str, data: Any, indent: Optional[int], default: Optional[Callable]) -> Tuple[str, os.stat_result]:
+    """Serialize data to a synced temp file next to path; returns (temp path, stat)"""
+    directory = os.path.dirname(path) or '.'
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(encode(data, indent=indent, default=default))
+            f.flush()
+            os.fsync(f.fileno())
+            stat_result = os.fstat(f.fileno())
+        return tmp_path, stat_result
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def atomic_write_json(path: str, data: Any, indent: Optional[int] = 2, default: Optional[Callable] = None) -> os.stat_result:
+    """Write JSON so readers only ever see the old or the new file, never a truncated one.
+
+    Returns the stat of the new file (rename keeps inode and mtime), which
+    callers can use to key caches.
+    """
+    tmp_path, stat_result = _write_temp_json(path, data, indent, default)
+    try:
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    fsync_directory(os.path.dirname(path) or '.')
+    return stat_result
+
+
+class WriteBatch:
+    """Collects dirty collections and flushes them together.
+
+    Every pending collection is serialized and fsynced to a temp file first,
+    then all temp files are renamed into place, so a failure while encoding
+    one collection leaves every file untouched. File locks released while
+    their file has a pending write are kept until the batch ends, so no
+    other worker reads the file between the edit and the flush.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, Tuple[Any, Optional[int], Optional[Callable]]] = {}
+        self._retained_locks: List[Callable[[], None]] = []
+
+    def mark_dirty(self, path: str, data: Any, indent: Optional[int] = 2, default: Optional[Callable] = None):
+        """Queue a collection for the next flush (the last write to a path wins)"""
+        self._pending[os.path.abspath(path)] = (data, indent, default)
+
+    def get_pending(self, path: str) -> Tuple[bool, Any]:
+        """Return (True, data) if path has an unflushed write in this batch"""
+        entry = self._pending.get(os.path.abspath(path))
+        if entry is None:
+            return False, None
+        return True, entry[0]
+
+    def has_pending(self, path: str) -> bool:
+        return os.path.abspath(path) in self._pending
+
+    def discard(self):
+        """Drop all pending writes"""
+        self._pending.clear()
+
+    def retain_lock(self, release: Callable[[], None]):
+        """Keep a file lock until the batch ends; release() is called after the flush (or discard)"""
+        self._retained_locks.append(release)
+
+    def release_locks(self):
+        """Release retained file locks, most recently taken first"""
+        while self._retained_locks:
+            self._retained_locks.pop()()
+
+    def flush(self) -> List[str]:
+        """Write every dirty collection; returns the paths written"""
+        if not self._pending:
+            return []
+
+        staged = []
+        sqlite_items = []
+        try:
+            for path, (data, indent, default) in self._pending.items():
+                if sqlite_collection(path):
+                    sqlite_items.append((path, data, default))
+                    continue
+                tmp_path, _ = _write_temp_json(path, data, indent, default)
+                staged.append((tmp_path, path))
+            if sqlite_items:
+                # One SQLite transaction; files are only renamed once it commits
+                get_sqlite_store().save_many(sqlite_items)
+        except Exception:
+            for tmp_path, _ in staged:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+            raise
+
+        directories = set()
+        for tmp_path, path in staged:
+            os.replace(tmp_path, path)
+            directories.add(os.path.dirname(path) or '.')
+        for directory in directories:
+            fsync_directory(directory)
+
+        written = [path for _, path in staged] + [path for path, _, _ in sqlite_items]
+        self._pending.clear()
+        logging.debug(f"Flushed {len(written)} collection(s) in one batch")
+        return written
+
+
+def current_batch() -> Optional[WriteBatch]:
+    """Get the write batch active on this thread, if any"""
+    return getattr(_local, 'batch', None)
+
+
+@contextmanager
+def write_batch():
+    """Defer write_json() calls on this thread and flush them together on exit.
+
+    Nested batches join the outermost one. If the block raises, pending
+    writes are discarded so a half-finished operation never reaches disk.
+    File locks on batched files stay held until the flush; take several with
+    file_locks() (sorted order) rather than one after another, so two
+    batches can't wait on each other.
+    """
+    outer = current_batch()
+    if outer is not None:
+        yield outer
+        return
+
+    batch = WriteBatch()
+    _local.batch = batch
+    try:
+        try:
+            yield batch
+        except Exception:
+            batch.discard()
+            raise
+        finally:
+            _local.batch = None
+        batch.flush()
+    finally:
+        batch.release_locks()
+
+
+def _persist(path: str, data: Any, indent: Optional[int], default: Optional[Callable]):
+    if sqlite_collection(path):
+        get_sqlite_store().save(path, data, default=default)
+    else:
+        atomic_write_json(path, data, indent=indent, default=default)
+
+
+def write_json(path: str, data: Any, indent: Optional[int] = 2, default: Optional[Callable] = None):
+    """Persist a collection atomically, or queue it if a write batch is active"""
+    batch = current_batch()
+    if batch is not None:
+        batch.mark_dirty(path, data, indent, default)
+        return
+    _persist(path, data, indent, default)
+
+
+def read_json(path: str, default_factory: Callable[[], Any] = list) -> Any:
+    """Load a collection, seeing this thread's unflushed batch writes first"""
+    batch = current_batch()
+    if batch is not None:
+        found, data = batch.get_pending(path)
+        if found:
+            return data
+    if sqlite_collection(path):
+        return get_sqlite_store().load(path, default_factory)
+    try:
+        return load_file(path)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return default_factory()
+
+
+def read_records(path: str, record_type: type) -> List[Any]:
+    """Load a collection decoded straight into record objects (see json_codec.decode_records)"""
+    batch = current_batch()
+    pending = batch is not None and batch.get_pending(path)[0]
+    if pending or sqlite_collection(path):
+        return convert_records(read_json(path), record_type)
+    try:
+        with open(path, 'rb') as f:
+            return decode_records(f.read(), record_type)
+    except FileNotFoundError:
+        return []
+
+
+def find_records(path: str, field: str, value: Any) -> List[Dict]:
+    """Get records where record[field] == value (an indexed lookup on the SQLite backend)"""
+    batch = current_batch()
+    pending = batch is not None and batch.get_pending(path)[0]
+    if sqlite_collection(path) and not pending:
+        return get_sqlite_store().find_by(path, field, value)
+    return [record for record in read_json(path) if isinstance(record, dict) and record.get(field) == value]
+
+
+def upsert_records(path: str, records: List[Dict], key_field: str = 'id', default: Optional[Callable] = None) -> int:
+    """Persist only the given records, matched to stored ones by key_field.
+
+    On the SQLite backend only those rows are written. JSON files have to be
+    rewritten, but the file is re-read first so records saved by other
+    workers are kept. Callers should hold file_lock(path).
+    """
+    if not records:
+        return 0
+    batch = current_batch()
+    pending = batch is not None and batch.get_pending(path)[0]
+    if sqlite_collection(path) and not pending:
+        return get_sqlite_store().upsert(path, records, key_field=key_field, default=default)
+
+    stored = read_json(path)
+    positions = {}
+    for position, record in enumerate(stored):
+        if isinstance(record, dict):
+            positions.setdefault(record.get(key_field), position)
+    for record in records:
+        position = positions.get(record.get(key_field))
+        if position is None:
+            positions[record.get(key_field)] = len(stored)
+            stored.append(record)
+        else:
+            stored[position] = record
+    write_json(path, stored, default=default)
+    return len(records)
+
+
+def collection_exists(path: str) -> bool:
+    """True if the collection exists in its backend (data file or SQLite table rows)"""
+    if sqlite_collection(path):
+        return get_sqlite_store().exists(path)
+    return os.path.exists(path)
+
+
+def _lock_file_path(path: str) -> str:
+    directory, filename = os.path.split(os.path.abspath(path))
+    return os.path.join(directory, LOCK_DIR_NAME, filename + '.lock')
+
+
+def _get_thread_lock(key: str) -> threading.RLock:
+    with _thread_locks_guard:
+        lock = _thread_locks.get(key)
+        if lock is None:
+            lock = threading.RLock()
+            _thread_locks[key] = lock
+        return lock
+
+
+def _held_locks() -> Dict[str, List]:
+    held = getattr(_local, 'held_locks', None)
+    if held is None:
+        held = {}
+        _local.held_locks = held
+    return held
+
+
+@contextmanager
+def file_lock(path: str):
+    """Hold an exclusive lock on a data file across threads and worker processes.
+
+    Uses an fcntl advisory lock on data/.locks/<file>.lock (so atomic renames
+    of the data file itself don't invalidate it) plus an in-process RLock.
+    Re-entrant on the same thread. If a write batch holds an unflushed write
+    for the file, the lock is handed to the batch and released only after
+    the batch flushes, so the next holder reads the new data.
+    """
+    key = os.path.abspath(path)
+    held = _held_locks()
+    if key in held:
+        held[key][1] += 1
+        try:
+            yield
+        finally:
+            held[key][1] -= 1
+        return
+
+    thread_lock = _get_thread_lock(key)
+    thread_lock.acquire()
+    fd = None
+    try:
+        if FCNTL_AVAILABLE:
+            lock_path = _lock_file_path(key)
+            os.makedirs(os.path.dirname(lock_path), exist_ok=True)
+            fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+            fcntl.flock(fd, fcntl.LOCK_EX)
+    except Exception:
+        _release_file_lock(key, fd, thread_lock)
+        raise
+
+    held[key] = [fd, 1]
+    retained = False
+    try:
+        yield
+        batch = current_batch()
+        if batch is not None and batch.has_pending(key):
+            batch.retain_lock(functools.partial(_release_file_lock, key, fd, thread_lock))
+            retained = True
+    finally:
+        if not retained:
+            _release_file_lock(key, fd, thread_lock)
+
+
+def _release_file_lock(key: str, fd: Optional[int], thread_lock: threading.RLock):
+    _held_locks().pop(key, None)
+    if fd is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        os.close(fd)
+    thread_lock.release()
+
+
+@contextmanager
+def file_locks(*paths: str):
+    """Lock several data files, always in sorted order to avoid deadlocks"""
+    with ExitStack() as stack:
+        for key in sorted({os.path.abspath(path) for path in paths}):
+            stack.enter_context(file_lock(key))
+        yield
+
+
+def with_file_lock(*path_attrs: str):
+    """Method decorator: hold the file locks named by instance attributes for the call.
+
+    Example: ``@with_file_lock('appointments_file')`` on a UnifiedScheduler
+    method locks ``self.appointments_file`` around its read-modify-write.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(self, *args, **kwargs):
+            with file_locks(*(getattr(self, attr) for attr in path_attrs)):
+                return func(self, *args, **kwargs)
+        return wrapper
+    return decorator
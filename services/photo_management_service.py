@@ -77,15 +77,16 @@ class PhotoManagementService:
             }
             
             # Save to photo database
-            photos = self.storage_service.load_data('job_photos.json')
-            photos.append(photo_record)
-            self.storage_service.save_data('job_photos.json', photos)
+            with self.storage_service.lock('job_photos.json'):
+                photos = self.storage_service.load_data('job_photos.json')
+                photos.append(photo_record)
+                self.storage_service.save_data('job_photos.json', photos)
             
-            return {
-                'success': True, 
-                'photo_id': photo_record['id'],
-                'filename': secure_name
-            }
+                return {
+                    'success': True, 
+                    'photo_id': photo_record['id'],
+                    'filename': secure_name
+                }
             
         except Exception as e:
             logging.error(f"Error uploading photo: {e}")
@@ -134,21 +135,22 @@ class PhotoManagementService:
     def set_cover_photo(self, photo_id: str, job_id: str) -> Dict:
         """Set a photo as the cover photo for a job"""
         try:
-            photos = self.storage_service.load_data('job_photos.json')
+            with self.storage_service.lock('job_photos.json'):
+                photos = self.storage_service.load_data('job_photos.json')
             
-            # Remove existing cover designation for this job
-            for photo in photos:
-                if photo.get('job_id') == job_id:
-                    photo['is_cover'] = False
+                # Remove existing cover designation for this job
+                for photo in photos:
+                    if photo.get('job_id') == job_id:
+                        photo['is_cover'] = False
             
-            # Set new cover photo
-            for photo in photos:
-                if photo.get('id') == photo_id:
-                    photo['is_cover'] = True
-                    break
+                # Set new cover photo
+                for photo in photos:
+                    if photo.get('id') == photo_id:
+                        photo['is_cover'] = True
+                        break
             
-            self.storage_service.save_data('job_photos.json', photos)
-            return {'success': True}
+                self.storage_service.save_data('job_photos.json', photos)
+                return {'success': True}
             
         except Exception as e:
             logging.error(f"Error setting cover photo: {e}")
@@ -157,30 +159,31 @@ class PhotoManagementService:
     def delete_photo(self, photo_id: str, staff_id: str) -> Dict:
         """Delete a photo (with permission check)"""
         try:
-            photos = self.storage_service.load_data('job_photos.json')
-            photo_to_delete = None
+            with self.storage_service.lock('job_photos.json'):
+                photos = self.storage_service.load_data('job_photos.json')
+                photo_to_delete = None
             
-            for i, photo in enumerate(photos):
-                if photo.get('id') == photo_id:
-                    photo_to_delete = photo
-                    # Remove from database
-                    photos.pop(i)
-                    break
+                for i, photo in enumerate(photos):
+                    if photo.get('id') == photo_id:
+                        photo_to_delete = photo
+                        # Remove from database
+                        photos.pop(i)
+                        break
             
-            if not photo_to_delete:
-                return {'success': False, 'error': 'Photo not found'}
+                if not photo_to_delete:
+                    return {'success': False, 'error': 'Photo not found'}
             
-            # Delete physical file
-            if os.path.exists(photo_to_delete['file_path']):
-                os.remove(photo_to_delete['file_path'])
+                # Delete physical file
+                if os.path.exists(photo_to_delete['file_path']):
+                    os.remove(photo_to_delete['file_path'])
             
-            # Save updated database
-            self.storage_service.save_data('job_photos.json', photos)
+                # Save updated database
+                self.storage_service.save_data('job_photos.json', photos)
             
-            # Log deletion
-            self._log_photo_action('delete', photo_id, staff_id)
+                # Log deletion
+                self._log_photo_action('delete', photo_id, staff_id)
             
-            return {'success': True}
+                return {'success': True}
             
         except Exception as e:
             logging.error(f"Error deleting photo: {e}")
@@ -189,17 +192,18 @@ class PhotoManagementService:
     def add_photo_note(self, photo_id: str, note: str, staff_id: str) -> Dict:
         """Add a note to a photo"""
         try:
-            photos = self.storage_service.load_data('job_photos.json')
+            with self.storage_service.lock('job_photos.json'):
+                photos = self.storage_service.load_data('job_photos.json')
             
-            for photo in photos:
-                if photo.get('id') == photo_id:
-                    photo['notes'] = note
-                    photo['last_modified'] = datetime.now().isoformat()
-                    photo['modified_by'] = staff_id
-                    break
+                for photo in photos:
+                    if photo.get('id') == photo_id:
+                        photo['notes'] = note
+                        photo['last_modified'] = datetime.now().isoformat()
+                        photo['modified_by'] = staff_id
+                        break
             
-            self.storage_service.save_data('job_photos.json', photos)
-            return {'success': True}
+                self.storage_service.save_data('job_photos.json', photos)
+                return {'success': True}
             
         except Exception as e:
             logging.error(f"Error adding photo note: {e}")
@@ -250,9 +254,10 @@ class PhotoManagementService:
                 'ip_address': None  # Could be added from request context
             }
             
-            logs = self.storage_service.load_data('photo_audit_log.json')
-            logs.append(log_entry)
-            self.storage_service.save_data('photo_audit_log.json', logs)
+            with self.storage_service.lock('photo_audit_log.json'):
+                logs = self.storage_service.load_data('photo_audit_log.json')
+                logs.append(log_entry)
+                self.storage_service.save_data('photo_audit_log.json', logs)
             
         except Exception as e:
             logging.error(f"Error logging photo action: {e}")
@@ -9,10 +9,11 @@ import hashlib
 import secrets
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
 
+from services.db_pool import db_connection
+
 class PortalService:
     """Professional portal management system for clients and staff"""
     
@@ -20,8 +21,8 @@ class PortalService:
         self.db_url = os.environ.get('DATABASE_URL')
         
     def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
+        """Borrow a pooled database connection (returned to the pool when the with-block exits)"""
+        return db_connection(cursor_factory=RealDictCursor)
     
     # Client Portal Methods
     def get_client_portal_overview(self, client_id: str) -> Dict[str, Any]:
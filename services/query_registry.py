@@ -0,0 +1,217 @@
+"""
+Query Registry for SPANKKS Construction
+Cached db.text() statements, per-query timing percentiles and slow-query EXPLAIN logging
+"""
+
+import hashlib
+import logging
+import os
+import re
+import sys
+import threading
+import time
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+# Executions slower than this are logged with their plan
+SLOW_QUERY_MS = float(os.environ.get('SLOW_QUERY_MS', '500'))
+# Recent durations kept per query for percentiles
+QUERY_METRICS_SAMPLES = int(os.environ.get('QUERY_METRICS_SAMPLES', '1024'))
+# A slow query's plan is logged at most once per this many seconds
+SLOW_QUERY_EXPLAIN_INTERVAL = 300
+# Distinct statements cached; beyond this (e.g. f-string SQL) db.text() builds uncached clauses
+QUERY_CACHE_MAX = 2000
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    if not ordered:
+        return 0.0
+    position = min(len(ordered) - 1, max(0, int(round(fraction * (len(ordered) - 1)))))
+    return ordered[position]
+
+
+class QueryStats:
+    """Call count, totals and a window of recent durations for one query"""
+
+    __slots__ = ('name', 'sql', 'calls', 'total_ms', 'max_ms', 'slow', 'samples', 'last_explained')
+
+    def __init__(self, name: str, sql: str):
+        self.name = name
+        self.sql = sql
+        self.calls = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.slow = 0
+        self.samples = deque(maxlen=QUERY_METRICS_SAMPLES)
+        self.last_explained = 0.0
+
+    def to_dict(self) -> Dict[str, Any]:
+        ordered = sorted(self.samples)
+        return {
+            'name': self.name,
+            'calls': self.calls,
+            'slow_calls': self.slow,
+            'mean_ms': round(self.total_ms / self.calls, 3) if self.calls else 0.0,
+            'p50_ms': round(_percentile(ordered, 0.50), 3),
+            'p95_ms': round(_percentile(ordered, 0.95), 3),
+            'p99_ms': round(_percentile(ordered, 0.99), 3),
+            'max_ms': round(self.max_ms, 3),
+            'total_ms': round(self.total_ms, 3),
+            'sql': self.sql[:300]
+        }
+
+
+class QueryRegistry:
+    """Builds each distinct db.text() statement once and times every execution.
+
+    install() makes ``db.text`` return cached TextClause objects named
+    after the function that first built them (e.g. ``api_jobs_list``), and
+    hooks engine cursor events so every statement - named or not - gets
+    timing stats. Statements over SLOW_QUERY_MS are logged together with
+    their EXPLAIN plan, fetched on a separate connection.
+    """
+
+    def __init__(self, slow_ms: float = SLOW_QUERY_MS):
+        self.slow_ms = slow_ms
+        self._statements: Dict[str, Any] = {}
+        self._names: Dict[int, str] = {}
+        self._stats: Dict[str, QueryStats] = {}
+        self._lock = threading.Lock()
+        self._installed = False
+
+    def install(self, db):
+        """Route db.text() through the cache and start timing statements on every engine"""
+        if self._installed:
+            return
+        from sqlalchemy import event
+        from sqlalchemy.engine import Engine
+
+        db.text = self.text
+        event.listen(Engine, 'before_cursor_execute', self._before_execute)
+        event.listen(Engine, 'after_cursor_execute', self._after_execute)
+        event.listen(Engine, 'handle_error', self._on_error)
+        self._installed = True
+
+    def text(self, sql: str, name: Optional[str] = None):
+        """Cached sqlalchemy.text(); name defaults to the calling function's name"""
+        clause = self._statements.get(sql)
+        if clause is not None:
+            return clause
+        from sqlalchemy import text
+
+        if name is None:
+            name = sys._getframe(1).f_code.co_name
+        with self._lock:
+            clause = self._statements.get(sql)
+            if clause is None:
+                clause = text(sql)
+                if len(self._statements) >= QUERY_CACHE_MAX:
+                    return clause
+                self._statements[sql] = clause
+                self._names[id(clause)] = self._unique_name(name, sql)
+        return clause
+
+    def register(self, name: str, sql: str):
+        """Pre-build a statement under an explicit name"""
+        return self.text(sql, name=name)
+
+    def get_metrics(self) -> List[Dict[str, Any]]:
+        """Per-query stats, most total time first"""
+        with self._lock:
+            stats = [entry.to_dict() for entry in self._stats.values()]
+        return sorted(stats, key=lambda entry: entry['total_ms'], reverse=True)
+
+    def reset_metrics(self):
+        with self._lock:
+            self._stats.clear()
+
+    # Engine event hooks
+    def _before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def _after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        started = conn.info.get('query_started')
+        if not started:
+            return
+        elapsed_ms = (time.perf_counter() - started.pop()) * 1000
+        name = self._statement_name(context, statement)
+        explain = False
+        with self._lock:
+            entry = self._stats.get(name)
+            if entry is None:
+                entry = QueryStats(name, _WHITESPACE.sub(' ', statement).strip())
+                self._stats[name] = entry
+            entry.calls += 1
+            entry.total_ms += elapsed_ms
+            entry.max_ms = max(entry.max_ms, elapsed_ms)
+            entry.samples.append(elapsed_ms)
+            if elapsed_ms >= self.slow_ms:
+                entry.slow += 1
+                now = time.monotonic()
+                if now - entry.last_explained >= SLOW_QUERY_EXPLAIN_INTERVAL:
+                    entry.last_explained = now
+                    explain = True
+
+        if elapsed_ms >= self.slow_ms:
+            logging.warning(f"Slow query {name}: {elapsed_ms:.0f}ms")
+            if explain and not executemany and self._explainable(statement):
+                threading.Thread(
+                    target=self._log_plan, args=(conn.engine, name, statement, parameters), daemon=True
+                ).start()
+
+    def _on_error(self, exception_context):
+        conn = exception_context.connection
+        if conn is not None and conn.info.get('query_started'):
+            conn.info['query_started'].pop()
+
+    # Internals
+    def _statement_name(self, context, statement: str) -> str:
+        compiled = getattr(context, 'compiled', None)
+        element = getattr(compiled, 'statement', None)
+        if element is not None:
+            name = self._names.get(id(element))
+            if name:
+                return name
+        return self._fingerprint(statement)
+
+    def _unique_name(self, name: str, sql: str) -> str:
+        # Several statements built in one function get a numbered suffix
+        taken = set(self._names.values())
+        if name not in taken:
+            return name
+        suffix = 2
+        while f"{name}#{suffix}" in taken:
+            suffix += 1
+        return f"{name}#{suffix}"
+
+    @staticmethod
+    def _fingerprint(statement: str) -> str:
+        normalized = _WHITESPACE.sub(' ', statement).strip()
+        digest = hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:8]
+        return f"sql:{normalized[:40]}…{digest}" if len(normalized) > 40 else f"sql:{normalized}"
+
+    @staticmethod
+    def _explainable(statement: str) -> bool:
+        return statement.lstrip().split(None, 1)[0].upper() in ('SELECT', 'WITH')
+
+    @staticmethod
+    def _log_plan(engine, name: str, statement: str, parameters):
+        try:
+            raw = engine.raw_connection()
+            try:
+                cursor = raw.cursor()
+                cursor.execute('EXPLAIN ' + statement, parameters)
+                plan = '\n'.join(row[0] for row in cursor.fetchall())
+                cursor.close()
+                raw.rollback()
+            finally:
+                raw.close()
+            logging.warning(f"Plan for slow query {name}:\n{plan}")
+        except Exception as e:
+            logging.warning(f"Could not EXPLAIN slow query {name}: {e}")
+
+
+# Global query registry instance
+query_registry = QueryRegistry()
@@ -3,12 +3,13 @@ Quote Acceptance and Workflow Automation Service for SPANKKS Construction
 Handles digital quote acceptance, automatic job creation, and workflow progression
 """
 
-import json
 import os
 import logging
 from datetime import datetime, timedelta
 import pytz
 from typing import Dict, List, Optional, Any
+from services.id_allocator import id_allocator, max_numeric_suffix
+from services.persistence import file_lock, read_json, write_json
 
 class QuoteAcceptanceService:
     """Service for handling quote acceptance and automatic workflow progression"""
@@ -31,20 +32,23 @@ class QuoteAcceptanceService:
     def _load_json_file(self, filename: str) -> List[Dict]:
         """Load data from JSON file"""
         filepath = os.path.join(self.data_dir, filename)
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
+        return read_json(filepath)
+    
+    def _lock(self, filename: str):
+        """Cross-process lock for a load-modify-save of one data file"""
+        return file_lock(os.path.join(self.data_dir, filename))
+    
+    def _next_id(self, sequence: str, filename: str) -> int:
+        """Allocate an integer record ID, seeded past the highest ID already in the file"""
+        return id_allocator.next_value(
+            sequence,
+            seed=lambda: max_numeric_suffix((r.get('id') for r in self._load_json_file(filename)), '') + 1)
     
     def _save_json_file(self, filename: str, data: List[Dict]) -> bool:
         """Save data to JSON file"""
         filepath = os.path.join(self.data_dir, filename)
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+            write_json(filepath, data)
             return True
         except Exception as e:
             self.logger.error(f"Error saving {filename}: {e}")
@@ -64,40 +68,41 @@ class QuoteAcceptanceService:
         """
         current_time = self._get_hawaii_time()
         
-        # Load quotes and find the target quote
-        quotes = self._load_json_file('quotes.json')
-        quote = None
-        quote_index = None
-        
-        for i, q in enumerate(quotes):
-            if q.get('id') == quote_id:
-                quote = q
-                quote_index = i
-                break
-        
-        if not quote:
-            return {
-                'success': False,
-                'error': 'Quote not found',
-                'quote_id': quote_id
-            }
-        
-        if quote.get('status') == 'accepted':
-            return {
-                'success': False,
-                'error': 'Quote already accepted',
-                'quote_id': quote_id
-            }
-        
-        # Update quote status to accepted
-        quote['status'] = 'accepted'
-        quote['accepted_date'] = current_time.strftime('%Y-%m-%d')
-        quote['accepted_time'] = current_time.strftime('%H:%M:%S')
-        quote['client_signature'] = client_signature
-        quote['acceptance_method'] = acceptance_method
-        
-        quotes[quote_index] = quote
-        self._save_json_file('quotes.json', quotes)
+        # Check-and-accept under the quotes lock so two workers can't both accept
+        with self._lock('quotes.json'):
+            quotes = self._load_json_file('quotes.json')
+            quote = None
+            quote_index = None
+            
+            for i, q in enumerate(quotes):
+                if q.get('id') == quote_id:
+                    quote = q
+                    quote_index = i
+                    break
+            
+            if not quote:
+                return {
+                    'success': False,
+                    'error': 'Quote not found',
+                    'quote_id': quote_id
+                }
+            
+            if quote.get('status') == 'accepted':
+                return {
+                    'success': False,
+                    'error': 'Quote already accepted',
+                    'quote_id': quote_id
+                }
+            
+            # Update quote status to accepted
+            quote['status'] = 'accepted'
+            quote['accepted_date'] = current_time.strftime('%Y-%m-%d')
+            quote['accepted_time'] = current_time.strftime('%H:%M:%S')
+            quote['client_signature'] = client_signature
+            quote['acceptance_method'] = acceptance_method
+            
+            quotes[quote_index] = quote
+            self._save_json_file('quotes.json', quotes)
         
         # Create automatic job from accepted quote
         job_details = self._create_job_from_quote(quote)
@@ -125,9 +130,7 @@ class QuoteAcceptanceService:
         """Create a job automatically from an accepted quote"""
         current_time = self._get_hawaii_time()
         
-        # Load existing jobs to get next ID
-        jobs = self._load_json_file('jobs.json')
-        next_job_id = max([j.get('id', 0) for j in jobs], default=0) + 1
+        next_job_id = self._next_id('job_number', 'jobs.json')
         
         # Create job record
         job = {
@@ -154,8 +157,10 @@ class QuoteAcceptanceService:
             }
         }
         
-        jobs.append(job)
-        self._save_json_file('jobs.json', jobs)
+        with self._lock('jobs.json'):
+            jobs = self._load_json_file('jobs.json')
+            jobs.append(job)
+            self._save_json_file('jobs.json', jobs)
         
         # Update contact job history
         self._update_contact_job_history(quote['contact_id'], next_job_id)
@@ -171,9 +176,7 @@ class QuoteAcceptanceService:
         """Create an invoice automatically from an accepted quote"""
         current_time = self._get_hawaii_time()
         
-        # Load existing invoices to get next ID
-        invoices = self._load_json_file('invoices.json')
-        next_invoice_id = max([i.get('id', 0) for i in invoices], default=0) + 1
+        next_invoice_id = self._next_id('invoice_number', 'invoices.json')
         
         # Calculate Hawaii GET tax (4.712%)
         subtotal = quote['total_amount']
@@ -199,8 +202,10 @@ class QuoteAcceptanceService:
             'payment_history': []
         }
         
-        invoices.append(invoice)
-        self._save_json_file('invoices.json', invoices)
+        with self._lock('invoices.json'):
+            invoices = self._load_json_file('invoices.json')
+            invoices.append(invoice)
+            self._save_json_file('invoices.json', invoices)
         
         return {
             'invoice_id': next_invoice_id,
@@ -244,22 +249,23 @@ class QuoteAcceptanceService:
     
     def _update_contact_job_history(self, contact_id: int, job_id: int):
         """Update contact's job history with new job"""
-        contacts = self._load_json_file('contacts.json')
-        
-        for contact in contacts:
-            if contact.get('id') == contact_id:
-                if 'job_history' not in contact:
-                    contact['job_history'] = []
-                contact['job_history'].append(job_id)
-                contact['last_contact'] = self._get_hawaii_time().strftime('%Y-%m-%d')
-                break
-        
-        self._save_json_file('contacts.json', contacts)
+        with self._lock('contacts.json'):
+            contacts = self._load_json_file('contacts.json')
+            
+            for contact in contacts:
+                if contact.get('id') == contact_id:
+                    if 'job_history' not in contact:
+                        contact['job_history'] = []
+                    contact['job_history'].append(job_id)
+                    contact['last_contact'] = self._get_hawaii_time().strftime('%Y-%m-%d')
+                    break
+            
+            self._save_json_file('contacts.json', contacts)
     
     def _schedule_job_reminders(self, job_id: int, contact_id: int):
         """Schedule automatic reminders for job follow-up"""
         current_time = self._get_hawaii_time()
-        reminders = self._load_json_file('reminders.json')
+        new_reminders = []
         
         # Schedule reminders at different intervals
         reminder_schedule = [
@@ -272,7 +278,7 @@ class QuoteAcceptanceService:
             reminder_date = current_time + timedelta(days=reminder_config['days'])
             
             reminder = {
-                'id': len(reminders) + 1,
+                'id': self._next_id('reminder_number', 'reminders.json'),
                 'job_id': job_id,
                 'contact_id': contact_id,
                 'type': reminder_config['type'],
@@ -283,9 +289,12 @@ class QuoteAcceptanceService:
                 'created_date': current_time.strftime('%Y-%m-%d')
             }
             
-            reminders.append(reminder)
+            new_reminders.append(reminder)
         
-        self._save_json_file('reminders.json', reminders)
+        with self._lock('reminders.json'):
+            reminders = self._load_json_file('reminders.json')
+            reminders.extend(new_reminders)
+            self._save_json_file('reminders.json', reminders)
     
     def _log_quote_acceptance(self, quote_id: int, client_signature: str, acceptance_method: str):
         """Log quote acceptance activity for audit trail"""
@@ -293,8 +302,6 @@ class QuoteAcceptanceService:
         
         # Load or create activity log
         log_file = 'quote_acceptance_log.json'
-        activity_log = self._load_json_file(log_file)
-        
         log_entry = {
             'timestamp': current_time.strftime('%Y-%m-%d %H:%M:%S'),
             'quote_id': quote_id,
@@ -305,8 +312,10 @@ class QuoteAcceptanceService:
             'user_agent': 'SPANKKS Construction System'
         }
         
-        activity_log.append(log_entry)
-        self._save_json_file(log_file, activity_log)
+        with self._lock(log_file):
+            activity_log = self._load_json_file(log_file)
+            activity_log.append(log_entry)
+            self._save_json_file(log_file, activity_log)
         
         self.logger.info(f"Quote {quote_id} accepted by {client_signature} via {acceptance_method}")
     
@@ -3,12 +3,26 @@ Real-Time Availability Scheduler for SPANKKS Construction
 Provides exact time slot booking with immediate confirmation
 """
 
-import json
 import os
 import logging
+import threading
+import time
+from array import array
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Tuple
 import pytz
+from services.persistence import read_json, with_file_lock, write_json
+from services.sqlite_store import sqlite_collection
+
+# Width of one availability grid cell; slot start times fall on this grid
+GRID_CELL_MINUTES = 15
+GRID_CELLS_PER_DAY = 24 * 60 // GRID_CELL_MINUTES
+# Seconds the grid is trusted before bookings are re-read (other workers may have booked;
+# JSON-backed bookings are also re-read as soon as the file changes)
+BOOKING_GRID_TTL = float(os.environ.get('BOOKING_GRID_TTL', '60'))
+# Longest horizon the booking widget can ask for in one call
+MAX_AVAILABILITY_DAYS = 90
+ACTIVE_BOOKING_STATUSES = ('confirmed', 'tentative')
 
 class RealTimeScheduler:
     """Real-time availability checking and booking system"""
@@ -28,6 +42,13 @@ class RealTimeScheduler:
         }
         self.slot_duration = 60  # 60 minutes per appointment
         self.buffer_time = 30   # 30 minutes travel time between appointments
+        
+        # Booking grid: date -> per-cell count of active bookings blocking a slot start there
+        self._grid: Optional[Dict[str, array]] = None
+        self._grid_signature = None
+        self._grid_loaded_at = 0.0
+        self._grid_lock = threading.RLock()
+        self._day_slots: Dict[str, List[str]] = {}
         self._ensure_data_files()
     
     def _ensure_data_files(self):
@@ -35,27 +56,101 @@ class RealTimeScheduler:
         os.makedirs('data', exist_ok=True)
         
         if not os.path.exists(self.availability_file):
-            with open(self.availability_file, 'w') as f:
-                json.dump({}, f, indent=2)
+            write_json(self.availability_file, {})
         
         if not os.path.exists(self.bookings_file):
-            with open(self.bookings_file, 'w') as f:
-                json.dump([], f, indent=2)
+            write_json(self.bookings_file, [])
     
     def _load_bookings(self) -> List[Dict]:
         """Load existing bookings"""
-        try:
-            with open(self.bookings_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return read_json(self.bookings_file)
     
+    @with_file_lock('bookings_file')
     def _save_booking(self, booking: Dict):
         """Save new booking"""
         bookings = self._load_bookings()
         bookings.append(booking)
-        with open(self.bookings_file, 'w') as f:
-            json.dump(bookings, f, indent=2)
+        write_json(self.bookings_file, bookings)
+        self._update_grid(booking, 1)
+    
+    # Booking grid
+    def _bookings_signature(self):
+        """Changes whenever the JSON bookings file is rewritten (None on the SQLite backend)"""
+        if sqlite_collection(self.bookings_file):
+            return None
+        try:
+            stat_result = os.stat(self.bookings_file)
+        except OSError:
+            return None
+        return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+    
+    def _blocked_cells(self, time_str: str) -> range:
+        """Grid cells where a slot can't start because of a booking at time_str (booking + buffer)"""
+        booked_minutes = self._time_to_minutes(time_str)
+        reach = self.slot_duration + self.buffer_time
+        first = (booked_minutes - reach) // GRID_CELL_MINUTES + 1
+        last = -(-(booked_minutes + reach) // GRID_CELL_MINUTES) - 1
+        return range(max(0, first), min(GRID_CELLS_PER_DAY - 1, last) + 1)
+    
+    def _refresh_grid(self, force: bool = False):
+        """Build the grid from one load of the bookings unless the current one is still valid"""
+        with self._grid_lock:
+            signature = self._bookings_signature()
+            if (not force and self._grid is not None and signature == self._grid_signature
+                    and time.monotonic() - self._grid_loaded_at < BOOKING_GRID_TTL):
+                return
+            grid: Dict[str, array] = {}
+            for booking in self._load_bookings():
+                if booking.get('status') in ACTIVE_BOOKING_STATUSES and booking.get('date') and booking.get('time'):
+                    self._mark(grid, booking, 1)
+            self._grid = grid
+            self._grid_signature = signature
+            self._grid_loaded_at = time.monotonic()
+    
+    def _mark(self, grid: Dict[str, array], booking: Dict, delta: int):
+        cells = grid.get(booking['date'])
+        if cells is None:
+            cells = grid[booking['date']] = array('H', bytes(2 * GRID_CELLS_PER_DAY))
+        for cell in self._blocked_cells(booking['time']):
+            cells[cell] = max(0, cells[cell] + delta)
+    
+    def _update_grid(self, booking: Dict, delta: int):
+        """Apply this worker's own booking (+1) or cancellation (-1) without re-reading the file"""
+        with self._grid_lock:
+            if self._grid is None or not booking.get('date') or not booking.get('time'):
+                return
+            self._mark(self._grid, booking, delta)
+            self._grid_signature = self._bookings_signature()
+    
+    def _slots_for_day(self, day_name: str) -> List[str]:
+        """Offered slot times for a weekday (business hours minus lunch), computed once"""
+        slots = self._day_slots.get(day_name)
+        if slots is None:
+            business_hours = self.business_hours[day_name]
+            slots = self._generate_slots(business_hours) if business_hours['start'] is not None else []
+            self._day_slots[day_name] = slots
+        return slots
+    
+    def _open_slots(self, date_obj, cutoff: datetime) -> List[str]:
+        """Slot times on a date that are unbooked and after the notice cutoff (grid must be fresh)"""
+        date_str = date_obj.strftime('%Y-%m-%d')
+        slots = self._slots_for_day(date_obj.strftime('%A').lower())
+        if not slots:
+            return []
+        cells = self._grid.get(date_str)
+        open_slots = []
+        for slot in slots:
+            if cells is not None and cells[self._time_to_minutes(slot) // GRID_CELL_MINUTES]:
+                continue
+            # Don't allow booking in the past
+            slot_datetime = self.hawaii_tz.localize(datetime.strptime(f"{date_str} {slot}", '%Y-%m-%d %H:%M'))
+            if slot_datetime <= cutoff:
+                continue
+            open_slots.append(slot)
+        return open_slots
+    
+    def _booking_cutoff(self) -> datetime:
+        return self._get_hawaii_time() + timedelta(hours=2)  # 2-hour minimum notice
     
     def _get_hawaii_time(self) -> datetime:
         """Get current Hawaii time"""
@@ -74,20 +169,24 @@ class RealTimeScheduler:
     
     def get_available_dates(self, days_ahead: int = 14) -> List[str]:
         """Get list of available dates for the next N days"""
-        available_dates = []
+        return [day['date'] for day in self.get_availability(days_ahead)]
+    
+    def get_availability(self, days_ahead: int = MAX_AVAILABILITY_DAYS) -> List[Dict]:
+        """Open slots for every bookable date from tomorrow over the next N days, from one grid lookup"""
         current_date = self._get_hawaii_time().date()
-        
-        for i in range(1, days_ahead + 1):  # Start from tomorrow
-            check_date = current_date + timedelta(days=i)
-            day_name = check_date.strftime('%A').lower()
-            
-            # Check if business is open on this day
-            if self.business_hours[day_name]['start'] is not None:
-                # Check if there are any available slots
-                if self._has_available_slots(check_date.strftime('%Y-%m-%d')):
-                    available_dates.append(check_date.strftime('%Y-%m-%d'))
-        
-        return available_dates
+        cutoff = self._booking_cutoff()
+        availability = []
+        with self._grid_lock:
+            self._refresh_grid()
+            for i in range(1, days_ahead + 1):  # Start from tomorrow
+                check_date = current_date + timedelta(days=i)
+                slots = self._open_slots(check_date, cutoff)
+                if slots:
+                    availability.append({
+                        'date': check_date.strftime('%Y-%m-%d'),
+                        'slots': [{'time': slot, 'display_time': self._format_display_time(slot)} for slot in slots]
+                    })
+        return availability
     
     def _has_available_slots(self, date_str: str) -> bool:
         """Check if a date has any available time slots"""
@@ -98,34 +197,15 @@ class RealTimeScheduler:
         """Get available time slots for a specific date"""
         try:
             date_obj = datetime.strptime(date_str, '%Y-%m-%d').date()
-            day_name = date_obj.strftime('%A').lower()
-            
-            # Check if business is open
-            business_hours = self.business_hours[day_name]
-            if business_hours['start'] is None:
-                return []
-            
-            # Generate all possible slots
-            all_slots = self._generate_slots(business_hours)
+            with self._grid_lock:
+                self._refresh_grid()
+                open_slots = self._open_slots(date_obj, self._booking_cutoff())
             
-            # Get existing bookings for this date
-            bookings = self._load_bookings()
-            booked_slots = [
-                booking['time'] for booking in bookings 
-                if booking['date'] == date_str and booking['status'] in ['confirmed', 'tentative']
-            ]
-            
-            # Filter out booked slots and add buffer time
-            available_slots = []
-            for slot in all_slots:
-                if self._is_slot_available(slot, booked_slots, date_str):
-                    available_slots.append({
-                        'time': slot,
-                        'display_time': self._format_display_time(slot),
-                        'available': True
-                    })
-            
-            return available_slots
+            return [{
+                'time': slot,
+                'display_time': self._format_display_time(slot),
+                'available': True
+            } for slot in open_slots]
             
         except Exception as e:
             logging.error(f"Error getting available slots for {date_str}: {e}")
@@ -156,27 +236,6 @@ class RealTimeScheduler:
         
         return slots
     
-    def _is_slot_available(self, slot: str, booked_slots: List[str], date_str: str) -> bool:
-        """Check if a specific slot is available considering buffer time"""
-        slot_minutes = self._time_to_minutes(slot)
-        
-        for booked_slot in booked_slots:
-            booked_minutes = self._time_to_minutes(booked_slot)
-            
-            # Check if slot conflicts with existing booking + buffer
-            if abs(slot_minutes - booked_minutes) < (self.slot_duration + self.buffer_time):
-                return False
-        
-        # Don't allow booking in the past
-        current_time = self._get_hawaii_time()
-        slot_datetime = datetime.strptime(f"{date_str} {slot}", '%Y-%m-%d %H:%M')
-        slot_datetime = self.hawaii_tz.localize(slot_datetime)
-        
-        if slot_datetime <= current_time + timedelta(hours=2):  # 2-hour minimum notice
-            return False
-        
-        return True
-    
     def _format_display_time(self, time_str: str) -> str:
         """Format time for display (12-hour format)"""
         hour, minute = map(int, time_str.split(':'))
@@ -189,6 +248,7 @@ class RealTimeScheduler:
         else:
             return f"{hour-12}:{minute:02d} PM"
     
+    @with_file_lock('bookings_file')
     def book_appointment(self, booking_data: Dict) -> Dict:
         """Book an appointment with real-time validation"""
         try:
@@ -205,7 +265,8 @@ class RealTimeScheduler:
                     'error': 'Date and time are required'
                 }
             
-            # Validate slot is still available
+            # Validate slot is still available against a fresh read (other workers may have booked it)
+            self._refresh_grid(force=True)
             available_slots = self.get_available_slots(str(date))
             available_times = [slot['time'] for slot in available_slots]
             
@@ -263,17 +324,21 @@ class RealTimeScheduler:
                 return booking
         return None
     
+    @with_file_lock('bookings_file')
     def cancel_booking(self, booking_id: str) -> bool:
         """Cancel a booking and free up the time slot"""
         try:
+            self._refresh_grid()
             bookings = self._load_bookings()
             for booking in bookings:
                 if booking.get('id') == booking_id:
+                    was_active = booking.get('status') in ACTIVE_BOOKING_STATUSES
                     booking['status'] = 'cancelled'
                     booking['cancelled_at'] = datetime.now().isoformat()
                     
-                    with open(self.bookings_file, 'w') as f:
-                        json.dump(bookings, f, indent=2)
+                    write_json(self.bookings_file, bookings)
+                    if was_active:
+                        self._update_grid(booking, -1)
                     return True
             return False
             
@@ -297,4 +362,8 @@ class RealTimeScheduler:
             'booked_slots': len(day_bookings),
             'bookings': sorted(day_bookings, key=lambda x: x['time']),
             'available_times': available_slots
-        }
\ No newline at end of file
+        }
+
+
+# Global instance
+real_time_scheduler = RealTimeScheduler()
@@ -0,0 +1,117 @@
+"""
+Recurrence Rules for SPANKKS Construction scheduling
+RRULE-style weekly, biweekly, monthly and nth-weekday series expanded lazily
+"""
+
+import calendar
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import islice
+from typing import Dict, Iterator, List, Optional
+
+# Upper bound on one series, e.g. a weekly plan for ten years
+MAX_RECURRING_OCCURRENCES = 520
+
+WEEKDAYS = ['monday', 'tuesday', 'wednesday', 'thursday', 'friday', 'saturday', 'sunday']
+FREQUENCIES = ('daily', 'weekly', 'biweekly', 'monthly', 'nth_weekday', 'custom')
+
+
+@dataclass
+class RecurrenceRule:
+    """When a series repeats.
+
+    frequency: daily, weekly, biweekly (weekly with interval 2), monthly
+    (same day of month, clamped to short months), nth_weekday (e.g. the 2nd
+    Tuesday, or nth=-1 for the last one, every `interval` months) or
+    custom (every `custom_days` days). Occurrences come after the start
+    date and stop after `count` dates or past `until`, whichever is first.
+    """
+    frequency: str = 'weekly'
+    interval: int = 1
+    count: int = 12
+    until: Optional[date] = None
+    weekday: Optional[int] = None  # 0 = Monday; nth_weekday defaults to the start date's weekday
+    nth: Optional[int] = None  # 1-5 or -1; nth_weekday defaults to the start date's week of the month
+    custom_days: int = 7
+
+    def __post_init__(self):
+        if self.frequency not in FREQUENCIES:
+            raise ValueError(f"Unsupported frequency: {self.frequency}")
+        if self.interval < 1 or self.custom_days < 1:
+            raise ValueError("interval and custom_days must be at least 1")
+        if self.nth is not None and self.nth not in (-1, 1, 2, 3, 4, 5):
+            raise ValueError("nth must be 1-5 or -1 (last)")
+        self.count = max(0, min(self.count, MAX_RECURRING_OCCURRENCES))
+
+    @classmethod
+    def from_config(cls, config: Dict) -> 'RecurrenceRule':
+        """Build a rule from create_recurring_appointments' recurring_config dict"""
+        weekday = config.get('weekday')
+        if isinstance(weekday, str):
+            weekday = WEEKDAYS.index(weekday.strip().lower())
+        until = config.get('end_date')
+        if isinstance(until, str) and until:
+            until = datetime.strptime(until, '%Y-%m-%d').date()
+        nth = config.get('nth', config.get('week_of_month'))
+        return cls(
+            frequency=config.get('frequency', 'weekly'),
+            interval=int(config.get('interval', 1)),
+            count=int(config.get('max_occurrences', 12)),
+            until=until or None,
+            weekday=weekday,
+            nth=int(nth) if nth is not None else None,
+            custom_days=int(config.get('custom_days', 7))
+        )
+
+    def occurrences(self, start: date) -> Iterator[date]:
+        """Occurrence dates after `start`, generated on demand"""
+        return islice(self._until(self._candidates(start)), self.count)
+
+    def expand(self, start: date) -> List[date]:
+        return list(self.occurrences(start))
+
+    def _until(self, dates: Iterator[date]) -> Iterator[date]:
+        for occurrence in dates:
+            if self.until and occurrence > self.until:
+                return
+            yield occurrence
+
+    def _candidates(self, start: date) -> Iterator[date]:
+        step = 1
+        while True:
+            if self.frequency == 'daily':
+                yield start + timedelta(days=self.interval * step)
+            elif self.frequency in ('weekly', 'biweekly'):
+                weeks = self.interval * (2 if self.frequency == 'biweekly' else 1)
+                yield start + timedelta(weeks=weeks * step)
+            elif self.frequency == 'custom':
+                yield start + timedelta(days=self.custom_days * step)
+            else:
+                year, month = _add_months(start.year, start.month, self.interval * step)
+                if self.frequency == 'monthly':
+                    yield date(year, month, min(start.day, calendar.monthrange(year, month)[1]))
+                else:
+                    occurrence = _nth_weekday(
+                        year, month,
+                        self.weekday if self.weekday is not None else start.weekday(),
+                        self.nth if self.nth is not None else (start.day - 1) // 7 + 1
+                    )
+                    if occurrence is not None:  # e.g. no 5th Tuesday that month
+                        yield occurrence
+            step += 1
+
+
+def _add_months(year: int, month: int, months: int):
+    index = year * 12 + (month - 1) + months
+    return index // 12, index % 12 + 1
+
+
+def _nth_weekday(year: int, month: int, weekday: int, nth: int) -> Optional[date]:
+    """The nth (or last, nth=-1) given weekday of a month, None if the month has no such day"""
+    days_in_month = calendar.monthrange(year, month)[1]
+    if nth == -1:
+        last = date(year, month, days_in_month)
+        return last - timedelta(days=(last.weekday() - weekday) % 7)
+    first = date(year, month, 1)
+    day = 1 + (weekday - first.weekday()) % 7 + 7 * (nth - 1)
+    return date(year, month, day) if day <= days_in_month else None
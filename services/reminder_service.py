@@ -3,12 +3,12 @@ Reminder Service for SPANKKS Construction
 Handles automated email and SMS reminders for appointments and payments
 """
 
-import json
 import logging
 import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import pytz
+from services.persistence import read_json, with_file_lock, write_json
 
 class ReminderService:
     """Automated reminder system for appointments and payments"""
@@ -23,8 +23,7 @@ class ReminderService:
         os.makedirs('data', exist_ok=True)
         
         if not os.path.exists(self.reminders_file):
-            with open(self.reminders_file, 'w') as f:
-                json.dump([], f, indent=2)
+            write_json(self.reminders_file, [])
     
     def schedule_appointment_reminders(self, appointment_data: Dict) -> Dict:
         """Schedule automated reminders for an appointment"""
@@ -170,6 +169,7 @@ class ReminderService:
             logging.error(f"Error getting pending reminders: {e}")
             return []
     
+    @with_file_lock('reminders_file')
     def mark_reminder_sent(self, reminder_id: str) -> bool:
         """Mark a reminder as sent"""
         try:
@@ -181,8 +181,7 @@ class ReminderService:
                     reminder['sent_date'] = datetime.now().isoformat()
                     break
             
-            with open(self.reminders_file, 'w') as f:
-                json.dump(reminders, f, indent=2)
+            write_json(self.reminders_file, reminders)
             
             return True
             
@@ -344,12 +343,9 @@ Licensed & Insured in Hawaii
     
     def _load_reminders(self) -> List[Dict]:
         """Load reminders from JSON file"""
-        try:
-            with open(self.reminders_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return read_json(self.reminders_file)
     
+    @with_file_lock('reminders_file')
     def _save_reminders(self, new_reminders: List[Dict]):
         """Save new reminders to JSON file"""
         existing_reminders = self._load_reminders()
@@ -359,8 +355,7 @@ Licensed & Insured in Hawaii
         if len(existing_reminders) > 1000:
             existing_reminders = existing_reminders[-1000:]
         
-        with open(self.reminders_file, 'w') as f:
-            json.dump(existing_reminders, f, indent=2)
+        write_json(self.reminders_file, existing_reminders)
 
 # Initialize global reminder service
 reminder_service = ReminderService()
\ No newline at end of file
@@ -0,0 +1,327 @@
+"""
+Schema Migration Service for SPANKKS Construction
+Versioned migrations for the raw-SQL tables db.create_all() doesn't manage,
+plus index verification and a query -> index usage report
+"""
+
+import logging
+import sys
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# pg advisory lock key so concurrent workers don't migrate at the same time
+_MIGRATION_LOCK_KEY = 0x4D4947
+
+
+@dataclass
+class IndexSpec:
+    """One index: columns may be plain names or parenthesized expressions"""
+    name: str
+    table: str
+    columns: List[str]
+    # Columns that must exist (and for expression indexes, be timestamp/date without time zone)
+    requires: List[str] = field(default_factory=list)
+    expression: bool = False
+
+    def create_sql(self) -> str:
+        # CONCURRENTLY keeps the table writable during the build (must run outside a transaction)
+        return f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {self.name} ON {self.table} ({', '.join(self.columns)})"
+
+
+@dataclass
+class Migration:
+    version: int
+    name: str
+    indexes: List[IndexSpec] = field(default_factory=list)
+    # Each statement autocommits, so write them to be safe to rerun (IF NOT EXISTS etc.)
+    statements: List[str] = field(default_factory=list)
+
+
+MIGRATIONS: List[Migration] = [
+    Migration(1, 'admin_and_portal_query_indexes', indexes=[
+        IndexSpec('idx_jobs_client_id_created', 'jobs', ['client_id', 'timestamp_created DESC'],
+                  requires=['client_id', 'timestamp_created']),
+        IndexSpec('idx_jobs_scheduled_date', 'jobs', ['scheduled_date'], requires=['scheduled_date']),
+        IndexSpec('idx_jobs_status', 'jobs', ['status'], requires=['status']),
+        IndexSpec('idx_jobs_timestamp_created', 'jobs', ['timestamp_created'], requires=['timestamp_created']),
+        IndexSpec('idx_quotes_client_id_created', 'quotes', ['client_id', 'created_at DESC'],
+                  requires=['client_id', 'created_at']),
+        IndexSpec('idx_quotes_created_at', 'quotes', ['created_at'], requires=['created_at']),
+        IndexSpec('idx_invoices_client_id_status', 'invoices', ['client_id', 'status'],
+                  requires=['client_id', 'status']),
+        IndexSpec('idx_invoices_status', 'invoices', ['status'], requires=['status']),
+        IndexSpec('idx_payments_payment_date', 'payments', ['payment_date'], requires=['payment_date']),
+        IndexSpec('idx_payments_client_id', 'payments', ['client_id'], requires=['client_id']),
+    ]),
+    Migration(2, 'month_truncation_expression_indexes', indexes=[
+        IndexSpec('idx_jobs_created_month', 'jobs', ["(DATE_TRUNC('month', timestamp_created))"],
+                  requires=['timestamp_created'], expression=True),
+        IndexSpec('idx_quotes_created_month', 'quotes', ["(DATE_TRUNC('month', created_at))"],
+                  requires=['created_at'], expression=True),
+        IndexSpec('idx_payments_payment_month', 'payments', ["(DATE_TRUNC('month', payment_date))"],
+                  requires=['payment_date'], expression=True),
+    ]),
+    Migration(3, 'portal_job_detail_indexes', indexes=[
+        IndexSpec('idx_invoices_client_id_created', 'invoices', ['client_id', 'created_at DESC'],
+                  requires=['client_id', 'created_at']),
+        IndexSpec('idx_job_photos_job_id_uploaded', 'job_photos', ['job_id', 'uploaded_at DESC'],
+                  requires=['job_id', 'uploaded_at']),
+        IndexSpec('idx_job_notes_job_id_created', 'job_notes', ['job_id', 'created_at DESC'],
+                  requires=['job_id', 'created_at']),
+        IndexSpec('idx_materials_used_job_id', 'materials_used', ['job_id'], requires=['job_id']),
+        IndexSpec('idx_staff_timeclock_job_staff', 'staff_timeclock', ['job_id', 'staff_id', 'clock_in DESC'],
+                  requires=['job_id', 'staff_id', 'clock_in']),
+    ]),
+]
+
+# Representative statements from the admin/API/portal code and the indexes meant to serve them
+QUERY_INDEX_MAP: List[Tuple[str, str, List[str]]] = [
+    ('routes_admin.admin_crm: per-client job stats and most recent job',
+     "SELECT DISTINCT ON (client_id) client_id, service_type FROM jobs ORDER BY client_id, timestamp_created DESC",
+     ['idx_jobs_client_id_created']),
+    ('portal_service: client jobs',
+     "SELECT job_id FROM jobs WHERE client_id = 'CLI001' ORDER BY scheduled_date DESC",
+     ['idx_jobs_client_id_created']),
+    ('routes_api: calendar events by scheduled date',
+     "SELECT job_id FROM jobs WHERE scheduled_date >= CURRENT_DATE AND scheduled_date < CURRENT_DATE + 7",
+     ['idx_jobs_scheduled_date']),
+    ('routes_admin / routes.get_dashboard_stats: jobs by status',
+     "SELECT COUNT(*) FROM jobs WHERE status = 'completed'",
+     ['idx_jobs_status']),
+    ('routes.get_dashboard_stats: recent jobs',
+     "SELECT job_id FROM jobs ORDER BY timestamp_created DESC LIMIT 5",
+     ['idx_jobs_timestamp_created']),
+    ('routes_admin.admin_performance (legacy): jobs this month',
+     "SELECT COUNT(*) FROM jobs WHERE DATE_TRUNC('month', timestamp_created) = DATE_TRUNC('month', CURRENT_DATE)",
+     ['idx_jobs_created_month']),
+    ('kpi_rollup_service: jobs for a day range',
+     "SELECT COUNT(*) FROM jobs WHERE timestamp_created >= CURRENT_DATE AND timestamp_created < CURRENT_DATE + 1",
+     ['idx_jobs_timestamp_created']),
+    ('portal_service: client quotes',
+     "SELECT quote_number FROM quotes WHERE client_id = 'CLI001' ORDER BY created_at DESC",
+     ['idx_quotes_client_id_created']),
+    ('routes_admin.admin_performance (legacy): quote conversion this month',
+     "SELECT COUNT(*) FROM quotes WHERE DATE_TRUNC('month', created_at) = DATE_TRUNC('month', CURRENT_DATE)",
+     ['idx_quotes_created_month']),
+    ('routes_admin.admin_crm: paid revenue per client',
+     "SELECT client_id, SUM(total_paid) FROM invoices WHERE client_id = 'CLI001' AND status = 'paid' GROUP BY client_id",
+     ['idx_invoices_client_id_status']),
+    ('routes_admin: outstanding invoices',
+     "SELECT COUNT(*) FROM invoices WHERE status IN ('unsent', 'sent', 'overdue', 'pending')",
+     ['idx_invoices_status']),
+    ('portal_service: client invoices',
+     "SELECT invoice_id FROM invoices WHERE client_id = 'CLI001' ORDER BY created_at DESC",
+     ['idx_invoices_client_id_created']),
+    ('routes_admin.admin_performance (legacy): revenue this month',
+     "SELECT SUM(amount_paid) FROM payments WHERE DATE_TRUNC('month', payment_date) = DATE_TRUNC('month', CURRENT_DATE)",
+     ['idx_payments_payment_month']),
+    ('kpi_rollup_service: payments for a day range',
+     "SELECT SUM(amount_paid) FROM payments WHERE payment_date >= CURRENT_DATE AND payment_date < CURRENT_DATE + 1",
+     ['idx_payments_payment_date']),
+    ('portal_service: job photos',
+     "SELECT id FROM job_photos WHERE job_id = 'J2025-001' ORDER BY uploaded_at DESC",
+     ['idx_job_photos_job_id_uploaded']),
+    ('portal_service: job notes',
+     "SELECT id FROM job_notes WHERE job_id = 'J2025-001' ORDER BY created_at DESC",
+     ['idx_job_notes_job_id_created']),
+]
+
+_EXPRESSION_TYPES = ('timestamp without time zone', 'date')
+
+
+class SchemaMigrationService:
+    """Applies MIGRATIONS in version order and records them in schema_migrations.
+
+    Index migrations skip tables or columns that don't exist yet (the raw
+    SQL tables are created outside the ORM); verify() reports them and
+    repair() creates any index that is still missing. Indexes are built
+    CONCURRENTLY on an autocommit connection, so a migration is recorded
+    only once all of its indexes exist and a rerun picks up where a failed
+    one stopped.
+    """
+
+    def __init__(self, migrations: Optional[List[Migration]] = None):
+        self.migrations = sorted(migrations or MIGRATIONS, key=lambda migration: migration.version)
+
+    def migrate(self, engine) -> List[int]:
+        """Apply pending migrations; returns the versions applied"""
+        from sqlalchemy import text
+
+        applied = []
+        with self._migration_connection(engine) as conn:
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version INTEGER PRIMARY KEY,
+                    name VARCHAR(200) NOT NULL,
+                    applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+                )
+            """))
+            done = {row[0] for row in conn.execute(text("SELECT version FROM schema_migrations"))}
+
+            for migration in self.migrations:
+                if migration.version in done:
+                    continue
+                for statement in migration.statements:
+                    conn.execute(text(statement))
+                for index in migration.indexes:
+                    skip_reason = self._skip_reason(conn, index)
+                    if skip_reason:
+                        logging.warning(f"Migration {migration.version}: skipped {index.name} ({skip_reason})")
+                        continue
+                    self._create_index(conn, index)
+                conn.execute(text("""
+                    INSERT INTO schema_migrations (version, name) VALUES (:version, :name)
+                """), {'version': migration.version, 'name': migration.name})
+                applied.append(migration.version)
+                logging.info(f"Applied schema migration {migration.version}: {migration.name}")
+        return applied
+
+    def verify(self, engine) -> List[Dict]:
+        """Check every declared index; one entry per index with present/skip_reason"""
+        from sqlalchemy import text
+
+        results = []
+        with engine.connect() as conn:
+            existing = {row[0] for row in conn.execute(text(
+                "SELECT indexname FROM pg_indexes WHERE schemaname = current_schema()"
+            ))}
+            for migration in self.migrations:
+                for index in migration.indexes:
+                    present = index.name in existing
+                    results.append({
+                        'version': migration.version,
+                        'index': index.name,
+                        'table': index.table,
+                        'present': present,
+                        'skip_reason': None if present else self._skip_reason(conn, index)
+                    })
+        return results
+
+    def repair(self, engine) -> List[str]:
+        """Create declared indexes that are missing but can now be built"""
+        from sqlalchemy import text
+
+        missing = [entry for entry in self.verify(engine) if not entry['present'] and not entry['skip_reason']]
+        specs = {index.name: index for migration in self.migrations for index in migration.indexes}
+        with self._migration_connection(engine) as conn:
+            for entry in missing:
+                self._create_index(conn, specs[entry['index']])
+                logging.info(f"Created missing index {entry['index']}")
+        return [entry['index'] for entry in missing]
+
+    def index_usage_report(self, engine) -> List[Dict]:
+        """EXPLAIN each QUERY_INDEX_MAP statement and list the indexes the planner picks.
+
+        Small tables are usually sequentially scanned regardless of indexes,
+        so plans are taken with enable_seqscan off to show which index would
+        serve the query once the table grows.
+        """
+        from sqlalchemy import text
+
+        report = []
+        with engine.begin() as conn:
+            conn.execute(text("SET LOCAL enable_seqscan = off"))
+            for label, sql, expected in QUERY_INDEX_MAP:
+                try:
+                    with conn.begin_nested():
+                        plan = conn.execute(text(f"EXPLAIN (FORMAT JSON) {sql}")).scalar()
+                    used = sorted(set(self._plan_indexes(plan[0]['Plan'] if isinstance(plan, list) else plan)))
+                    error = None
+                except Exception as e:
+                    used, error = [], str(e).splitlines()[0]
+                report.append({
+                    'query': label,
+                    'expected': expected,
+                    'used': used,
+                    'ok': error is None and all(name in used for name in expected),
+                    'error': error
+                })
+        return report
+
+    @contextmanager
+    def _migration_connection(self, engine):
+        """Autocommit connection holding the session-level migration lock"""
+        from sqlalchemy import text
+
+        with engine.connect() as conn:
+            conn.execution_options(isolation_level='AUTOCOMMIT')
+            conn.execute(text("SELECT pg_advisory_lock(:key)"), {'key': _MIGRATION_LOCK_KEY})
+            try:
+                yield conn
+            finally:
+                conn.execute(text("SELECT pg_advisory_unlock(:key)"), {'key': _MIGRATION_LOCK_KEY})
+
+    def _create_index(self, conn, index: IndexSpec):
+        from sqlalchemy import text
+
+        # An interrupted concurrent build leaves an INVALID index that IF NOT EXISTS would keep
+        invalid = conn.execute(text("""
+            SELECT NOT i.indisvalid FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name AND c.relnamespace = current_schema()::regnamespace
+        """), {'name': index.name}).scalar()
+        if invalid:
+            conn.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {index.name}"))
+        conn.execute(text(index.create_sql()))
+
+    def _skip_reason(self, conn, index: IndexSpec) -> Optional[str]:
+        from sqlalchemy import text
+
+        columns = {row[0]: row[1] for row in conn.execute(text("""
+            SELECT column_name, data_type FROM information_schema.columns
+            WHERE table_schema = current_schema() AND table_name = :table
+        """), {'table': index.table})}
+        if not columns:
+            return f"table {index.table} does not exist"
+        for column in index.requires:
+            if column not in columns:
+                return f"column {index.table}.{column} does not exist"
+            # DATE_TRUNC over timestamptz is not immutable, so it can't be indexed
+            if index.expression and columns[column] not in _EXPRESSION_TYPES:
+                return f"{index.table}.{column} is {columns[column]}"
+        return None
+
+    def _plan_indexes(self, node: Dict) -> List[str]:
+        names = [node['Index Name']] if 'Index Name' in node else []
+        for child in node.get('Plans', []):
+            names.extend(self._plan_indexes(child))
+        return names
+
+
+def format_report(verification: List[Dict], usage: List[Dict]) -> str:
+    """Render verify() and index_usage_report() results as markdown"""
+    lines = ['## Indexes', '', '| Version | Index | Table | Status |', '|---|---|---|---|']
+    for entry in verification:
+        status = 'present' if entry['present'] else f"missing ({entry['skip_reason'] or 'run repair'})"
+        lines.append(f"| {entry['version']} | {entry['index']} | {entry['table']} | {status} |")
+    lines += ['', '## Query index usage', '', '| Query | Expected | Planner uses |', '|---|---|---|']
+    for entry in usage:
+        used = entry['error'] or ', '.join(entry['used']) or 'sequential scan'
+        marker = '' if entry['ok'] else ' ⚠'
+        lines.append(f"| {entry['query']} | {', '.join(entry['expected'])} | {used}{marker} |")
+    return '\n'.join(lines)
+
+
+# Global schema migration service instance
+schema_migration_service = SchemaMigrationService()
+
+
+if __name__ == '__main__':
+    # python -m services.schema_migrations [migrate|verify|repair|report]
+    from services.db_pool import get_engine
+
+    command = sys.argv[1] if len(sys.argv) > 1 else 'migrate'
+    engine = get_engine()
+    if command == 'migrate':
+        print(f"Applied migrations: {schema_migration_service.migrate(engine) or 'none pending'}")
+    elif command == 'verify':
+        for entry in schema_migration_service.verify(engine):
+            print(f"{entry['index']:40} {'ok' if entry['present'] else 'MISSING ' + (entry['skip_reason'] or '')}")
+    elif command == 'repair':
+        print(f"Created indexes: {schema_migration_service.repair(engine) or 'none'}")
+    elif command == 'report':
+        print(format_report(schema_migration_service.verify(engine),
+                            schema_migration_service.index_usage_report(engine)))
+    else:
+        print(f"Unknown command: {command}")
+        sys.exit(1)
@@ -3,10 +3,10 @@ Service Data Synchronization for SPANKKS Construction
 Ensures pricing page data matches CSV template structure and database integration
 """
 
-import json
 import csv
 import os
 from datetime import datetime
+from services.persistence import write_json
 
 class ServiceDataSync:
     def __init__(self):
@@ -257,8 +257,7 @@ class ServiceDataSync:
             'services': services
         }
         
-        with open(self.service_types_file, 'w') as f:
-            json.dump(service_types_data, f, indent=2)
+        write_json(self.service_types_file, service_types_data)
             
         print(f"✅ Saved {len(services)} services to database: {self.service_types_file}")
         return service_types_data
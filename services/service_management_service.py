@@ -8,10 +8,11 @@ import logging
 import csv
 import io
 from typing import Dict, List, Optional, Any
-import psycopg2
 from psycopg2.extras import RealDictCursor
 import os
 
+from services.db_pool import db_connection
+
 class ServiceManagementService:
     """Professional service management system"""
     
@@ -19,8 +20,8 @@ class ServiceManagementService:
         self.db_url = os.environ.get('DATABASE_URL')
         
     def get_db_connection(self):
-        """Get database connection"""
-        return psycopg2.connect(self.db_url, cursor_factory=RealDictCursor)
+        """Borrow a pooled database connection (returned to the pool when the with-block exits)"""
+        return db_connection(cursor_factory=RealDictCursor)
     
     def get_all_services(self, active_only: bool = False) -> List[Dict]:
         """Get all services from database"""
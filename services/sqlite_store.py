@@ -0,0 +1,412 @@
+"""
+Embedded SQLite Store for SPANKKS Construction
+WAL-mode SQLite backend for the data/*.json collections, selected with STORAGE_BACKEND=sqlite
+"""
+
+import logging
+import marshal
+import os
+import sqlite3
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from services.json_codec import decode, encode_line, load_file
+
+# 'json' (default) keeps data/*.json files; 'sqlite' moves the collections below into SQLITE_DB_PATH
+STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'json').strip().lower()
+SQLITE_DB_PATH = os.environ.get('SQLITE_DB_PATH', os.path.join('data', 'spankks.db'))
+
+# Collections (data/<name>.json) served from SQLite when the backend is enabled
+SQLITE_COLLECTIONS = frozenset([
+    # StorageService and its consumers
+    'contacts', 'jobs', 'quotes', 'invoices', 'service_requests', 'contact_messages', 'payments',
+    'job_photos', 'photo_audit_log', 'time_entries', 'job_assignments', 'auth_log', 'logout_log',
+    # UnifiedScheduler
+    'unified_appointments', 'client_sequence', 'job_sequence', 'business_hours',
+    # JobTrackingService
+    'job_records', 'quote_history', 'payment_logs', 'material_logs', 'labor_logs',
+    # InventoryService
+    'inventory', 'job_materials',
+    # ChecklistService
+    'job_checklists', 'checklist_templates',
+])
+
+# Record fields copied into indexed columns (record field -> column)
+INDEXED_FIELDS = {
+    'id': 'record_id',
+    'job_id': 'job_id',
+    'client_id': 'client_id',
+    'contact_id': 'contact_id',
+    'scheduled_date': 'scheduled_date',
+    'date': 'record_date',
+    'status': 'status',
+}
+
+_SCHEMA = [
+    """CREATE TABLE IF NOT EXISTS collections (
+        name TEXT PRIMARY KEY,
+        kind TEXT NOT NULL,
+        version INTEGER NOT NULL DEFAULT 0
+    )""",
+    """CREATE TABLE IF NOT EXISTS records (
+        collection TEXT NOT NULL,
+        position INTEGER NOT NULL,
+        data TEXT NOT NULL,
+        record_id, job_id, client_id, contact_id, scheduled_date, record_date, status,
+        PRIMARY KEY (collection, position)
+    )""",
+] + [
+    f"CREATE INDEX IF NOT EXISTS idx_records_{column} ON records (collection, {column})"
+    for column in INDEXED_FIELDS.values()
+]
+
+
+def sqlite_backend_enabled() -> bool:
+    """True when STORAGE_BACKEND=sqlite"""
+    return STORAGE_BACKEND == 'sqlite'
+
+
+def collection_name(path: str) -> str:
+    """data/unified_appointments.json -> unified_appointments"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _index_value(value: Any) -> Any:
+    # Only scalars are indexed; SQLite compares them without type coercion
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return None
+
+
+class SQLiteStore:
+    """Document store that keeps each JSON collection as indexed rows.
+
+    List collections are stored one record per row, ordered by position;
+    object collections (sequence counters, business hours) are stored as a
+    single row. Saves only rewrite rows whose JSON changed, and ``find_by``
+    on an indexed field is a B-tree lookup instead of a full scan.
+
+    Every write bumps the collection's ``version``. Each process caches the
+    last rows it read or wrote per collection, tagged with that version, so
+    ``load`` and the change check in ``save`` only touch the rows again after
+    some process has written the collection.
+    """
+
+    def __init__(self, db_path: str = SQLITE_DB_PATH):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._cache: Dict[str, _CachedCollection] = {}
+        self._cache_lock = threading.Lock()
+
+    # Connections
+    def _connect(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None and self._local.pid != os.getpid():
+            # Opened before a fork (gunicorn preload_app); SQLite connections can't be shared
+            # with the parent, so leave it to the parent and open our own
+            conn = None
+        if conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or '.', exist_ok=True)
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            for statement in _SCHEMA:
+                conn.execute(statement)
+            self._upgrade_schema(conn)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _upgrade_schema(conn: sqlite3.Connection):
+        """Add columns introduced after a database was created"""
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(collections)')}
+        if 'version' not in columns:
+            try:
+                conn.execute('ALTER TABLE collections ADD COLUMN version INTEGER NOT NULL DEFAULT 0')
+            except sqlite3.OperationalError:
+                pass  # Another process added it first
+
+    def _transaction(self):
+        conn = self._connect()
+        return _Transaction(conn)
+
+    # Reads
+    def exists(self, path: str) -> bool:
+        """True if the collection has been created"""
+        row = self._connect().execute(
+            'SELECT 1 FROM collections WHERE name = ?', (collection_name(path),)
+        ).fetchone()
+        return row is not None
+
+    def load(self, path: str, default_factory: Callable[[], Any] = list) -> Any:
+        """Load a whole collection in its original JSON shape"""
+        conn = self._connect()
+        name = collection_name(path)
+        row = conn.execute('SELECT kind, version FROM collections WHERE name = ?', (name,)).fetchone()
+        if row is None:
+            return default_factory()
+        kind, version = row
+        cached = self._cached(name, version)
+        if cached is None:
+            # A write landing between the two SELECTs only makes this entry stale:
+            # its version is already behind, so the next load reads the rows again
+            rows = [data for (data,) in conn.execute(
+                'SELECT data FROM records WHERE collection = ? ORDER BY position', (name,)
+            )]
+            cached = self._remember(name, version, kind, rows)
+        if cached.snapshot is None:
+            if kind == 'object':
+                data = decode(cached.rows[0]) if cached.rows else {}
+            else:
+                data = [decode(text) for text in cached.rows]
+            cached.snapshot = marshal.dumps(data)
+        return marshal.loads(cached.snapshot)
+
+    def count(self, path: str) -> int:
+        """Number of records in a list collection"""
+        row = self._connect().execute(
+            'SELECT COUNT(*) FROM records WHERE collection = ?', (collection_name(path),)
+        ).fetchone()
+        return row[0]
+
+    def find_by(self, path: str, field: str, value: Any) -> List[Dict]:
+        """Get records where record[field] == value, using an index when one exists"""
+        name = collection_name(path)
+        column = INDEXED_FIELDS.get(field)
+        if column is None or _index_value(value) is not value:
+            return [r for r in self.load(path) if isinstance(r, dict) and r.get(field) == value]
+
+        if value is None:
+            sql = f'SELECT data FROM records WHERE collection = ? AND {column} IS NULL ORDER BY position'
+            params: Tuple = (name,)
+        else:
+            sql = f'SELECT data FROM records WHERE collection = ? AND {column} = ? ORDER BY position'
+            params = (name, value)
+        records = [decode(data) for (data,) in self._connect().execute(sql, params)]
+        # Re-check in Python: NULL also covers missing and non-scalar values
+        return [r for r in records if r.get(field) == value]
+
+    # Writes
+    def save(self, path: str, data: Any, default: Optional[Callable] = None):
+        """Replace a collection, rewriting only the rows that changed"""
+        self.save_many([(path, data, default)])
+
+    def save_many(self, items: Iterable[Tuple[str, Any, Optional[Callable]]]):
+        """Save several collections in one transaction"""
+        # Serialize first so an encoding error leaves the database untouched
+        encoded = [(collection_name(path), data, self._encode(data, default)) for path, data, default in items]
+        saved = []
+        with self._transaction() as conn:
+            for name, data, rows in encoded:
+                kind = 'object' if isinstance(data, dict) else 'list'
+                saved.append((name, self._save_rows(conn, name, kind, rows), kind, [text for _, text in rows]))
+        # Only committed versions are cached: a rolled-back number may be reused by another writer
+        for name, version, kind, rows in saved:
+            self._remember(name, version, kind, rows)
+
+    def append(self, path: str, record: Dict, default: Optional[Callable] = str) -> Dict:
+        """Insert one record at the end of a list collection"""
+        name = collection_name(path)
+        data = encode_line(record, default=default)
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO collections (name, kind) VALUES (?, 'list')", (name,))
+            position = conn.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM records WHERE collection = ?', (name,)
+            ).fetchone()[0]
+            self._insert_row(conn, name, position, record, data)
+            self._bump_version(conn, name)
+        return record
+
+    def upsert(self, path: str, records: List[Dict], key_field: str = 'id', default: Optional[Callable] = None) -> int:
+        """Write only the given records: replace rows with the same key, append the rest"""
+        column = INDEXED_FIELDS[key_field]
+        name = collection_name(path)
+        encoded = [(record, encode_line(record, default=default)) for record in records]
+        with self._transaction() as conn:
+            conn.execute("INSERT OR IGNORE INTO collections (name, kind) VALUES (?, 'list')", (name,))
+            next_position = conn.execute(
+                'SELECT COALESCE(MAX(position) + 1, 0) FROM records WHERE collection = ?', (name,)
+            ).fetchone()[0]
+            for record, data in encoded:
+                row = conn.execute(
+                    f'SELECT position FROM records WHERE collection = ? AND {column} = ? ORDER BY position LIMIT 1',
+                    (name, _index_value(record.get(key_field)))
+                ).fetchone()
+                if row is not None:
+                    position = row[0]
+                else:
+                    position = next_position
+                    next_position += 1
+                self._insert_row(conn, name, position, record, data)
+            self._bump_version(conn, name)
+        return len(encoded)
+
+    def _encode(self, data: Any, default: Optional[Callable]) -> List[Tuple[Any, str]]:
+        records = [data] if isinstance(data, dict) else list(data)
+        return [(record, encode_line(record, default=default)) for record in records]
+
+    def _save_rows(self, conn: sqlite3.Connection, name: str, kind: str, rows: List[Tuple[Any, str]]) -> int:
+        """Write the changed rows of one collection; returns its new version"""
+        conn.execute(
+            'INSERT INTO collections (name, kind) VALUES (?, ?) '
+            'ON CONFLICT (name) DO UPDATE SET kind = excluded.kind', (name, kind)
+        )
+        version = conn.execute('SELECT version FROM collections WHERE name = ?', (name,)).fetchone()[0]
+        cached = self._cached(name, version)
+        if cached is not None:
+            existing = dict(enumerate(cached.rows))
+        else:
+            existing = dict(conn.execute(
+                'SELECT position, data FROM records WHERE collection = ?', (name,)
+            ).fetchall())
+        for position, (record, data) in enumerate(rows):
+            if existing.get(position) != data:
+                self._insert_row(conn, name, position, record, data)
+        conn.execute('DELETE FROM records WHERE collection = ? AND position >= ?', (name, len(rows)))
+        return self._bump_version(conn, name)
+
+    @staticmethod
+    def _bump_version(conn: sqlite3.Connection, name: str) -> int:
+        conn.execute('UPDATE collections SET version = version + 1 WHERE name = ?', (name,))
+        return conn.execute('SELECT version FROM collections WHERE name = ?', (name,)).fetchone()[0]
+
+    # Row cache
+    def _cached(self, name: str, version: int) -> Optional['_CachedCollection']:
+        with self._cache_lock:
+            cached = self._cache.get(name)
+        return cached if cached is not None and cached.version == version else None
+
+    def _remember(self, name: str, version: int, kind: str, rows: List[str]) -> '_CachedCollection':
+        cached = _CachedCollection(version, kind, rows)
+        with self._cache_lock:
+            self._cache[name] = cached
+        return cached
+
+    @staticmethod
+    def _insert_row(conn: sqlite3.Connection, name: str, position: int, record: Any, data: str):
+        fields = record if isinstance(record, dict) else {}
+        conn.execute(
+            'INSERT OR REPLACE INTO records '
+            '(collection, position, data, record_id, job_id, client_id, contact_id, scheduled_date, record_date, status) '
+            'VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)',
+            (name, position, data) + tuple(_index_value(fields.get(field)) for field in INDEXED_FIELDS)
+        )
+
+    # Migration
+    def import_json_files(self, data_dir: str = 'data', overwrite: bool = False) -> Dict[str, Any]:
+        """Import data/<name>.json for every SQLite collection; returns per-file counts"""
+        imported, skipped, errors = {}, [], {}
+        for name in sorted(SQLITE_COLLECTIONS):
+            path = os.path.join(data_dir, name + '.json')
+            if not os.path.exists(path):
+                continue
+            if self.exists(path) and not overwrite:
+                skipped.append(name)
+                continue
+            try:
+                data = load_file(path)
+                # Fold in any JSONL journal written by the event log store
+                journal_path = os.path.join(data_dir, name + '.jsonl')
+                if isinstance(data, list) and os.path.exists(journal_path):
+                    with open(journal_path, 'r') as f:
+                        data.extend(decode(line) for line in f if line.strip())
+                self.save(path, data, default=str)
+                imported[name] = len(data) if isinstance(data, list) else 1
+            except (OSError, ValueError) as e:
+                errors[name] = str(e)
+                logging.error(f"Error importing {path} into SQLite: {e}")
+        return {'imported': imported, 'skipped': skipped, 'errors': errors}
+
+
+class _CachedCollection:
+    """One collection's rows (JSON text) as of a version, plus a marshal snapshot built on first load"""
+
+    __slots__ = ('version', 'kind', 'rows', 'snapshot')
+
+    def __init__(self, version: int, kind: str, rows: List[str]):
+        self.version = version
+        self.kind = kind
+        self.rows = rows
+        self.snapshot: Optional[bytes] = None
+
+
+class _Transaction:
+    """BEGIN IMMEDIATE ... COMMIT/ROLLBACK on an autocommit connection"""
+
+    def __init__(self, conn: sqlite3.Connection):
+        self.conn = conn
+
+    def __enter__(self) -> sqlite3.Connection:
+        self.conn.execute('BEGIN IMMEDIATE')
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+
+class SQLiteLogStore:
+    """SQLite counterpart of JSONLLogStore with the same read/append interface"""
+
+    def __init__(self, store: SQLiteStore, snapshot_path: str):
+        self.store = store
+        self.snapshot_path = snapshot_path
+
+    def append(self, record: Dict) -> Dict:
+        return self.store.append(self.snapshot_path, record)
+
+    def rewrite(self, records: List[Dict]):
+        self.store.save(self.snapshot_path, records, default=str)
+
+    def compact(self):
+        """Nothing to fold: rows are written in place"""
+
+    def read_all(self) -> List[Dict]:
+        return self.store.load(self.snapshot_path)
+
+    def count(self) -> int:
+        return self.store.count(self.snapshot_path)
+
+    def find_by(self, field: str, value: Any) -> List[Dict]:
+        return self.store.find_by(self.snapshot_path, field, value)
+
+    def filter(self, predicate: Callable[[Dict], bool]) -> List[Dict]:
+        return [record for record in self.read_all() if predicate(record)]
+
+
+_sqlite_store: Optional[SQLiteStore] = None
+_sqlite_store_lock = threading.Lock()
+
+
+def get_sqlite_store() -> SQLiteStore:
+    """Get the process-wide SQLite store"""
+    global _sqlite_store
+    with _sqlite_store_lock:
+        if _sqlite_store is None:
+            _sqlite_store = SQLiteStore(SQLITE_DB_PATH)
+        return _sqlite_store
+
+
+def sqlite_collection(path: str) -> bool:
+    """True if this data file is served from SQLite under the current backend"""
+    return sqlite_backend_enabled() and collection_name(path) in SQLITE_COLLECTIONS
+
+
+def migrate_json_to_sqlite(data_dir: str = 'data', overwrite: bool = False) -> Dict[str, Any]:
+    """Import the existing data/*.json collections into the SQLite database"""
+    result = get_sqlite_store().import_json_files(data_dir, overwrite=overwrite)
+    logging.info(f"Imported {len(result['imported'])} collection(s) into {SQLITE_DB_PATH}")
+    return result
+
+
+if __name__ == "__main__":
+    # python -m services.sqlite_store [--overwrite]
+    import sys
+    result = migrate_json_to_sqlite(overwrite='--overwrite' in sys.argv)
+    for name, count in result['imported'].items():
+        print(f"   • {name}: {count} record(s)")
+    if result['skipped']:
+        print(f"   • Skipped (already in SQLite, use --overwrite): {', '.join(result['skipped'])}")
+    for name, error in result['errors'].items():
+        print(f"   • {name}: FAILED - {error}")
@@ -1,14 +1,117 @@
+import copy
 import json
+import marshal
 import os
+import threading
 from datetime import datetime
 import logging
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
+from services.id_allocator import id_allocator
+from services.json_codec import decode
+from services.jsonl_log_store import get_log_store
+from services.persistence import atomic_write_json, collection_exists, current_batch, file_lock, find_records, write_json
+from services.sqlite_store import get_sqlite_store, sqlite_collection
+
+
+def _copy_collection(data: Any) -> Any:
+    """Return a deep copy of a parsed collection so callers can edit records (and their lists) freely"""
+    if isinstance(data, (list, dict)):
+        return copy.deepcopy(data)
+    return data
+
+
+class JSONFileCache:
+    """Process-wide cache of parsed JSON data files.
+
+    Entries are keyed by absolute path and validated against the file's
+    (inode, mtime_ns, size) signature, so a write from another worker or an
+    atomic rename is detected on the next lookup and the file is re-read.
+    Collections are kept as marshal snapshots and every hit decodes a fresh
+    copy, so a caller that edits records in place (e.g. strips fields for a
+    client view) never changes the cached data; edits only persist through
+    ``save_data()``. Decoding a snapshot is cheaper than re-reading and
+    parsing the JSON file, and much cheaper than copy.deepcopy().
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _signature(stat_result: os.stat_result) -> tuple:
+        return (stat_result.st_ino, stat_result.st_mtime_ns, stat_result.st_size)
+
+    def get(self, filepath: str) -> Optional[Any]:
+        """Return cached data for filepath, or None if missing or stale"""
+        key = os.path.abspath(filepath)
+        try:
+            signature = self._signature(os.stat(key))
+        except OSError:
+            signature = None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and signature is not None and entry[0] == signature:
+                self.hits += 1
+                snapshot = entry[1]
+            else:
+                self.misses += 1
+                if entry is not None:
+                    del self._entries[key]
+                return None
+        return marshal.loads(snapshot)
+
+    def put(self, filepath: str, data: Any, stat_result: Optional[os.stat_result] = None):
+        """Store a snapshot of parsed data for filepath under the given (or current) file signature"""
+        key = os.path.abspath(filepath)
+        try:
+            signature = self._signature(stat_result or os.stat(key))
+            snapshot = marshal.dumps(data)
+        except (OSError, ValueError):
+            # Missing file, or values marshal can't hold: the next load re-reads the file
+            self.invalidate(filepath)
+            return
+        with self._lock:
+            self._entries[key] = (signature, snapshot)
+
+    def invalidate(self, filepath: Optional[str] = None):
+        """Drop one cached file, or everything when no path is given"""
+        with self._lock:
+            if filepath is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(os.path.abspath(filepath), None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Hit/miss counters for monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups * 100, 2) if lookups else 0.0,
+                'cached_files': len(self._entries)
+            }
+
+    def reset_stats(self):
+        """Reset hit/miss counters"""
+        with self._lock:
+            self.hits = 0
+            self.misses = 0
+
+
+# Shared by every StorageService instance in this process
+json_file_cache = JSONFileCache()
+
 
 class StorageService:
     """Comprehensive storage service for SPANKKS Construction CRM"""
 
     def __init__(self):
         self.data_dir = "data"
+        self.cache = json_file_cache
         self.ensure_data_directory()
 
     def ensure_data_directory(self):
@@ -22,45 +125,101 @@ class StorageService:
                 'service_requests.json', 'contact_messages.json']
         for file in files:
             filepath = os.path.join(self.data_dir, file)
-            if not os.path.exists(filepath):
-                with open(filepath, 'w') as f:
-                    json.dump([], f)
+            if not collection_exists(filepath):
+                write_json(filepath, [])
                 logging.info(f"Created empty data file: {file}")
 
     def load_data(self, filename: str) -> List[dict]:
-        """Load data from JSON file with error handling"""
+        """Load data from JSON file, served from the file cache when unchanged on disk"""
         filepath = os.path.join(self.data_dir, filename)
         try:
+            batch = current_batch()
+            if batch is not None:
+                found, pending = batch.get_pending(filepath)
+                if found:
+                    return _copy_collection(pending)
+
+            if sqlite_collection(filepath):
+                return get_sqlite_store().load(filepath)
+
             if os.path.exists(filepath):
-                with open(filepath, 'r') as f:
-                    data = json.load(f)
-                    logging.debug(f"Loaded {len(data)} records from {filename}")
-                    return data
+                cached = self.cache.get(filepath)
+                if cached is not None:
+                    return cached
+
+                with open(filepath, 'rb') as f:
+                    stat_result = os.fstat(f.fileno())
+                    data = decode(f.read())
+                self.cache.put(filepath, data, stat_result)
+                logging.debug(f"Loaded {len(data)} records from {filename}")
+                return data
             return []
         except (FileNotFoundError, json.JSONDecodeError) as e:
             logging.error(f"Error loading {filename}: {e}")
             return []
 
     def save_data(self, filename: str, data: List[dict]) -> bool:
-        """Save data to JSON file with error handling"""
+        """Atomically save data to JSON file and write it through the file cache"""
         filepath = os.path.join(self.data_dir, filename)
+        stringified = []
+
+        def _default(value):
+            stringified.append(value)
+            return str(value)
+
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2, default=str)
+            batch = current_batch()
+            if batch is not None:
+                # Flushed with the rest of the batch; the cache re-reads it afterwards
+                batch.mark_dirty(filepath, data, indent=2, default=str)
+                self.cache.invalidate(filepath)
+                return True
+
+            if sqlite_collection(filepath):
+                get_sqlite_store().save(filepath, data, default=str)
+                logging.debug(f"Saved {len(data)} records to {filename} (sqlite)")
+                return True
+
+            stat_result = atomic_write_json(filepath, data, indent=2, default=_default)
+            if stringified:
+                # Disk now holds str() of non-JSON values; let the next load re-read it
+                self.cache.invalidate(filepath)
+            else:
+                self.cache.put(filepath, data, stat_result)
             logging.debug(f"Saved {len(data)} records to {filename}")
             return True
         except Exception as e:
+            self.cache.invalidate(filepath)
             logging.error(f"Error saving {filename}: {e}")
             return False
 
+    def find_by(self, filename: str, field: str, value: Any) -> List[dict]:
+        """Get records where record[field] == value (indexed on the SQLite backend)"""
+        filepath = os.path.join(self.data_dir, filename)
+        if sqlite_collection(filepath):
+            return find_records(filepath, field, value)
+        return [record for record in self.load_data(filename) if record.get(field) == value]
+
+    def lock(self, filename: str):
+        """Cross-process lock for a read-modify-write of one data file.
+
+        Usage: ``with storage_service.lock('job_photos.json'): load, edit, save``
+        """
+        return file_lock(os.path.join(self.data_dir, filename))
+
+    def get_cache_stats(self) -> Dict[str, Any]:
+        """Get JSON file cache hit/miss counters"""
+        return self.cache.get_stats()
+
     def log_payment(self, payment_data: dict) -> bool:
         """Log payment transaction for financial tracking"""
         try:
-            payments = self.load_data('payments.json')
+            payment_log = get_log_store(os.path.join(self.data_dir, 'payments.json'))
             payment_data['logged_at'] = datetime.now().isoformat()
-            payment_data['id'] = f"PAY-{len(payments) + 1:04d}"
-            payments.append(payment_data)
-            return self.save_data('payments.json', payments)
+            # A sequence, not count() + 1, so numbers are never reissued after a rewrite drops events
+            payment_data['id'] = f"PAY-{id_allocator.next_value('payment', seed=lambda: payment_log.count() + 1):04d}"
+            payment_log.append(payment_data)
+            return True
         except Exception as e:
             logging.error(f"Error logging payment: {e}")
             return False
@@ -71,20 +230,34 @@ class StorageService:
 
     def add_contact(self, contact_data: dict) -> dict:
         """Add new contact to storage"""
-        contacts = self.load_data('contacts.json')
-        contact_data['id'] = f"CLI{len(contacts) + 1:03d}"
-        contact_data['created_at'] = datetime.now().isoformat()
-        contacts.append(contact_data)
-        self.save_data('contacts.json', contacts)
-        return contact_data
+        with self.lock('contacts.json'):
+            contacts = self.load_data('contacts.json')
+            contact_data['id'] = f"CLI{len(contacts) + 1:03d}"
+            contact_data['created_at'] = datetime.now().isoformat()
+            contacts.append(contact_data)
+            self.save_data('contacts.json', contacts)
+            return contact_data
+
+    def add_records(self, filename: str, records: List[dict], id_format: str) -> List[dict]:
+        """Append many records under one lock and one save (bulk uploads).
+
+        id_format numbers records like the single add_* methods, e.g. 'CLI{:03d}'.
+        """
+        with self.lock(filename):
+            existing = self.load_data(filename)
+            created_at = datetime.now().isoformat()
+            for record in records:
+                record['id'] = id_format.format(len(existing) + 1)
+                record['created_at'] = created_at
+                existing.append(record)
+            if not self.save_data(filename, existing):
+                raise IOError(f"Could not save {filename}")
+            return records
 
     def get_contact_by_id(self, contact_id: str) -> Optional[dict]:
         """Get contact by ID"""
-        contacts = self.load_data('contacts.json')
-        for contact in contacts:
-            if contact.get('id') == contact_id:
-                return contact
-        return None
+        matches = self.find_by('contacts.json', 'id', contact_id)
+        return matches[0] if matches else None
 
     def get_all_quotes(self) -> List[dict]:
         """Get all quotes from storage"""
@@ -92,17 +265,17 @@ class StorageService:
 
     def add_quote(self, quote_data: dict) -> dict:
         """Add new quote to storage"""
-        quotes = self.load_data('quotes.json')
-        quote_data['id'] = f"Q2025-{len(quotes) + 1:03d}"
-        quote_data['created_at'] = datetime.now().isoformat()
-        quotes.append(quote_data)
-        self.save_data('quotes.json', quotes)
-        return quote_data
+        with self.lock('quotes.json'):
+            quotes = self.load_data('quotes.json')
+            quote_data['id'] = f"Q2025-{len(quotes) + 1:03d}"
+            quote_data['created_at'] = datetime.now().isoformat()
+            quotes.append(quote_data)
+            self.save_data('quotes.json', quotes)
+            return quote_data
 
     def get_quotes_by_contact(self, contact_id: str) -> List[dict]:
         """Get all quotes for a specific contact"""
-        quotes = self.load_data('quotes.json')
-        return [q for q in quotes if q.get('client_id') == contact_id]
+        return self.find_by('quotes.json', 'client_id', contact_id)
 
     def get_all_invoices(self) -> List[dict]:
         """Get all invoices from storage"""
@@ -110,17 +283,17 @@ class StorageService:
 
     def add_invoice(self, invoice_data: dict) -> dict:
         """Add new invoice to storage"""
-        invoices = self.load_data('invoices.json')
-        invoice_data['id'] = f"I2025-{len(invoices) + 1:03d}"
-        invoice_data['created_at'] = datetime.now().isoformat()
-        invoices.append(invoice_data)
-        self.save_data('invoices.json', invoices)
-        return invoice_data
+        with self.lock('invoices.json'):
+            invoices = self.load_data('invoices.json')
+            invoice_data['id'] = f"I2025-{len(invoices) + 1:03d}"
+            invoice_data['created_at'] = datetime.now().isoformat()
+            invoices.append(invoice_data)
+            self.save_data('invoices.json', invoices)
+            return invoice_data
 
     def get_invoices_by_contact(self, contact_id: str) -> List[dict]:
         """Get all invoices for a specific contact"""
-        invoices = self.load_data('invoices.json')
-        return [i for i in invoices if i.get('client_id') == contact_id]
+        return self.find_by('invoices.json', 'client_id', contact_id)
 
     def get_all_jobs(self) -> List[dict]:
         """Get all jobs from storage"""
@@ -128,51 +301,54 @@ class StorageService:
 
     def add_job(self, job_data: dict) -> dict:
         """Add new job to storage"""
-        jobs = self.load_data('jobs.json')
-        job_data['id'] = f"JOB{len(jobs) + 1:03d}"
-        job_data['created_at'] = datetime.now().isoformat()
-        jobs.append(job_data)
-        self.save_data('jobs.json', jobs)
-        return job_data
+        with self.lock('jobs.json'):
+            jobs = self.load_data('jobs.json')
+            job_data['id'] = f"JOB{len(jobs) + 1:03d}"
+            job_data['created_at'] = datetime.now().isoformat()
+            jobs.append(job_data)
+            self.save_data('jobs.json', jobs)
+            return job_data
 
     def get_jobs_by_contact(self, contact_id: str) -> List[dict]:
         """Get all jobs for a specific contact"""
-        jobs = self.load_data('jobs.json')
-        return [j for j in jobs if j.get('client_id') == contact_id]
+        return self.find_by('jobs.json', 'client_id', contact_id)
 
     def update_job_status(self, job_id: str, status: str) -> bool:
         """Update job status"""
-        jobs = self.load_data('jobs.json')
-        for job in jobs:
-            if job.get('id') == job_id:
-                job['status'] = status
-                job['updated_at'] = datetime.now().isoformat()
-                return self.save_data('jobs.json', jobs)
-        return False
+        with self.lock('jobs.json'):
+            jobs = self.load_data('jobs.json')
+            for job in jobs:
+                if job.get('id') == job_id:
+                    job['status'] = status
+                    job['updated_at'] = datetime.now().isoformat()
+                    return self.save_data('jobs.json', jobs)
+            return False
 
     def add_job_note(self, job_id: str, note: str) -> bool:
         """Add note to job"""
-        jobs = self.load_data('jobs.json')
-        for job in jobs:
-            if job.get('id') == job_id:
-                if 'notes' not in job:
-                    job['notes'] = []
-                job['notes'].append({
-                    'note': note,
-                    'timestamp': datetime.now().isoformat()
-                })
-                return self.save_data('jobs.json', jobs)
-        return False
+        with self.lock('jobs.json'):
+            jobs = self.load_data('jobs.json')
+            for job in jobs:
+                if job.get('id') == job_id:
+                    if 'notes' not in job:
+                        job['notes'] = []
+                    job['notes'].append({
+                        'note': note,
+                        'timestamp': datetime.now().isoformat()
+                    })
+                    return self.save_data('jobs.json', jobs)
+            return False
 
     def update_quote_status(self, quote_id: str, status: str) -> bool:
         """Update quote status"""
-        quotes = self.load_data('quotes.json')
-        for quote in quotes:
-            if quote.get('id') == quote_id:
-                quote['status'] = status
-                quote['updated_at'] = datetime.now().isoformat()
-                return self.save_data('quotes.json', quotes)
-        return False
+        with self.lock('quotes.json'):
+            quotes = self.load_data('quotes.json')
+            for quote in quotes:
+                if quote.get('id') == quote_id:
+                    quote['status'] = status
+                    quote['updated_at'] = datetime.now().isoformat()
+                    return self.save_data('quotes.json', quotes)
+            return False
 
 # Global storage instance
 storage_service = StorageService()
\ No newline at end of file
@@ -3,12 +3,19 @@ Unified Appointment Scheduling System for SPANKKS Construction
 Consolidates legacy appointments and CRM jobs into a single, persistent system
 """
 
-import json
 import uuid
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional, Any
 import pytz
 import logging
+from services.availability_index import DayAvailabilityIndex, minutes_to_time, time_to_minutes
+from services.crew_route_optimizer import CrewRouteOptimizer, Stop, load_travel_matrix
+from services.id_allocator import id_allocator
+from services.recurrence import RecurrenceRule
+from services.persistence import collection_exists, find_records, read_json, with_file_lock, write_json
+
+# Longest horizon find_open_slots sweeps in one call
+MAX_SLOT_SEARCH_DAYS = 180
 
 class UnifiedScheduler:
     """Unified scheduling system that replaces fragmented appointment management"""
@@ -43,50 +50,29 @@ class UnifiedScheduler:
         os.makedirs('data', exist_ok=True)
         
         # Initialize appointments file
-        if not os.path.exists(self.appointments_file):
-            with open(self.appointments_file, 'w') as f:
-                json.dump([], f, indent=2)
+        if not collection_exists(self.appointments_file):
+            write_json(self.appointments_file, [])
         
         # Initialize sequence files
-        if not os.path.exists(self.client_sequence_file):
-            with open(self.client_sequence_file, 'w') as f:
-                json.dump({'next_id': 1, 'prefix': 'CLI'}, f, indent=2)
+        if not collection_exists(self.client_sequence_file):
+            write_json(self.client_sequence_file, {'next_id': 1, 'prefix': 'CLI'})
                 
-        if not os.path.exists(self.job_sequence_file):
-            with open(self.job_sequence_file, 'w') as f:
-                json.dump({'next_id': 1, 'prefix': 'JOB'}, f, indent=2)
+        if not collection_exists(self.job_sequence_file):
+            write_json(self.job_sequence_file, {'next_id': 1, 'prefix': 'JOB'})
         
         # Initialize business hours file
-        if not os.path.exists(self.business_hours_file):
-            with open(self.business_hours_file, 'w') as f:
-                json.dump(self.default_business_hours, f, indent=2)
+        if not collection_exists(self.business_hours_file):
+            write_json(self.business_hours_file, self.default_business_hours)
     
     def generate_client_id(self) -> str:
         """Generate standardized client ID: CLI001, CLI002, etc."""
-        with open(self.client_sequence_file, 'r') as f:
-            data = json.load(f)
-        
-        client_id = f"{data['prefix']}{data['next_id']:03d}"
-        data['next_id'] += 1
-        
-        with open(self.client_sequence_file, 'w') as f:
-            json.dump(data, f, indent=2)
-            
-        return client_id
+        return id_allocator.next_id('client', 'CLI')
     
     def generate_job_id(self) -> str:
         """Generate standardized job ID: JOB001, JOB002, etc."""
-        with open(self.job_sequence_file, 'r') as f:
-            data = json.load(f)
-        
-        job_id = f"{data['prefix']}{data['next_id']:03d}"
-        data['next_id'] += 1
-        
-        with open(self.job_sequence_file, 'w') as f:
-            json.dump(data, f, indent=2)
-            
-        return job_id
+        return id_allocator.next_id('job', 'JOB')
     
+    @with_file_lock('appointments_file')
     def create_appointment(self, appointment_data: Dict) -> Dict:
         """Create new appointment with standardized IDs and data structure"""
         hawaii_now = datetime.now(self.hawaii_tz)
@@ -139,7 +125,7 @@ class UnifiedScheduler:
         appointments.append(appointment)
         self._save_appointments(appointments)
         
-        # Auto-convert contact to client and assign portal access for non-consultation services
+        # Assign portal access for non-consultation services
         service_type = appointment_data.get('service_type', '')
         appointment_status = appointment_data.get('status', '')
         
@@ -150,21 +136,8 @@ class UnifiedScheduler:
         )
         
         if requires_portal:
-            conversion_result = self._auto_convert_contact_to_client(
-                appointment_data.get('client_email', ''),
-                appointment_data.get('client_phone', ''),
-                appointment_data['client_name'],
-                service_type,
-                appointment['appointment_id']
-            )
-            if conversion_result:
-                appointment['auto_conversion'] = conversion_result
-                appointment['portal_access_granted'] = True
-                logging.info(f"Auto-converted contact to client with portal access: {conversion_result}")
-            else:
-                # Even if no conversion, assign portal access for service bookings
-                appointment['portal_access_granted'] = True
-                logging.info(f"Portal access granted for service booking: {service_type}")
+            appointment['portal_access_granted'] = True
+            logging.info(f"Portal access granted for service booking: {service_type}")
         else:
             # Consultation only - no portal access needed
             appointment['portal_access_granted'] = False
@@ -178,16 +151,18 @@ class UnifiedScheduler:
     
     def get_appointment_by_ids(self, client_id: str, job_id: str) -> Optional[Dict]:
         """Get appointment by client and job ID combination"""
-        appointments = self._load_appointments()
-        for appointment in appointments:
-            if appointment['client_id'] == client_id and appointment['job_id'] == job_id:
+        for appointment in find_records(self.appointments_file, 'job_id', job_id):
+            if appointment['client_id'] == client_id:
                 return appointment
         return None
     
     def get_appointments_for_date(self, date_str: str) -> List[Dict]:
         """Get all appointments for a specific date"""
-        appointments = self._load_appointments()
-        return [apt for apt in appointments if apt.get('scheduled_date') == date_str or apt.get('date') == date_str]
+        appointments = find_records(self.appointments_file, 'scheduled_date', date_str)
+        # Legacy records may only carry 'date'
+        legacy = [apt for apt in find_records(self.appointments_file, 'date', date_str)
+                  if apt.get('scheduled_date') != date_str]
+        return appointments + legacy
     
     def get_appointments_by_date_range(self, start_date: str, end_date: str) -> List[Dict]:
         """Get appointments within date range"""
@@ -230,6 +205,7 @@ class UnifiedScheduler:
             'week_end': end_date
         }
     
+    @with_file_lock('appointments_file')
     def update_appointment_status(self, appointment_id: str, status: str, updated_by: str = 'system') -> bool:
         """Update appointment status with audit trail"""
         appointments = self._load_appointments()
@@ -254,6 +230,7 @@ class UnifiedScheduler:
         
         return False
     
+    @with_file_lock('appointments_file')
     def add_appointment_note(self, appointment_id: str, note: str, added_by: str = 'system') -> bool:
         """Add note to appointment"""
         appointments = self._load_appointments()
@@ -331,28 +308,27 @@ class UnifiedScheduler:
         return migrated_count
     
     def get_business_hours(self) -> Dict:
-        """Get current business hours configuration"""
-        try:
-            with open(self.business_hours_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return self.default_business_hours
+        """Get current business hours configuration (defaults if the file holds no settings)"""
+        hours = read_json(self.business_hours_file, lambda: self.default_business_hours)
+        return hours if isinstance(hours, dict) and hours else self.default_business_hours
     
+    @with_file_lock('business_hours_file')
     def update_business_hours(self, hours_data: Dict) -> bool:
         """Update business hours configuration"""
         try:
-            with open(self.business_hours_file, 'w') as f:
-                json.dump(hours_data, f, indent=2)
+            write_json(self.business_hours_file, hours_data)
             logging.info("Business hours updated successfully")
             return True
         except Exception as e:
             logging.error(f"Failed to update business hours: {e}")
             return False
     
-    def is_within_business_hours(self, date_str: str, time_str: str) -> Dict:
-        """Check if appointment time is within business hours"""
+    def is_within_business_hours(self, date_str: str, time_str: str, index: Optional[DayAvailabilityIndex] = None,
+                                 business_hours: Optional[Dict] = None) -> Dict:
+        """Check if appointment time is within business hours (pass business_hours when already loaded)"""
         try:
-            business_hours = self.get_business_hours()
+            if business_hours is None:
+                business_hours = self.get_business_hours()
             
             # Parse the date and get day of week
             appointment_date = datetime.strptime(date_str, '%Y-%m-%d')
@@ -364,7 +340,7 @@ class UnifiedScheduler:
                 return {
                     'valid': False,
                     'reason': f'Business is closed on {day_name.title()}s',
-                    'suggested_times': self._get_next_available_day(date_str)
+                    'suggested_times': self._get_next_available_day(date_str, business_hours=business_hours)
                 }
             
             # Parse appointment time
@@ -378,7 +354,7 @@ class UnifiedScheduler:
                     'valid': False,
                     'reason': f'Outside business hours. {day_name.title()} hours: {day_config["start"]} - {day_config["end"]}',
                     'business_hours': day_config,
-                    'suggested_times': self._get_available_times(date_str)
+                    'suggested_times': self._get_available_times(date_str, index=index, business_hours=business_hours)
                 }
             
             # Check lunch break if enabled
@@ -390,7 +366,7 @@ class UnifiedScheduler:
                     return {
                         'valid': False,
                         'reason': f'During lunch break ({business_hours["lunch_break"]["start"]} - {business_hours["lunch_break"]["end"]})',
-                        'suggested_times': self._get_available_times(date_str)
+                        'suggested_times': self._get_available_times(date_str, index=index, business_hours=business_hours)
                     }
             
             return {'valid': True, 'reason': 'Within business hours'}
@@ -399,59 +375,73 @@ class UnifiedScheduler:
             logging.error(f"Error checking business hours: {e}")
             return {'valid': False, 'reason': 'Error validating business hours'}
     
-    def check_scheduling_conflicts(self, date_str: str, time_str: str, duration_minutes: int, exclude_appointment_id: str = None) -> Dict:
+    def availability_index(self, date_str: str, exclude_appointment_id: str = None,
+                           appointments: Optional[List[Dict]] = None,
+                           buffer_minutes: Optional[int] = None) -> DayAvailabilityIndex:
+        """Index of the day's booked time (buffers included) built from a single load.
+
+        Pass `appointments` (and `buffer_minutes`) when the caller already loaded them.
+        """
+        if buffer_minutes is None:
+            buffer_minutes = self.get_business_hours().get('buffer_minutes', 30)
+        if appointments is None:
+            appointments = self.get_appointments_for_date(date_str)
+
+        bookings = []
+        for apt in appointments:
+            if apt.get('scheduled_date') != date_str:
+                continue
+            # Staff time-off blocks limit that person, not the business (see find_open_slots)
+            if apt.get('block_type') == 'availability_block':
+                continue
+            # Skip if this is the same appointment (for updates)
+            if exclude_appointment_id and apt.get('appointment_id') == exclude_appointment_id:
+                continue
+            # Skip cancelled appointments
+            if apt.get('status') == 'cancelled':
+                continue
+            try:
+                start = time_to_minutes(apt['scheduled_time'])
+                duration = int(apt.get('estimated_duration', 120))
+            except (KeyError, TypeError, ValueError):
+                logging.warning(f"Skipping appointment {apt.get('appointment_id')} with unreadable time in availability index")
+                continue
+            bookings.append((start, start + duration, apt))
+        return DayAvailabilityIndex(bookings, buffer_minutes)
+    
+    def check_scheduling_conflicts(self, date_str: str, time_str: str, duration_minutes: int, exclude_appointment_id: str = None,
+                                   index: Optional[DayAvailabilityIndex] = None, business_hours: Optional[Dict] = None) -> Dict:
         """Check for scheduling conflicts with existing appointments"""
         try:
-            business_hours = self.get_business_hours()
-            buffer_minutes = business_hours.get('buffer_minutes', 30)
-            
-            # Parse new appointment time
-            new_start = datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
-            new_end = new_start + timedelta(minutes=duration_minutes)
-            
-            # Get all appointments for the date
-            existing_appointments = self.get_appointments_by_date_range(date_str, date_str)
+            if index is None:
+                index = self.availability_index(date_str, exclude_appointment_id)
             
-            conflicts = []
-            for apt in existing_appointments:
-                # Skip if this is the same appointment (for updates)
-                if exclude_appointment_id and apt['appointment_id'] == exclude_appointment_id:
-                    continue
-                
-                # Skip cancelled appointments
-                if apt.get('status') == 'cancelled':
-                    continue
-                
-                # Parse existing appointment time
-                existing_start = datetime.strptime(f"{apt['scheduled_date']} {apt['scheduled_time']}", '%Y-%m-%d %H:%M')
-                existing_end = existing_start + timedelta(minutes=apt.get('estimated_duration', 120))
-                
-                # Add buffer time
-                existing_start_with_buffer = existing_start - timedelta(minutes=buffer_minutes)
-                existing_end_with_buffer = existing_end + timedelta(minutes=buffer_minutes)
-                
-                # Check for overlap
-                if (new_start < existing_end_with_buffer and new_end > existing_start_with_buffer):
-                    conflicts.append({
-                        'appointment_id': apt['appointment_id'],
-                        'client_name': apt['client_name'],
-                        'service_type': apt['service_type'],
-                        'time': apt['scheduled_time'],
-                        'duration': apt.get('estimated_duration', 120),
-                        'conflict_type': 'time_overlap'
-                    })
+            # Validates the date/time format
+            datetime.strptime(f"{date_str} {time_str}", '%Y-%m-%d %H:%M')
+            new_start = time_to_minutes(time_str)
+            new_end = new_start + duration_minutes
             
-            if conflicts:
+            if index.is_free(new_start, new_end):
                 return {
-                    'has_conflicts': True,
-                    'conflicts': conflicts,
-                    'suggested_times': self._get_available_times(date_str, duration_minutes),
-                    'message': f'Found {len(conflicts)} scheduling conflict(s)'
+                    'has_conflicts': False,
+                    'message': 'No scheduling conflicts found'
                 }
             
+            conflicts = [{
+                'appointment_id': apt['appointment_id'],
+                'client_name': apt['client_name'],
+                'service_type': apt['service_type'],
+                'time': apt['scheduled_time'],
+                'duration': apt.get('estimated_duration', 120),
+                'conflict_type': 'time_overlap'
+            } for apt in index.conflicts(new_start, new_end)]
+            
             return {
-                'has_conflicts': False,
-                'message': 'No scheduling conflicts found'
+                'has_conflicts': True,
+                'conflicts': conflicts,
+                'suggested_times': self._get_available_times(date_str, duration_minutes, index=index,
+                                                             business_hours=business_hours),
+                'message': f'Found {len(conflicts)} scheduling conflict(s)'
             }
             
         except Exception as e:
@@ -461,10 +451,13 @@ class UnifiedScheduler:
                 'message': f'Error checking conflicts: {str(e)}'
             }
     
-    def _get_available_times(self, date_str: str, duration_minutes: int = 120) -> List[str]:
+    def _get_available_times(self, date_str: str, duration_minutes: int = 120,
+                             index: Optional[DayAvailabilityIndex] = None, limit: int = 10,
+                             business_hours: Optional[Dict] = None) -> List[str]:
         """Get list of available appointment times for a given date"""
         try:
-            business_hours = self.get_business_hours()
+            if business_hours is None:
+                business_hours = self.get_business_hours()
             
             # Get day configuration
             appointment_date = datetime.strptime(date_str, '%Y-%m-%d')
@@ -474,43 +467,35 @@ class UnifiedScheduler:
             if not day_config.get('enabled', False):
                 return []
             
-            # Generate time slots
-            start_time = datetime.strptime(day_config['start'], '%H:%M').time()
-            end_time = datetime.strptime(day_config['end'], '%H:%M').time()
+            if index is None:
+                index = self.availability_index(date_str, buffer_minutes=business_hours.get('buffer_minutes', 30))
             
-            available_times = []
-            current_time = datetime.combine(appointment_date.date(), start_time)
-            end_datetime = datetime.combine(appointment_date.date(), end_time)
+            lunch = None
+            if business_hours.get('lunch_break', {}).get('enabled', False):
+                lunch = (time_to_minutes(business_hours['lunch_break']['start']),
+                         time_to_minutes(business_hours['lunch_break']['end']))
             
-            while current_time + timedelta(minutes=duration_minutes) <= end_datetime:
-                time_str = current_time.strftime('%H:%M')
-                
-                # Check if this time conflicts with existing appointments
-                conflict_check = self.check_scheduling_conflicts(date_str, time_str, duration_minutes)
-                if not conflict_check['has_conflicts']:
-                    # Check lunch break
-                    if business_hours.get('lunch_break', {}).get('enabled', False):
-                        lunch_start = datetime.strptime(business_hours['lunch_break']['start'], '%H:%M').time()
-                        lunch_end = datetime.strptime(business_hours['lunch_break']['end'], '%H:%M').time()
-                        
-                        if not (lunch_start <= current_time.time() <= lunch_end):
-                            available_times.append(time_str)
-                    else:
-                        available_times.append(time_str)
-                
-                # Move to next 30-minute slot
-                current_time += timedelta(minutes=30)
+            # 30-minute slots that don't start during lunch
+            available_times = []
+            for slot in index.free_slots(time_to_minutes(day_config['start']), time_to_minutes(day_config['end']),
+                                         duration_minutes, step=30):
+                if lunch and lunch[0] <= slot <= lunch[1]:
+                    continue
+                available_times.append(minutes_to_time(slot))
+                if len(available_times) >= limit:
+                    break
             
-            return available_times[:10]  # Limit to 10 suggestions
+            return available_times
             
         except Exception as e:
             logging.error(f"Error getting available times: {e}")
             return []
     
-    def _get_next_available_day(self, date_str: str) -> List[Dict]:
+    def _get_next_available_day(self, date_str: str, business_hours: Optional[Dict] = None) -> List[Dict]:
         """Find next available business days"""
         try:
-            business_hours = self.get_business_hours()
+            if business_hours is None:
+                business_hours = self.get_business_hours()
             current_date = datetime.strptime(date_str, '%Y-%m-%d')
             available_days = []
             
@@ -519,9 +504,11 @@ class UnifiedScheduler:
                 day_name = next_date.strftime('%A').lower()
                 day_config = business_hours.get(day_name, {})
                 
-                if day_config.get('enabled', False):
+                next_date_str = next_date.strftime('%Y-%m-%d')
+                if day_config.get('enabled', False) and self._get_available_times(next_date_str, limit=1,
+                                                                                 business_hours=business_hours):
                     available_days.append({
-                        'date': next_date.strftime('%Y-%m-%d'),
+                        'date': next_date_str,
                         'day_name': day_name.title(),
                         'hours': f"{day_config['start']} - {day_config['end']}"
                     })
@@ -535,10 +522,117 @@ class UnifiedScheduler:
             logging.error(f"Error getting next available days: {e}")
             return []
     
-    def validate_appointment_time(self, date_str: str, time_str: str, duration_minutes: int = 120, exclude_appointment_id: str = None) -> Dict:
-        """Comprehensive validation of appointment time"""
+    def find_open_slots(self, duration_minutes: int = 120, count: int = 10, start_date: str = None, days: int = 30,
+                        staff_ids: Optional[List[str]] = None, skill: str = None, require_all: bool = False,
+                        earliest: str = None, latest: str = None) -> Dict:
+        """Earliest `count` open (date, time, staff) slots over the next `days` days.
+
+        Candidates are staff_ids, or active field staff having `skill` (all
+        field staff if neither is given). A slot needs one candidate free
+        (every candidate with require_all) after their own appointments and
+        time-off blocks, plus one spare crew for each unassigned appointment
+        overlapping it. earliest/latest ('HH:MM') limit start times each day.
+        Appointments are loaded once and swept day by day through
+        availability indexes.
+        """
+        try:
+            business_hours = self.get_business_hours()
+            buffer_minutes = business_hours.get('buffer_minutes', 30)
+            hawaii_now = datetime.now(self.hawaii_tz)
+            first_day = datetime.strptime(start_date, '%Y-%m-%d').date() if start_date else hawaii_now.date()
+            days = max(1, min(days, MAX_SLOT_SEARCH_DAYS))
+            dates = [(first_day + timedelta(days=offset)).strftime('%Y-%m-%d') for offset in range(days)]
+            
+            crew = staff_ids or self._field_staff_ids(skill)
+            if skill and not crew:
+                return {'success': False, 'reason': f'No active staff with skill: {skill}', 'slots': []}
+            
+            # One pass over the appointments: per-staff bookings, unassigned bookings and time off
+            in_range = set(dates)
+            staff_bookings = {}
+            unassigned = {}
+            time_off = {}
+            for apt in self._load_appointments():
+                if apt.get('block_type') == 'availability_block':
+                    if apt.get('staff_id') in crew:
+                        block_end = apt.get('end_date') or apt.get('scheduled_date')
+                        for date_str in dates:
+                            if apt.get('scheduled_date', '') <= date_str <= block_end:
+                                time_off.setdefault(date_str, set()).add(apt['staff_id'])
+                    continue
+                if apt.get('scheduled_date') not in in_range or apt.get('status') == 'cancelled':
+                    continue
+                assigned = [staff_id for staff_id in apt.get('assigned_staff') or [] if staff_id in crew]
+                if crew and apt.get('assigned_staff'):
+                    for staff_id in assigned:
+                        staff_bookings.setdefault((apt['scheduled_date'], staff_id), []).append(apt)
+                else:
+                    unassigned.setdefault(apt['scheduled_date'], []).append(apt)
+            
+            lunch = None
+            if business_hours.get('lunch_break', {}).get('enabled', False):
+                lunch = (time_to_minutes(business_hours['lunch_break']['start']),
+                         time_to_minutes(business_hours['lunch_break']['end']))
+            
+            slots = []
+            for date_str in dates:
+                day_config = business_hours.get(datetime.strptime(date_str, '%Y-%m-%d').strftime('%A').lower(), {})
+                if not day_config.get('enabled', False):
+                    continue
+                open_minutes = time_to_minutes(day_config['start'])
+                close_minutes = time_to_minutes(day_config['end'])
+                if earliest:
+                    open_minutes = max(open_minutes, time_to_minutes(earliest))
+                if latest:
+                    close_minutes = min(close_minutes, time_to_minutes(latest) + duration_minutes)
+                if date_str == hawaii_now.strftime('%Y-%m-%d'):
+                    # Next grid slot after now
+                    now_minutes = hawaii_now.hour * 60 + hawaii_now.minute
+                    open_minutes = max(open_minutes, open_minutes + -(-(now_minutes - open_minutes) // 30) * 30)
+                
+                off = time_off.get(date_str, set())
+                available_crew = [staff_id for staff_id in crew if staff_id not in off]
+                if crew and (not available_crew or (require_all and len(available_crew) < len(crew))):
+                    continue
+                shared = self.availability_index(date_str, appointments=unassigned.get(date_str, []),
+                                                 buffer_minutes=buffer_minutes)
+                indexes = {staff_id: self.availability_index(date_str, appointments=staff_bookings.get((date_str, staff_id), []),
+                                                             buffer_minutes=buffer_minutes)
+                           for staff_id in available_crew}
+                
+                # Without staff records, unassigned bookings use the single-crew check
+                candidates = shared.free_slots(open_minutes, close_minutes, duration_minutes) if not crew else \
+                    range(open_minutes, close_minutes - duration_minutes + 1, 30)
+                for start in candidates:
+                    if lunch and lunch[0] <= start <= lunch[1]:
+                        continue
+                    end = start + duration_minutes
+                    free = [staff_id for staff_id, index in indexes.items() if index.is_free(start, end)]
+                    if crew:
+                        needed = len(shared.conflicts(start, end)) + (len(crew) if require_all else 1)
+                        if len(free) < needed or (require_all and len(free) < len(crew)):
+                            continue
+                    slots.append({
+                        'date': date_str,
+                        'time': minutes_to_time(start),
+                        'end_time': minutes_to_time(end),
+                        'staff_id': free[0] if free else None,
+                        'available_staff': free
+                    })
+                    if len(slots) >= count:
+                        return {'success': True, 'slots': slots, 'searched_days': dates.index(date_str) + 1}
+            
+            return {'success': True, 'slots': slots, 'searched_days': len(dates)}
+            
+        except Exception as e:
+            logging.error(f"Error searching open slots: {e}")
+            return {'success': False, 'reason': f'Error: {str(e)}', 'slots': []}
+    
+    def validate_appointment_time(self, date_str: str, time_str: str, duration_minutes: int = 120, exclude_appointment_id: str = None,
+                                  index: Optional[DayAvailabilityIndex] = None, business_hours: Optional[Dict] = None) -> Dict:
+        """Comprehensive validation of appointment time (pass index/business_hours when already loaded)"""
         # Check business hours
-        hours_check = self.is_within_business_hours(date_str, time_str)
+        hours_check = self.is_within_business_hours(date_str, time_str, index=index, business_hours=business_hours)
         if not hours_check['valid']:
             return {
                 'valid': False,
@@ -548,7 +642,10 @@ class UnifiedScheduler:
             }
         
         # Check conflicts
-        conflict_check = self.check_scheduling_conflicts(date_str, time_str, duration_minutes, exclude_appointment_id)
+        if index is None:
+            index = self.availability_index(date_str, exclude_appointment_id)
+        conflict_check = self.check_scheduling_conflicts(date_str, time_str, duration_minutes, exclude_appointment_id, index=index,
+                                                         business_hours=business_hours)
         if conflict_check['has_conflicts']:
             return {
                 'valid': False,
@@ -563,63 +660,73 @@ class UnifiedScheduler:
             'reason': 'Appointment time is available'
         }
     
+    @with_file_lock('appointments_file')
     def create_recurring_appointments(self, base_appointment: Dict, recurring_config: Dict) -> List[Dict]:
-        """Create recurring appointments based on configuration"""
+        """Create recurring appointments based on configuration.
+
+        recurring_config takes frequency (daily, weekly, biweekly, monthly,
+        nth_weekday, custom), interval, max_occurrences, end_date and, for
+        nth_weekday, weekday/nth. Occurrences are validated together against
+        one load of the appointments and the whole series is saved in one write;
+        occurrences that fail validation are skipped.
+        """
         recurring_appointments = []
         
         try:
-            frequency = recurring_config.get('frequency', 'weekly')  # weekly, monthly, custom
-            interval = recurring_config.get('interval', 1)  # every X weeks/months
-            end_date = recurring_config.get('end_date')
-            max_occurrences = recurring_config.get('max_occurrences', 12)
-            
-            base_date = datetime.strptime(base_appointment['scheduled_date'], '%Y-%m-%d')
-            current_date = base_date
-            occurrence_count = 0
-            
-            while occurrence_count < max_occurrences:
-                if frequency == 'weekly':
-                    current_date = base_date + timedelta(weeks=interval * (occurrence_count + 1))
-                elif frequency == 'monthly':
-                    current_date = base_date + timedelta(days=30 * interval * (occurrence_count + 1))
-                elif frequency == 'custom':
-                    days_interval = recurring_config.get('custom_days', 7)
-                    current_date = base_date + timedelta(days=days_interval * (occurrence_count + 1))
-                
-                if end_date and current_date > datetime.strptime(end_date, '%Y-%m-%d'):
-                    break
+            frequency = recurring_config.get('frequency', 'weekly')
+            rule = RecurrenceRule.from_config(recurring_config)
+            base_date = datetime.strptime(base_appointment['scheduled_date'], '%Y-%m-%d').date()
+            occurrence_dates = [occurrence.strftime('%Y-%m-%d') for occurrence in rule.occurrences(base_date)]
+            if not occurrence_dates:
+                return []
+            
+            # One load, grouped by day, gives every occurrence's availability index
+            appointments = self._load_appointments()
+            wanted = set(occurrence_dates)
+            by_date = {date_str: [] for date_str in occurrence_dates}
+            for apt in appointments:
+                if apt.get('scheduled_date') in wanted:
+                    by_date[apt['scheduled_date']].append(apt)
+            
+            # Business hours are read once for the whole series, not once per occurrence
+            business_hours = self.get_business_hours()
+            buffer_minutes = business_hours.get('buffer_minutes', 30)
+            
+            skipped = 0
+            for date_str in occurrence_dates:
+                validation = self.validate_appointment_time(
+                    date_str,
+                    base_appointment['scheduled_time'],
+                    base_appointment.get('estimated_duration', 120),
+                    index=self.availability_index(date_str, appointments=by_date[date_str], buffer_minutes=buffer_minutes),
+                    business_hours=business_hours
+                )
+                if not validation['valid']:
+                    skipped += 1
+                    continue
                 
                 # Create recurring appointment
                 recurring_appointment = base_appointment.copy()
-                recurring_appointment['appointment_id'] = f"APT{current_date.strftime('%Y%m%d%H%M%S')}"
-                recurring_appointment['scheduled_date'] = current_date.strftime('%Y-%m-%d')
+                recurring_appointment['appointment_id'] = str(uuid.uuid4())
+                recurring_appointment['scheduled_date'] = date_str
                 recurring_appointment['job_id'] = self.generate_job_id()
                 recurring_appointment['notes'] = f"Recurring {frequency} maintenance - {recurring_appointment.get('notes', '')}"
                 recurring_appointment['tags'] = recurring_appointment.get('tags', []) + ['recurring', f'series_{base_appointment["appointment_id"]}']
                 recurring_appointment['recurring_parent'] = base_appointment['appointment_id']
-                
-                # Validate each recurring appointment
-                validation = self.validate_appointment_time(
-                    recurring_appointment['scheduled_date'],
-                    recurring_appointment['scheduled_time'],
-                    recurring_appointment.get('estimated_duration', 120)
-                )
-                
-                if validation['valid']:
-                    appointments = self._load_appointments()
-                    appointments.append(recurring_appointment)
-                    self._save_appointments(appointments)
-                    recurring_appointments.append(recurring_appointment)
-                    
-                occurrence_count += 1
+                recurring_appointments.append(recurring_appointment)
+            
+            if recurring_appointments:
+                appointments.extend(recurring_appointments)
+                self._save_appointments(appointments)
             
-            logging.info(f"Created {len(recurring_appointments)} recurring appointments")
+            logging.info(f"Created {len(recurring_appointments)} recurring appointments ({skipped} occurrence(s) unavailable)")
             return recurring_appointments
             
         except Exception as e:
             logging.error(f"Error creating recurring appointments: {e}")
             return []
     
+    @with_file_lock('appointments_file')
     def reschedule_appointment(self, appointment_id: str, new_date: str, new_time: str, reason: str = '') -> Dict:
         """Reschedule an appointment with conflict validation"""
         try:
@@ -627,11 +734,12 @@ class UnifiedScheduler:
             
             for appointment in appointments:
                 if appointment['appointment_id'] == appointment_id:
-                    # Validate new time slot
+                    # Validate new time slot against the appointments already loaded
                     validation = self.validate_appointment_time(
                         new_date, new_time, 
                         appointment.get('estimated_duration', 120),
-                        appointment_id  # Exclude current appointment from conflict check
+                        appointment_id,  # Exclude current appointment from conflict check
+                        index=self.availability_index(new_date, appointment_id, appointments)
                     )
                     
                     if not validation['valid']:
@@ -716,6 +824,7 @@ class UnifiedScheduler:
             logging.error(f"Error getting appointment reminders: {e}")
             return []
     
+    @with_file_lock('appointments_file')
     def mark_reminder_sent(self, appointment_id: str, reminder_type: str, hours_ahead: int):
         """Mark that a reminder has been sent"""
         try:
@@ -796,6 +905,7 @@ class UnifiedScheduler:
             logging.error(f"Error calculating staff workload: {e}")
             return {}
     
+    @with_file_lock('appointments_file')
     def assign_job_to_staff(self, appointment_id: str, staff_ids: List[str], team_name: str = '') -> Dict:
         """Assign job to specific staff members or team"""
         try:
@@ -824,6 +934,119 @@ class UnifiedScheduler:
             logging.error(f"Error assigning job to staff: {e}")
             return {'success': False, 'reason': f'Error: {str(e)}'}
     
+    @with_file_lock('appointments_file')
+    def plan_crew_routes(self, date_str: str, staff_ids: Optional[List[str]] = None,
+                         time_flex_minutes: Optional[int] = 60, apply: bool = False) -> Dict:
+        """Assign a day's appointments to crews and order their stops to cut travel and idle time.
+
+        Each job may start up to time_flex_minutes before or after its booked
+        time (None lets the optimizer move it anywhere in business hours).
+        Travel times come from data/travel_times.json. With apply=True the
+        crew assignments and start times are saved in one write.
+        """
+        try:
+            business_hours = self.get_business_hours()
+            day_name = datetime.strptime(date_str, '%Y-%m-%d').strftime('%A').lower()
+            day_config = business_hours.get(day_name, {})
+            if not day_config.get('enabled', False):
+                return {'success': False, 'reason': f'Business is closed on {day_name.title()}s'}
+            open_minutes = time_to_minutes(day_config['start'])
+            close_minutes = time_to_minutes(day_config['end'])
+            
+            appointments = self._load_appointments()
+            # Staff with time off covering this date don't get a route
+            blocked = {
+                apt['staff_id'] for apt in appointments
+                if apt.get('block_type') == 'availability_block' and apt.get('staff_id')
+                and apt.get('scheduled_date', '') <= date_str <= (apt.get('end_date') or apt.get('scheduled_date'))
+            }
+            crews = [crew for crew in (staff_ids or self._field_staff_ids()) if crew not in blocked]
+            if not crews:
+                return {'success': False, 'reason': 'No staff available to assign'}
+            
+            matrix = load_travel_matrix()
+            stops = []
+            for apt in appointments:
+                if (apt.get('scheduled_date') != date_str or apt.get('status') in ('cancelled', 'completed')
+                        or apt.get('block_type') == 'availability_block'):
+                    continue
+                duration = int(apt.get('estimated_duration', 120))
+                if time_flex_minutes is None:
+                    earliest, latest = open_minutes, close_minutes - duration
+                else:
+                    booked = time_to_minutes(apt.get('scheduled_time', day_config['start']))
+                    earliest, latest = max(open_minutes, booked - time_flex_minutes), booked + time_flex_minutes
+                stops.append(Stop(apt['appointment_id'], matrix.area_for(apt.get('location', '')),
+                                  duration, earliest, latest, apt))
+            
+            optimizer = CrewRouteOptimizer(matrix, business_hours.get('buffer_minutes', 30), open_minutes, close_minutes)
+            routes, unassigned = optimizer.solve(stops, crews)
+            
+            plan = []
+            total_travel = total_idle = 0
+            for crew, route in routes.items():
+                result = optimizer.evaluate(stops, route)
+                total_travel += result.travel
+                total_idle += result.idle
+                plan.append({
+                    'staff_id': crew,
+                    'job_count': len(route),
+                    'travel_minutes': result.travel,
+                    'idle_minutes': result.idle,
+                    'stops': [{
+                        'appointment_id': stops[entry['index']].appointment_id,
+                        'client_name': stops[entry['index']].appointment.get('client_name', ''),
+                        'location': stops[entry['index']].appointment.get('location', ''),
+                        'area': stops[entry['index']].area,
+                        'booked_time': stops[entry['index']].appointment.get('scheduled_time'),
+                        'start_time': minutes_to_time(entry['start']),
+                        'end_time': minutes_to_time(entry['end']),
+                        'travel_minutes': entry['travel'],
+                        'idle_minutes': entry['idle']
+                    } for entry in result.schedule]
+                })
+            
+            if apply:
+                updated_at = datetime.now(self.hawaii_tz).isoformat()
+                by_id = {stop.appointment_id: stop.appointment for stop in stops}
+                for crew in plan:
+                    for stop in crew['stops']:
+                        appointment = by_id[stop['appointment_id']]
+                        appointment['assigned_staff'] = [crew['staff_id']]
+                        appointment['scheduled_time'] = stop['start_time']
+                        appointment['updated_at'] = updated_at
+                self._save_appointments(appointments)
+            
+            return {
+                'success': True,
+                'date': date_str,
+                'applied': apply,
+                'crews': plan,
+                'unassigned': [stops[index].appointment_id for index in unassigned],
+                'total_travel_minutes': total_travel,
+                'total_idle_minutes': total_idle
+            }
+            
+        except Exception as e:
+            logging.error(f"Error planning crew routes for {date_str}: {e}")
+            return {'success': False, 'reason': f'Error: {str(e)}'}
+    
+    def _field_staff_ids(self, skill: str = None) -> List[str]:
+        """Active staff who go out on jobs (everyone but administrators), optionally with a skill"""
+        staff_ids = []
+        for member in read_json('data/staff.json'):
+            if member.get('status', 'active') != 'active' or member.get('role') == 'Administrator' or not member.get('staff_id'):
+                continue
+            if skill:
+                skills = member.get('skills') or ''
+                if isinstance(skills, list):
+                    skills = ', '.join(skills)
+                if skill.lower() not in f"{skills} {member.get('role', '')}".lower():
+                    continue
+            staff_ids.append(member['staff_id'])
+        return staff_ids
+    
+    @with_file_lock('appointments_file')
     def block_staff_availability(self, staff_id: str, start_date: str, end_date: str, reason: str = 'Time off') -> Dict:
         """Block staff availability for time off or sick days"""
         try:
@@ -884,6 +1107,7 @@ class UnifiedScheduler:
             logging.error(f"Error getting staff schedule: {e}")
             return []
     
+    @with_file_lock('appointments_file')
     def update_job_status(self, appointment_id: str, status: str, notes: str = '') -> Dict:
         """Update job status with workflow tracking"""
         valid_statuses = [
@@ -931,6 +1155,7 @@ class UnifiedScheduler:
             logging.error(f"Error updating job status: {e}")
             return {'success': False, 'reason': f'Error: {str(e)}'}
     
+    @with_file_lock('appointments_file')
     def add_job_checklist(self, appointment_id: str, checklist_items: List[str]) -> Dict:
         """Add materials or prep task checklist to job"""
         try:
@@ -1189,16 +1414,11 @@ class UnifiedScheduler:
     
     def _load_appointments(self) -> List[Dict]:
         """Load appointments from JSON file"""
-        try:
-            with open(self.appointments_file, 'r') as f:
-                return json.load(f)
-        except (FileNotFoundError, json.JSONDecodeError):
-            return []
+        return read_json(self.appointments_file)
     
     def _save_appointments(self, appointments: List[Dict]):
         """Save appointments to JSON file"""
-        with open(self.appointments_file, 'w') as f:
-            json.dump(appointments, f, indent=2, default=str)
+        write_json(self.appointments_file, appointments, default=str)
     
     def _find_existing_client(self, email: str, phone: str, name: str) -> Optional[str]:
         """Find existing client by email, phone, or name to maintain project continuity"""
@@ -1233,11 +1453,12 @@ class UnifiedScheduler:
         except Exception as e:
             logging.error(f"Error in _find_existing_client: {e}")
             return None
-        
+
         return None
-        
+
         return None
-    
+
+    @with_file_lock('appointments_file')
     def _update_client_project_history(self, client_id: str, new_job_id: str):
         """Update related jobs for client project continuity"""
         appointments = self._load_appointments()
@@ -8,8 +8,10 @@ import io
 import os
 import logging
 from datetime import datetime
-from typing import Dict, List, Any, Tuple
+from functools import lru_cache
+from typing import Dict, List, Any, Optional, Sequence, Tuple
 from utils.phone_formatter import PhoneFormatter
+from services.bulk_ingest import BulkTable, CLIENTS_TABLE, STAFF_TABLE, bulk_ingest_service
 
 class CSVUploadService:
     """Service for processing CSV file uploads and bulk data operations"""
@@ -50,6 +52,69 @@ class CSVUploadService:
         except Exception as e:
             return False, f"CSV parsing error: {str(e)}", []
     
+    def partition_rows(self, data_rows: List[Dict], required: Sequence[str], error: str,
+                       phone_columns: Sequence[str] = ()) -> Tuple[List[Tuple[int, Dict]], List[Tuple[int, str]]]:
+        """Format phone columns and check required fields for every row in one pass.
+
+        Returns (row_num, row) pairs for the valid rows and (row_num, message)
+        errors, numbered like the row-by-row loop always numbered them.
+        """
+        format_phone = lru_cache(maxsize=None)(self.phone_formatter.format_phone)
+        for column in phone_columns:
+            for row in data_rows:
+                if row.get(column):
+                    row[column] = format_phone(row[column])
+
+        valid = []
+        errors = []
+        for row_num, row in enumerate(data_rows, start=2):
+            if all(row.get(column) for column in required):
+                valid.append((row_num, row))
+            else:
+                errors.append((row_num, f"Row {row_num}: {error}"))
+        return valid, errors
+
+    def store_records(self, records: List[Tuple[int, Dict]], filename: str, id_format: str,
+                      errors: List[Tuple[int, str]], table: Optional[BulkTable] = None) -> int:
+        """Save all records at once: COPY into PostgreSQL when `table` is given and a database
+        is configured, otherwise one append to the storage service's data file"""
+        if not records:
+            return 0
+        try:
+            if table is not None and bulk_ingest_service.database_enabled():
+                inserted, db_errors = bulk_ingest_service.load(table, records)
+                errors.extend(db_errors)
+                return inserted
+            if not self.storage_service:
+                return len(records)  # Simulate success if no storage service
+            if hasattr(self.storage_service, 'add_records'):
+                self.storage_service.add_records(filename, [row for _, row in records], id_format)
+                return len(records)
+        except Exception as e:
+            logging.error(f"Bulk upload to {filename} failed: {e}")
+            errors.append((records[0][0], f"Rows {records[0][0]}-{records[-1][0]}: Database error - {str(e)}"))
+            return 0
+
+        # Storage backends without bulk support get the records one at a time
+        add_record = {
+            'contacts.json': 'add_contact',
+            'jobs.json': 'add_job',
+            'quotes.json': 'add_quote',
+            'invoices.json': 'add_invoice'
+        }[filename]
+        processed_count = 0
+        for row_num, row in records:
+            try:
+                getattr(self.storage_service, add_record)(row)
+                processed_count += 1
+            except Exception as e:
+                errors.append((row_num, f"Row {row_num}: Database error - {str(e)}"))
+        return processed_count
+
+    @staticmethod
+    def _error_report(errors: List[Tuple[int, str]]) -> List[str]:
+        return [message for _, message in sorted(errors, key=lambda error: error[0])]
+
     def upload_clients_csv(self, file_content: str) -> Dict[str, Any]:
         """Upload clients from CSV file"""
         expected_headers = ['name', 'phone', 'email', 'address', 'city', 'state', 'zip_code', 'client_type', 'notes', 'preferred_contact_method']
@@ -59,49 +124,28 @@ class CSVUploadService:
         if not is_valid:
             return {'success': False, 'error': message, 'processed': 0}
         
-        processed_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(data_rows, start=2):
-            try:
-                # Format phone number
-                if row.get('phone'):
-                    row['phone'] = self.phone_formatter.format_phone(row['phone'])
-                
-                # Validate required fields
-                if not row.get('name') or not row.get('email'):
-                    errors.append(f"Row {row_num}: Name and email are required")
-                    continue
-                
-                # Create client record (if storage service available)
-                if self.storage_service:
-                    try:
-                        self.storage_service.add_contact({
-                            'name': row['name'],
-                            'phone': row['phone'],
-                            'email': row['email'],
-                            'address': row.get('address', ''),
-                            'city': row.get('city', 'Honolulu'),
-                            'state': row.get('state', 'HI'),
-                            'zip_code': row.get('zip_code', ''),
-                            'client_type': row.get('client_type', 'residential'),
-                            'notes': row.get('notes', ''),
-                            'preferred_contact_method': row.get('preferred_contact_method', 'email')
-                        })
-                        processed_count += 1
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: Database error - {str(e)}")
-                else:
-                    processed_count += 1  # Simulate success if no storage service
-                    
-            except Exception as e:
-                errors.append(f"Row {row_num}: Processing error - {str(e)}")
+        records, errors = self.partition_rows(
+            data_rows, ['name', 'email'], "Name and email are required", phone_columns=['phone']
+        )
+        clients = [(row_num, {
+            'name': row['name'],
+            'phone': row['phone'],
+            'email': row['email'],
+            'address': row.get('address', ''),
+            'city': row.get('city', 'Honolulu'),
+            'state': row.get('state', 'HI'),
+            'zip_code': row.get('zip_code', ''),
+            'client_type': row.get('client_type', 'residential'),
+            'notes': row.get('notes', ''),
+            'preferred_contact_method': row.get('preferred_contact_method', 'email')
+        }) for row_num, row in records]
+        processed_count = self.store_records(clients, 'contacts.json', 'CLI{:03d}', errors, table=CLIENTS_TABLE)
         
         return {
             'success': True,
             'processed': processed_count,
             'total_rows': len(data_rows),
-            'errors': errors,
+            'errors': self._error_report(errors),
             'message': f"Successfully processed {processed_count} clients"
         }
     
@@ -114,50 +158,33 @@ class CSVUploadService:
         if not is_valid:
             return {'success': False, 'error': message, 'processed': 0}
         
-        processed_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(data_rows, start=2):
-            try:
-                # Validate required fields
-                if not row.get('client_name') or not row.get('job_title'):
-                    errors.append(f"Row {row_num}: Client name and job title are required")
-                    continue
-                
-                # Create job record (if storage service available)
-                if self.storage_service:
-                    try:
-                        self.storage_service.add_job({
-                            'client_name': row['client_name'],
-                            'client_email': row['client_email'],
-                            'title': row['job_title'],
-                            'service_type': row.get('service_type', 'General Handyman'),
-                            'description': row.get('description', ''),
-                            'location': row.get('location', ''),
-                            'priority': row.get('priority', 'medium'),
-                            'status': row.get('status', 'pending'),
-                            'estimated_hours': row.get('estimated_hours', ''),
-                            'hourly_rate': row.get('hourly_rate', '95.00'),
-                            'materials_cost': row.get('materials_cost', ''),
-                            'scheduled_date': row.get('scheduled_date', ''),
-                            'scheduled_time': row.get('scheduled_time', ''),
-                            'completion_date': row.get('completion_date', ''),
-                            'notes': row.get('notes', '')
-                        })
-                        processed_count += 1
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: Database error - {str(e)}")
-                else:
-                    processed_count += 1
-                    
-            except Exception as e:
-                errors.append(f"Row {row_num}: Processing error - {str(e)}")
+        records, errors = self.partition_rows(
+            data_rows, ['client_name', 'job_title'], "Client name and job title are required"
+        )
+        jobs = [(row_num, {
+            'client_name': row['client_name'],
+            'client_email': row['client_email'],
+            'title': row['job_title'],
+            'service_type': row.get('service_type', 'General Handyman'),
+            'description': row.get('description', ''),
+            'location': row.get('location', ''),
+            'priority': row.get('priority', 'medium'),
+            'status': row.get('status', 'pending'),
+            'estimated_hours': row.get('estimated_hours', ''),
+            'hourly_rate': row.get('hourly_rate', '95.00'),
+            'materials_cost': row.get('materials_cost', ''),
+            'scheduled_date': row.get('scheduled_date', ''),
+            'scheduled_time': row.get('scheduled_time', ''),
+            'completion_date': row.get('completion_date', ''),
+            'notes': row.get('notes', '')
+        }) for row_num, row in records]
+        processed_count = self.store_records(jobs, 'jobs.json', 'JOB{:03d}', errors)
         
         return {
             'success': True,
             'processed': processed_count,
             'total_rows': len(data_rows),
-            'errors': errors,
+            'errors': self._error_report(errors),
             'message': f"Successfully processed {processed_count} jobs"
         }
     
@@ -170,51 +197,34 @@ class CSVUploadService:
         if not is_valid:
             return {'success': False, 'error': message, 'processed': 0}
         
-        processed_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(data_rows, start=2):
-            try:
-                # Validate required fields
-                if not row.get('client_name') or not row.get('total_amount'):
-                    errors.append(f"Row {row_num}: Client name and total amount are required")
-                    continue
-                
-                # Create quote record (if storage service available)
-                if self.storage_service:
-                    try:
-                        self.storage_service.add_quote({
-                            'client_name': row['client_name'],
-                            'client_email': row['client_email'],
-                            'title': row['quote_title'],
-                            'service_type': row.get('service_type', 'General Handyman'),
-                            'description': row.get('description', ''),
-                            'quantity': row.get('quantity', '1'),
-                            'unit': row.get('unit', 'service'),
-                            'unit_price': row.get('unit_price', '0.00'),
-                            'line_total': row.get('line_total', '0.00'),
-                            'subtotal': row.get('total_before_tax', '0.00'),
-                            'tax_rate': row.get('hawaii_tax_rate', '0.04712'),
-                            'tax_amount': row.get('hawaii_tax_amount', '0.00'),
-                            'total': row.get('total_amount', '0.00'),
-                            'status': row.get('status', 'pending'),
-                            'valid_until': row.get('valid_until', ''),
-                            'notes': row.get('notes', '')
-                        })
-                        processed_count += 1
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: Database error - {str(e)}")
-                else:
-                    processed_count += 1
-                    
-            except Exception as e:
-                errors.append(f"Row {row_num}: Processing error - {str(e)}")
+        records, errors = self.partition_rows(
+            data_rows, ['client_name', 'total_amount'], "Client name and total amount are required"
+        )
+        quotes = [(row_num, {
+            'client_name': row['client_name'],
+            'client_email': row['client_email'],
+            'title': row['quote_title'],
+            'service_type': row.get('service_type', 'General Handyman'),
+            'description': row.get('description', ''),
+            'quantity': row.get('quantity', '1'),
+            'unit': row.get('unit', 'service'),
+            'unit_price': row.get('unit_price', '0.00'),
+            'line_total': row.get('line_total', '0.00'),
+            'subtotal': row.get('total_before_tax', '0.00'),
+            'tax_rate': row.get('hawaii_tax_rate', '0.04712'),
+            'tax_amount': row.get('hawaii_tax_amount', '0.00'),
+            'total': row.get('total_amount', '0.00'),
+            'status': row.get('status', 'pending'),
+            'valid_until': row.get('valid_until', ''),
+            'notes': row.get('notes', '')
+        }) for row_num, row in records]
+        processed_count = self.store_records(quotes, 'quotes.json', 'Q2025-{:03d}', errors)
         
         return {
             'success': True,
             'processed': processed_count,
             'total_rows': len(data_rows),
-            'errors': errors,
+            'errors': self._error_report(errors),
             'message': f"Successfully processed {processed_count} quotes"
         }
     
@@ -268,51 +278,36 @@ class CSVUploadService:
         if not is_valid:
             return {'success': False, 'error': message, 'processed': 0}
         
-        processed_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(data_rows, start=2):
-            try:
-                if not row.get('client_name') or not row.get('total_amount'):
-                    errors.append(f"Row {row_num}: Client name and total amount are required")
-                    continue
-                
-                if self.storage_service:
-                    try:
-                        self.storage_service.add_invoice({
-                            'client_name': row['client_name'],
-                            'client_email': row['client_email'],
-                            'title': row['invoice_title'],
-                            'service_type': row.get('service_type', 'General Handyman'),
-                            'description': row.get('description', ''),
-                            'quantity': row.get('quantity', '1'),
-                            'unit': row.get('unit', 'service'),
-                            'unit_price': row.get('unit_price', '0.00'),
-                            'line_total': row.get('line_total', '0.00'),
-                            'subtotal': row.get('total_before_tax', '0.00'),
-                            'tax_rate': row.get('hawaii_tax_rate', '0.04712'),
-                            'tax_amount': row.get('hawaii_tax_amount', '0.00'),
-                            'total': row.get('total_amount', '0.00'),
-                            'payment_status': row.get('payment_status', 'pending'),
-                            'payment_method': row.get('payment_method', ''),
-                            'payment_date': row.get('payment_date', ''),
-                            'due_date': row.get('due_date', ''),
-                            'notes': row.get('notes', '')
-                        })
-                        processed_count += 1
-                    except Exception as e:
-                        errors.append(f"Row {row_num}: Database error - {str(e)}")
-                else:
-                    processed_count += 1
-                    
-            except Exception as e:
-                errors.append(f"Row {row_num}: Processing error - {str(e)}")
+        records, errors = self.partition_rows(
+            data_rows, ['client_name', 'total_amount'], "Client name and total amount are required"
+        )
+        invoices = [(row_num, {
+            'client_name': row['client_name'],
+            'client_email': row['client_email'],
+            'title': row['invoice_title'],
+            'service_type': row.get('service_type', 'General Handyman'),
+            'description': row.get('description', ''),
+            'quantity': row.get('quantity', '1'),
+            'unit': row.get('unit', 'service'),
+            'unit_price': row.get('unit_price', '0.00'),
+            'line_total': row.get('line_total', '0.00'),
+            'subtotal': row.get('total_before_tax', '0.00'),
+            'tax_rate': row.get('hawaii_tax_rate', '0.04712'),
+            'tax_amount': row.get('hawaii_tax_amount', '0.00'),
+            'total': row.get('total_amount', '0.00'),
+            'payment_status': row.get('payment_status', 'pending'),
+            'payment_method': row.get('payment_method', ''),
+            'payment_date': row.get('payment_date', ''),
+            'due_date': row.get('due_date', ''),
+            'notes': row.get('notes', '')
+        }) for row_num, row in records]
+        processed_count = self.store_records(invoices, 'invoices.json', 'I2025-{:03d}', errors)
         
         return {
             'success': True,
             'processed': processed_count,
             'total_rows': len(data_rows),
-            'errors': errors,
+            'errors': self._error_report(errors),
             'message': f"Successfully processed {processed_count} invoices"
         }
     
@@ -325,34 +320,33 @@ class CSVUploadService:
         if not is_valid:
             return {'success': False, 'error': message, 'processed': 0}
         
-        processed_count = 0
-        errors = []
-        
-        for row_num, row in enumerate(data_rows, start=2):
-            try:
-                if not row.get('name') or not row.get('email'):
-                    errors.append(f"Row {row_num}: Name and email are required")
-                    continue
-                
-                # Format phone numbers
-                if row.get('phone'):
-                    row['phone'] = self.phone_formatter.format_phone(row['phone'])
-                if row.get('emergency_phone'):
-                    row['emergency_phone'] = self.phone_formatter.format_phone(row['emergency_phone'])
-                
-                processed_count += 1  # Staff management not fully implemented yet
-                    
-            except Exception as e:
-                errors.append(f"Row {row_num}: Processing error - {str(e)}")
+        records, errors = self.partition_rows(
+            data_rows, ['name', 'email'], "Name and email are required",
+            phone_columns=['phone', 'emergency_phone']
+        )
+        if bulk_ingest_service.database_enabled():
+            staff = [(row_num, dict(row, active=str(row.get('status', 'active') or 'active').lower() != 'inactive'))
+                     for row_num, row in records]
+            processed_count, db_errors = self._load_staff(staff)
+            errors.extend(db_errors)
+        else:
+            processed_count = len(records)  # Staff management not fully implemented without a database
         
         return {
             'success': True,
             'processed': processed_count,
             'total_rows': len(data_rows),
-            'errors': errors,
+            'errors': self._error_report(errors),
             'message': f"Successfully processed {processed_count} staff records"
         }
     
+    def _load_staff(self, staff: List[Tuple[int, Dict]]) -> Tuple[int, List[Tuple[int, str]]]:
+        try:
+            return bulk_ingest_service.load(STAFF_TABLE, staff)
+        except Exception as e:
+            logging.error(f"Bulk staff upload failed: {e}")
+            return 0, [(staff[0][0], f"Rows {staff[0][0]}-{staff[-1][0]}: Database error - {str(e)}")]
+
     def upload_schedule_csv(self, file_content: str) -> Dict[str, Any]:
         """Upload schedule from CSV file"""
         expected_headers = ['client_name', 'client_phone', 'client_email', 'appointment_date', 'appointment_time', 'duration_minutes', 'service_type', 'description', 'location', 'priority', 'status', 'assigned_staff', 'notes']
@@ -8,6 +8,7 @@ import os
 from datetime import datetime, timedelta
 from typing import Dict, List, Optional
 import logging
+from services.persistence import read_json, with_file_lock, write_json
 
 class WorkflowAutomation:
     """Manages automatic job status progression and business workflow automation"""
@@ -90,13 +91,11 @@ class WorkflowAutomation:
                 }
             }
             
-            with open(self.workflow_rules_file, 'w') as f:
-                json.dump(default_rules, f, indent=2)
+            write_json(self.workflow_rules_file, default_rules)
         
         # Initialize automation log if not exists
         if not os.path.exists(self.automation_log_file):
-            with open(self.automation_log_file, 'w') as f:
-                json.dump([], f)
+            write_json(self.automation_log_file, [], indent=None)
     
     def get_workflow_rules(self) -> Dict:
         """Get current workflow rules"""
@@ -107,12 +106,12 @@ class WorkflowAutomation:
             logging.error(f"Error loading workflow rules: {e}")
             return {}
     
+    @with_file_lock('automation_log_file')
     def log_automation_event(self, event_type: str, details: Dict):
         """Log automation events for audit trail"""
         try:
-            with open(self.automation_log_file, 'r') as f:
-                log_entries = json.load(f)
-        except:
+            log_entries = read_json(self.automation_log_file)
+        except Exception:
             log_entries = []
         
         log_entry = {
@@ -129,8 +128,7 @@ class WorkflowAutomation:
             log_entries = log_entries[-1000:]
         
         try:
-            with open(self.automation_log_file, 'w') as f:
-                json.dump(log_entries, f, indent=2)
+            write_json(self.automation_log_file, log_entries)
         except Exception as e:
             logging.error(f"Error saving automation log: {e}")
     
@@ -350,11 +348,11 @@ class WorkflowAutomation:
             "last_updated": datetime.now().isoformat()
         }
     
+    @with_file_lock('workflow_rules_file')
     def update_workflow_rules(self, new_rules: Dict) -> bool:
         """Update workflow automation rules"""
         try:
-            with open(self.workflow_rules_file, 'w') as f:
-                json.dump(new_rules, f, indent=2)
+            write_json(self.workflow_rules_file, new_rules)
             
             self.log_automation_event("rules_updated", {
                 "updated_by": "admin",
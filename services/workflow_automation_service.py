@@ -3,13 +3,14 @@ Comprehensive Workflow Automation Service for SPANKKS Construction
 Automates business processes from quote generation through job completion
 """
 
-import json
 import os
 import logging
 from datetime import datetime, timedelta
 import pytz
 from typing import Dict, List, Optional, Any
 from dataclasses import dataclass
+from services.id_allocator import id_allocator, max_numeric_suffix
+from services.persistence import file_lock, read_json, write_json
 
 @dataclass
 class WorkflowStage:
@@ -144,20 +145,23 @@ class WorkflowAutomationService:
     def _load_json_file(self, filename: str) -> List[Dict]:
         """Load data from JSON file"""
         filepath = os.path.join(self.data_dir, filename)
-        if os.path.exists(filepath):
-            try:
-                with open(filepath, 'r') as f:
-                    return json.load(f)
-            except (json.JSONDecodeError, FileNotFoundError):
-                return []
-        return []
+        return read_json(filepath)
+    
+    def _lock(self, filename: str):
+        """Cross-process lock for a load-modify-save of one data file"""
+        return file_lock(os.path.join(self.data_dir, filename))
+    
+    def _next_id(self, sequence: str, filename: str) -> int:
+        """Allocate an integer record ID, seeded past the highest ID already in the file"""
+        return id_allocator.next_value(
+            sequence,
+            seed=lambda: max_numeric_suffix((r.get('id') for r in self._load_json_file(filename)), '') + 1)
     
     def _save_json_file(self, filename: str, data: List[Dict]) -> bool:
         """Save data to JSON file"""
         filepath = os.path.join(self.data_dir, filename)
         try:
-            with open(filepath, 'w') as f:
-                json.dump(data, f, indent=2)
+            write_json(filepath, data)
             return True
         except Exception as e:
             self.logger.error(f"Error saving {filename}: {e}")
@@ -167,12 +171,9 @@ class WorkflowAutomationService:
         """Initialize workflow automation for a new quote"""
         current_time = self._get_hawaii_time()
         
-        # Load existing workflows
-        workflows = self._load_json_file('workflow_tracking.json')
-        
         # Create new workflow entry
         workflow_entry = {
-            'id': len(workflows) + 1,
+            'id': self._next_id('workflow_number', 'workflow_tracking.json'),
             'quote_id': quote_id,
             'current_stage': 'quote_sent',
             'stage_entered': current_time.strftime('%Y-%m-%d %H:%M:%S'),
@@ -191,8 +192,10 @@ class WorkflowAutomationService:
             'automation_enabled': True
         }
         
-        workflows.append(workflow_entry)
-        self._save_json_file('workflow_tracking.json', workflows)
+        with self._lock('workflow_tracking.json'):
+            workflows = self._load_json_file('workflow_tracking.json')
+            workflows.append(workflow_entry)
+            self._save_json_file('workflow_tracking.json', workflows)
         
         # Schedule first automated action
         self._schedule_workflow_action(workflow_entry['id'], 'quote_follow_up_email', 1)
@@ -210,54 +213,55 @@ class WorkflowAutomationService:
         """Advance a workflow to the next stage"""
         current_time = self._get_hawaii_time()
         
-        # Load workflows
-        workflows = self._load_json_file('workflow_tracking.json')
-        
-        # Find the workflow for this quote
-        workflow = None
-        workflow_index = None
-        for i, w in enumerate(workflows):
-            if w.get('quote_id') == quote_id:
-                workflow = w
-                workflow_index = i
-                break
-        
-        if not workflow:
-            return {'success': False, 'error': 'Workflow not found for quote'}
-        
-        # Validate stage transition
-        if new_stage not in self.workflow_stages:
-            return {'success': False, 'error': f'Invalid workflow stage: {new_stage}'}
-        
-        old_stage = workflow['current_stage']
-        
-        # Update workflow
-        workflow['current_stage'] = new_stage
-        workflow['stage_entered'] = current_time.strftime('%Y-%m-%d %H:%M:%S')
-        
-        stage_config = self.workflow_stages[new_stage]
-        workflow['next_action_due'] = (current_time + timedelta(days=stage_config.duration_days)).strftime('%Y-%m-%d')
-        
-        # Add to history
-        workflow['stages_history'].append({
-            'stage': new_stage,
-            'entered': current_time.strftime('%Y-%m-%d %H:%M:%S'),
-            'actions': stage_config.actions.copy(),
-            'advanced_manually': manual
-        })
-        
-        # Handle special stage transitions
-        if new_stage == 'quote_accepted':
-            self._handle_quote_acceptance(quote_id, workflow)
-        elif new_stage == 'job_completion':
-            self._handle_job_completion(quote_id, workflow)
-        elif new_stage == 'completed':
-            workflow['status'] = 'completed'
-            workflow['completed_date'] = current_time.strftime('%Y-%m-%d')
-        
-        # Save updated workflow
-        workflows[workflow_index] = workflow
-        self._save_json_file('workflow_tracking.json', workflows)
+        # Held until the stage change is saved so concurrent advances don't overwrite each other
+        with self._lock('workflow_tracking.json'):
+            workflows = self._load_json_file('workflow_tracking.json')
+            
+            # Find the workflow for this quote
+            workflow = None
+            workflow_index = None
+            for i, w in enumerate(workflows):
+                if w.get('quote_id') == quote_id:
+                    workflow = w
+                    workflow_index = i
+                    break
+            
+            if not workflow:
+                return {'success': False, 'error': 'Workflow not found for quote'}
+            
+            # Validate stage transition
+            if new_stage not in self.workflow_stages:
+                return {'success': False, 'error': f'Invalid workflow stage: {new_stage}'}
+            
+            old_stage = workflow['current_stage']
+            
+            # Update workflow
+            workflow['current_stage'] = new_stage
+            workflow['stage_entered'] = current_time.strftime('%Y-%m-%d %H:%M:%S')
+            
+            stage_config = self.workflow_stages[new_stage]
+            workflow['next_action_due'] = (current_time + timedelta(days=stage_config.duration_days)).strftime('%Y-%m-%d')
+            
+            # Add to history
+            workflow['stages_history'].append({
+                'stage': new_stage,
+                'entered': current_time.strftime('%Y-%m-%d %H:%M:%S'),
+                'actions': stage_config.actions.copy(),
+                'advanced_manually': manual
+            })
+            
+            # Handle special stage transitions
+            if new_stage == 'quote_accepted':
+                self._handle_quote_acceptance(quote_id, workflow)
+            elif new_stage == 'job_completion':
+                self._handle_job_completion(quote_id, workflow)
+            elif new_stage == 'completed':
+                workflow['status'] = 'completed'
+                workflow['completed_date'] = current_time.strftime('%Y-%m-%d')
+            
+            # Save updated workflow
+            workflows[workflow_index] = workflow
+            self._save_json_file('workflow_tracking.json', workflows)
         
         # Schedule next automated actions if applicable
         if stage_config.auto_advance and stage_config.next_stage:
@@ -277,17 +281,14 @@ class WorkflowAutomationService:
     def _handle_quote_acceptance(self, quote_id: int, workflow: Dict):
         """Handle automated actions when quote is accepted"""
         # Create job automatically
-        jobs = self._load_json_file('jobs.json')
-        quotes = self._load_json_file('quotes.json')
-        
-        quote = next((q for q in quotes if q.get('id') == quote_id), None)
+        quote = next((q for q in self._load_json_file('quotes.json') if q.get('id') == quote_id), None)
         if not quote:
             self.logger.error(f"Quote {quote_id} not found for job creation")
             return
         
         # Create job entry
         new_job = {
-            'id': len(jobs) + 1,
+            'id': self._next_id('job_number', 'jobs.json'),
             'quote_id': quote_id,
             'contact_id': quote.get('contact_id'),
             'service_type': quote.get('service_type'),
@@ -302,14 +303,19 @@ class WorkflowAutomationService:
             'notes': f"Job created automatically from accepted quote Q{quote_id:04d}"
         }
         
-        jobs.append(new_job)
-        self._save_json_file('jobs.json', jobs)
+        with self._lock('jobs.json'):
+            jobs = self._load_json_file('jobs.json')
+            jobs.append(new_job)
+            self._save_json_file('jobs.json', jobs)
         
         # Update quote status
-        quote['status'] = 'accepted'
-        quote['accepted_date'] = self._get_hawaii_time().strftime('%Y-%m-%d')
-        quotes = [q if q.get('id') != quote_id else quote for q in quotes]
-        self._save_json_file('quotes.json', quotes)
+        with self._lock('quotes.json'):
+            quotes = self._load_json_file('quotes.json')
+            for q in quotes:
+                if q.get('id') == quote_id:
+                    q['status'] = 'accepted'
+                    q['accepted_date'] = self._get_hawaii_time().strftime('%Y-%m-%d')
+            self._save_json_file('quotes.json', quotes)
         
         workflow['job_id'] = new_job['id']
         self.logger.info(f"Created job {new_job['id']} from accepted quote {quote_id}")
@@ -317,17 +323,18 @@ class WorkflowAutomationService:
     def _handle_job_completion(self, quote_id: int, workflow: Dict):
         """Handle automated actions when job is completed"""
         # Update job status
-        jobs = self._load_json_file('jobs.json')
         job_id = workflow.get('job_id')
         
         if job_id:
-            for job in jobs:
-                if job.get('id') == job_id:
-                    job['status'] = 'completed'
-                    job['completed_date'] = self._get_hawaii_time().strftime('%Y-%m-%d')
-                    break
-            
-            self._save_json_file('jobs.json', jobs)
+            with self._lock('jobs.json'):
+                jobs = self._load_json_file('jobs.json')
+                for job in jobs:
+                    if job.get('id') == job_id:
+                        job['status'] = 'completed'
+                        job['completed_date'] = self._get_hawaii_time().strftime('%Y-%m-%d')
+                        break
+                
+                self._save_json_file('jobs.json', jobs)
         
         # Schedule customer satisfaction survey
         self._schedule_workflow_action(workflow['id'], 'send_satisfaction_survey', 1)
@@ -368,12 +375,10 @@ class WorkflowAutomationService:
     
     def _schedule_workflow_action(self, workflow_id: int, action_type: str, days_from_now: int):
         """Schedule an automated workflow action"""
-        scheduled_actions = self._load_json_file('scheduled_actions.json')
-        
         action_date = self._get_hawaii_time() + timedelta(days=days_from_now)
         
         action = {
-            'id': len(scheduled_actions) + 1,
+            'id': self._next_id('scheduled_action_number', 'scheduled_actions.json'),
             'workflow_id': workflow_id,
             'action_type': action_type,
             'scheduled_date': action_date.strftime('%Y-%m-%d'),
@@ -384,46 +389,52 @@ class WorkflowAutomationService:
             'max_attempts': 3
         }
         
-        scheduled_actions.append(action)
-        self._save_json_file('scheduled_actions.json', scheduled_actions)
+        with self._lock('scheduled_actions.json'):
+            scheduled_actions = self._load_json_file('scheduled_actions.json')
+            scheduled_actions.append(action)
+            self._save_json_file('scheduled_actions.json', scheduled_actions)
     
     def process_automated_actions(self) -> Dict[str, Any]:
         """Process all pending automated actions"""
         current_date = self._get_hawaii_time().strftime('%Y-%m-%d')
-        scheduled_actions = self._load_json_file('scheduled_actions.json')
+        with self._lock('scheduled_actions.json'):
+            scheduled_actions = self._load_json_file('scheduled_actions.json')
         
-        processed_actions = {
-            'executed': [],
-            'failed': [],
-            'skipped': []
-        }
+            processed_actions = {
+                'executed': [],
+                'failed': [],
+                'skipped': []
+            }
         
-        for action in scheduled_actions:
-            if (action.get('status') == 'pending' and 
-                action.get('scheduled_date') <= current_date and
-                action.get('attempts', 0) < action.get('max_attempts', 3)):
+            for action in scheduled_actions:
+                if (action.get('status') == 'pending' and 
+                    action.get('scheduled_date') <= current_date and
+                    action.get('attempts', 0) < action.get('max_attempts', 3)):
                 
-                try:
-                    result = self._execute_automated_action(action)
-                    if result['success']:
-                        action['status'] = 'completed'
-                        action['completed_date'] = current_date
-                        processed_actions['executed'].append(action)
-                    else:
-                        action['attempts'] = action.get('attempts', 0) + 1
-                        action['last_error'] = result.get('error', 'Unknown error')
-                        if action['attempts'] >= action.get('max_attempts', 3):
-                            action['status'] = 'failed'
-                            processed_actions['failed'].append(action)
+                    try:
+                        result = self._execute_automated_action(action)
+                        if result['success']:
+                            action['status'] = 'completed'
+                            action['completed_date'] = current_date
+                            processed_actions['executed'].append(action)
+                        else:
+                            action['attempts'] = action.get('attempts', 0) + 1
+                            action['last_error'] = result.get('error', 'Unknown error')
+                            if action['attempts'] >= action.get('max_attempts', 3):
+                                action['status'] = 'failed'
+                                processed_actions['failed'].append(action)
                         
-                except Exception as e:
-                    action['attempts'] = action.get('attempts', 0) + 1
-                    action['last_error'] = str(e)
-                    processed_actions['failed'].append(action)
-            else:
-                processed_actions['skipped'].append(action)
-        
-        self._save_json_file('scheduled_actions.json', scheduled_actions)
+                    except Exception as e:
+                        action['attempts'] = action.get('attempts', 0) + 1
+                        action['last_error'] = str(e)
+                        processed_actions['failed'].append(action)
+                else:
+                    processed_actions['skipped'].append(action)
+        
+            # Actions run above may have scheduled new ones; keep those alongside the updated ones
+            updated = {action.get('id'): action for action in scheduled_actions}
+            latest = self._load_json_file('scheduled_actions.json')
+            self._save_json_file('scheduled_actions.json', [updated.get(action.get('id'), action) for action in latest])
         
         return {
             'processed_date': current_date,
@@ -0,0 +1,32 @@
+/**
+ * Paged List Fetching for SPANKKS Construction admin pages
+ * Walks the keyset-paginated list APIs (services/keyset_pagination.py) page by page via next_cursor
+ */
+
+// Largest page the list APIs serve (MAX_PAGE_SIZE)
+const LIST_PAGE_SIZE = 500;
+
+/**
+ * Fetch every item of a list endpoint, one bounded page per request
+ */
+async function fetchAllPages(url, pageSize = LIST_PAGE_SIZE) {
+    const items = [];
+    let cursor = null;
+    do {
+        const pageUrl = new URL(url, window.location.origin);
+        pageUrl.searchParams.set('envelope', '1');
+        pageUrl.searchParams.set('limit', pageSize);
+        if (cursor) {
+            pageUrl.searchParams.set('cursor', cursor);
+        }
+
+        const response = await fetch(pageUrl);
+        if (!response.ok) {
+            throw new Error(`${url} returned ${response.status}`);
+        }
+        const page = await response.json();
+        items.push(...(page.items || []));
+        cursor = page.next_cursor;
+    } while (cursor);
+    return items;
+}
@@ -0,0 +1,39 @@
+"""DashboardStatsService: which writes drop the cached snapshot"""
+
+import pytest
+
+from services.dashboard_stats_service import DashboardStatsService, _WRITE_PATTERN
+
+
+@pytest.mark.parametrize('statement', [
+    "INSERT INTO quotes (quote_id) VALUES (%(quote_id)s)",
+    "/* admin */ UPDATE jobs SET status = 'completed' WHERE job_id = %s",
+    "-- mark paid\nupdate invoices set status = 'paid'",
+    "WITH moved AS (SELECT 1) DELETE FROM public.clients WHERE client_id = %s",
+    'UPDATE ONLY "jobs" SET status = %s',
+])
+def test_write_pattern_catches_dashboard_writes(statement):
+    assert _WRITE_PATTERN.search(statement)
+
+
+@pytest.mark.parametrize('statement', [
+    "SELECT * FROM quotes FOR UPDATE",
+    "UPDATE job_checklists SET is_completed = true",
+    "INSERT INTO emails (subject) VALUES (%s)",
+])
+def test_write_pattern_ignores_other_statements(statement):
+    assert not _WRITE_PATTERN.search(statement)
+
+
+def test_snapshot_dropped_when_write_counter_moves(monkeypatch):
+    service = DashboardStatsService(ttl=60)
+    service._listening = True
+    counter, computed = [5], []
+    monkeypatch.setattr(service, '_write_counter', lambda: counter[0])
+    monkeypatch.setattr(service, '_compute', lambda primary: computed.append(primary) or {'n': len(computed)})
+
+    assert service.get_stats() == {'n': 1}
+    assert service.get_stats() == {'n': 1}
+    counter[0] = 6
+    assert service.get_stats() == {'n': 2}
+    assert computed == [False, True]
@@ -0,0 +1,50 @@
+"""HandymanStorage: queued edits reach disk on flush, and failed flushes are reported"""
+
+import json
+
+import pytest
+
+pytest.importorskip('pytz')
+
+from models import models
+from models.models import HandymanStorage, StorageFlushError, flush_pending_writes
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    return HandymanStorage()
+
+
+def _read(path):
+    with open(path) as f:
+        return json.load(f)
+
+
+def test_job_edits_are_flushed(storage):
+    job = storage.add_job({'contact_id': 1, 'scheduled_date': '2026-01-05'})
+    storage.add_job_note(job.id, 'Bring ladder')
+    assert flush_pending_writes() == 1
+
+    storage.update_job_status(job.id, 'completed')
+    flush_pending_writes()
+    [saved] = _read('data/jobs.json')
+    assert saved['id'] == job.id
+    assert saved['status'] == 'completed'
+    assert 'Bring ladder' in saved['notes']
+
+
+def test_failed_flush_raises_and_keeps_edits_queued(storage, monkeypatch):
+    storage.add_contact({'name': 'Kai', 'email': 'kai@example.com', 'phone': '808-555-0100'})
+
+    def fail(*args, **kwargs):
+        raise OSError('disk full')
+
+    upsert_records = models.upsert_records
+    monkeypatch.setattr(models, 'upsert_records', fail)
+    with pytest.raises(StorageFlushError):
+        flush_pending_writes()
+
+    monkeypatch.setattr(models, 'upsert_records', upsert_records)
+    assert flush_pending_writes() == 1
+    assert [contact['name'] for contact in _read('data/contacts.json')] == ['Kai']
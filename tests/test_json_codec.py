@@ -0,0 +1,23 @@
+"""json_codec: orjson output stays compatible with what the json module wrote"""
+
+import json
+from datetime import datetime
+
+from services.json_codec import decode, encode, encode_line
+
+
+def test_pretty_encode_matches_json_module_layout():
+    data = [{'id': 'JOB001', 'items': [1, 2.5], 'notes': None, 'tags': [], 'meta': {}}]
+    assert encode(data) == json.dumps(data, indent=2).encode('utf-8')
+
+
+def test_default_handles_datetimes_in_both_formats():
+    record = {'created_at': datetime(2026, 1, 5, 9, 30)}
+    assert decode(encode([record], default=str)) == [{'created_at': '2026-01-05 09:30:00'}]
+    assert decode(encode_line(record, default=str)) == {'created_at': '2026-01-05 09:30:00'}
+
+
+def test_values_orjson_rejects_fall_back_to_json_module():
+    data = {'big': 2 ** 70}
+    assert decode(encode(data)) == data
+    assert decode(encode_line(data)) == data
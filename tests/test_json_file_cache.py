@@ -0,0 +1,66 @@
+"""JSONFileCache: hits hand out independent copies and cost less than a re-read"""
+
+import json
+import time
+
+import pytest
+
+from services.storage_service import StorageService
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    service = StorageService()
+    service.cache.invalidate()
+    return service
+
+
+def _records(count):
+    return [{
+        'id': f"CLI{number:05d}",
+        'name': f"Client {number}",
+        'email': f"client{number}@example.com",
+        'tags': ['residential', 'repeat'],
+        'job_history': [{'job_id': f"JOB{number:05d}", 'amount': 125.5}],
+        'total_spent': 125.5,
+        'last_contact': None
+    } for number in range(count)]
+
+
+def _median_seconds(function, runs=7):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return sorted(timings)[len(timings) // 2]
+
+
+def test_edits_to_loaded_records_do_not_reach_the_cache(storage):
+    storage.save_data('contacts.json', _records(3))
+
+    first = storage.load_data('contacts.json')
+    first[0]['name'] = 'Changed'
+    first[0]['tags'].append('leaked')
+    first.pop()
+
+    second = storage.load_data('contacts.json')
+    assert len(second) == 3
+    assert second[0]['name'] == 'Client 0'
+    assert second[0]['tags'] == ['residential', 'repeat']
+
+
+def test_cache_hit_is_cheaper_than_a_miss(storage):
+    with open('data/contacts.json', 'w') as f:
+        json.dump(_records(20000), f, indent=2)
+    storage.load_data('contacts.json')
+
+    def miss():
+        storage.cache.invalidate()
+        storage.load_data('contacts.json')
+
+    hit_seconds = _median_seconds(lambda: storage.load_data('contacts.json'))
+    miss_seconds = _median_seconds(miss)
+    assert storage.get_cache_stats()['hits'] >= 7
+    assert hit_seconds < miss_seconds
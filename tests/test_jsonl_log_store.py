@@ -0,0 +1,69 @@
+"""JSONLLogStore: compaction/rewrite crash recovery and copy-on-read"""
+
+import json
+import os
+
+import pytest
+
+from services.jsonl_log_store import JSONLLogStore
+
+
+@pytest.fixture
+def store(tmp_path):
+    snapshot = tmp_path / 'payments.json'
+    snapshot.write_text(json.dumps([{'id': 1}]))
+    log = JSONLLogStore(str(snapshot))
+    log.append({'id': 2})
+    log.append({'id': 3})
+    return log
+
+
+def _ids(log):
+    return [record['id'] for record in JSONLLogStore(log.snapshot_path).read_all()]
+
+
+def test_crash_after_commit_point_keeps_rewrite(store, monkeypatch):
+    records = store.read_all()
+    records[0]['edited'] = True
+    # Die between removing .compacting (commit) and renaming .next over the snapshot
+    monkeypatch.setattr(store, '_install_next_snapshot', lambda: (_ for _ in ()).throw(SystemExit))
+    with pytest.raises(SystemExit):
+        store.rewrite(records)
+    monkeypatch.undo()
+
+    assert os.path.exists(store.next_snapshot_path)
+    assert _ids(store) == [1, 2, 3]
+    assert JSONLLogStore(store.snapshot_path).read_all()[0]['edited'] is True
+    assert not os.path.exists(store.next_snapshot_path)
+
+
+def test_crash_before_commit_point_keeps_old_events(store, monkeypatch):
+    records = store.read_all()[:1]
+    real_remove = os.remove
+
+    def crash_on_commit(path):
+        if path.endswith('.compacting'):
+            raise SystemExit
+        real_remove(path)
+
+    monkeypatch.setattr(os, 'remove', crash_on_commit)
+    with pytest.raises(SystemExit):
+        store.rewrite(records)
+    monkeypatch.undo()
+
+    assert _ids(store) == [1, 2, 3]
+    assert not os.path.exists(store.compacting_path)
+
+
+def test_compact_then_append(store):
+    store.compact()
+    store.append({'id': 4})
+    assert _ids(store) == [1, 2, 3, 4]
+    assert not os.path.exists(store.compacting_path)
+
+
+def test_reads_return_copies(store):
+    store.read_all()[0]['id'] = 99
+    store.find_by('id', 2)[0]['id'] = 98
+    assert [record['id'] for record in store.read_all()] == [1, 2, 3]
+    assert store.find_by('id', 2) == [{'id': 2}]
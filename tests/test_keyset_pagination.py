@@ -0,0 +1,56 @@
+"""KeysetQuery: pages stay bounded and cursors cross rows with NULL sort values"""
+
+import pytest
+
+pytest.importorskip('flask')
+sqlalchemy = pytest.importorskip('sqlalchemy')
+
+from services.keyset_pagination import KeysetQuery, nulls_last, wants_stream
+
+ROWS = [
+    ('Q001', '2026-01-02 08:00:00'),
+    ('Q002', None),
+    ('Q003', '2026-01-01 08:00:00'),
+    ('Q004', None),
+    ('Q005', None),
+]
+
+
+@pytest.fixture
+def engine():
+    engine = sqlalchemy.create_engine('sqlite://')
+    with engine.begin() as conn:
+        conn.execute(sqlalchemy.text('CREATE TABLE quotes (quote_number TEXT PRIMARY KEY, created_at TEXT)'))
+        for quote_number, created_at in ROWS:
+            conn.execute(sqlalchemy.text('INSERT INTO quotes VALUES (:n, :c)'), {'n': quote_number, 'c': created_at})
+    return engine
+
+
+def _all_pages(engine, query, limit):
+    pages, args = [], {'limit': str(limit)}
+    with engine.connect() as conn:
+        while True:
+            rows, next_cursor = query.fetch(conn, args)
+            pages.append([row['quote_id'] for row in rows])
+            if not next_cursor:
+                return pages
+            assert len(pages) <= len(ROWS), "cursor did not advance"
+            args = {'limit': str(limit), 'cursor': next_cursor}
+
+
+@pytest.mark.parametrize('direction, expected', [
+    ('DESC', [['Q001', 'Q003'], ['Q005', 'Q004'], ['Q002']]),
+    ('ASC', [['Q003', 'Q001'], ['Q002', 'Q004'], ['Q005']]),
+])
+def test_cursor_crosses_page_boundary_inside_null_timestamps(engine, direction, expected):
+    query = KeysetQuery(
+        'quotes', [*nulls_last('created_at', "'1970-01-01 00:00:00'", direction), 'quote_number'],
+        direction=direction, columns={'quote_id': 'quote_number'}
+    )
+    assert _all_pages(engine, query, limit=2) == expected
+
+
+def test_requests_without_stream_get_one_page():
+    assert not wants_stream({})
+    assert not wants_stream({'format': 'csv'})
+    assert wants_stream({'stream': '1'})
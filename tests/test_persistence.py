@@ -0,0 +1,53 @@
+"""Write batches keep a locked file's lock until the batch is flushed"""
+
+import json
+import threading
+
+from services.persistence import file_lock, read_json, write_batch, write_json
+
+
+def _locked_elsewhere(path):
+    """True if another thread can't take the file lock within a short wait"""
+    acquired = threading.Event()
+
+    def take():
+        with file_lock(path):
+            acquired.set()
+
+    thread = threading.Thread(target=take, daemon=True)
+    thread.start()
+    got_it = acquired.wait(0.3)
+    thread.join(5)
+    return not got_it
+
+
+def test_locked_write_in_batch_is_flushed_with_the_batch(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    write_json(path, [{'id': 1}])
+
+    with write_batch():
+        with file_lock(path):
+            write_json(path, [{'id': 1}, {'id': 2}])
+        # Lock released by the caller, but the write is still pending in the batch
+        with open(path) as f:
+            assert json.load(f) == [{'id': 1}]
+        assert _locked_elsewhere(path)
+
+    assert read_json(path) == [{'id': 1}, {'id': 2}]
+    assert not _locked_elsewhere(path)
+
+
+def test_failed_batch_discards_write_and_releases_lock(tmp_path):
+    path = str(tmp_path / 'jobs.json')
+    write_json(path, [{'id': 1}])
+
+    try:
+        with write_batch():
+            with file_lock(path):
+                write_json(path, [])
+            raise RuntimeError('abort')
+    except RuntimeError:
+        pass
+
+    assert read_json(path) == [{'id': 1}]
+    assert not _locked_elsewhere(path)
@@ -0,0 +1,56 @@
+"""SQLiteStore: per-process connections and the version-checked row cache"""
+
+import os
+import sqlite3
+
+import pytest
+
+from services.sqlite_store import SQLiteStore
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return str(tmp_path / 'spankks.db')
+
+
+def test_loads_see_writes_from_another_store(db_path):
+    # Two stores on one file stand in for two gunicorn workers
+    reader, writer = SQLiteStore(db_path), SQLiteStore(db_path)
+    writer.save('data/jobs.json', [{'id': 'JOB001', 'status': 'scheduled'}])
+    assert reader.load('data/jobs.json') == [{'id': 'JOB001', 'status': 'scheduled'}]
+
+    writer.upsert('data/jobs.json', [{'id': 'JOB001', 'status': 'completed'}])
+    writer.append('data/jobs.json', {'id': 'JOB002', 'status': 'scheduled'})
+    assert reader.load('data/jobs.json') == [
+        {'id': 'JOB001', 'status': 'completed'},
+        {'id': 'JOB002', 'status': 'scheduled'},
+    ]
+
+    # reader's save diffs against its cache only while that cache is current
+    reader.save('data/jobs.json', [{'id': 'JOB003', 'status': 'scheduled'}])
+    assert writer.load('data/jobs.json') == [{'id': 'JOB003', 'status': 'scheduled'}]
+
+
+def test_loads_hand_out_independent_copies(db_path):
+    store = SQLiteStore(db_path)
+    store.save('data/business_hours.json', {'monday': {'start': '07:00', 'end': '17:00'}})
+    store.load('data/business_hours.json')['monday']['start'] = '09:00'
+    assert store.load('data/business_hours.json')['monday']['start'] == '07:00'
+
+
+def test_connection_opened_before_fork_is_not_reused(db_path, monkeypatch):
+    store = SQLiteStore(db_path)
+    parent_conn = store._connect()
+    monkeypatch.setattr(os, 'getpid', lambda: -1)
+    assert store._connect() is not parent_conn
+
+
+def test_existing_database_gains_version_column(db_path):
+    conn = sqlite3.connect(db_path)
+    conn.execute('CREATE TABLE collections (name TEXT PRIMARY KEY, kind TEXT NOT NULL)')
+    conn.commit()
+    conn.close()
+
+    store = SQLiteStore(db_path)
+    store.save('data/jobs.json', [{'id': 'JOB001'}])
+    assert store.load('data/jobs.json') == [{'id': 'JOB001'}]